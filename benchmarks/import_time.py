@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+统计import image_annotations及访问各个对外名称的启动耗时\n
+用法: python benchmarks/import_time.py [--repeat 5] [--output result.json]\n
+每个场景都在新的解释器中以python -X importtime运行, 取多次运行中的最小值\n
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import List, Dict
+
+
+# 场景名 -> 在新解释器中执行的语句
+SCENARIOS = {
+    "package": "import image_annotations",
+    "voc2yolo": "import image_annotations; image_annotations.voc2yolo",
+    "voc_classes": "import image_annotations; image_annotations.voc_classes",
+    "yolo2voc": "import image_annotations; image_annotations.yolo2voc",
+    "coco2yolo": "import image_annotations; image_annotations.coco2yolo",
+    "Dataset": "import image_annotations; image_annotations.Dataset",
+}
+
+# 需要关注是否被导入的重量级依赖
+HEAVY_MODULES = ["numpy", "cv2", "tqdm", "pycocotools", "multiprocessing"]
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """
+    解析-X importtime的输出\n
+    :param stderr: 解释器的标准错误输出
+    :return: 模块名 -> 累计耗时(微秒), 只包含顶层导入
+    """
+    results = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit() or name.startswith("  "):
+            continue
+        results[name.strip()] = int(cumulative)
+    return results
+
+
+def measure(statement: str) -> dict:
+    """
+    在新解释器中运行一次语句并统计导入耗时\n
+    :param statement: 语句
+    :return: 本次运行的统计结果
+    """
+    code = statement + "; import sys; print(' '.join(sorted(sys.modules)))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, env=env, check=True)
+    modules = set(process.stdout.split())
+    timings = parse_importtime(process.stderr)
+    return {
+        "package_us": sum(v for k, v in timings.items() if k == "image_annotations" or k.startswith("image_annotations.")),
+        "total_us": sum(timings.values()),
+        "heavy_modules": [x for x in HEAVY_MODULES if x in modules],
+    }
+
+
+def run(repeat: int, scenarios: List[str]) -> dict:
+    """
+    运行全部场景\n
+    :param repeat: 每个场景的运行次数
+    :param scenarios: 场景名
+    :return: 场景名 -> 统计结果, 耗时取最小值
+    """
+    results = {}
+    for name in scenarios:
+        runs = [measure(SCENARIOS[name]) for _ in range(repeat)]
+        results[name] = {
+            "package_us": min(x["package_us"] for x in runs),
+            "total_us": min(x["total_us"] for x in runs),
+            "heavy_modules": runs[0]["heavy_modules"],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统计image_annotations的导入耗时")
+    parser.add_argument("--repeat", type=int, default=5, help="每个场景的运行次数, 取最小值")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="只运行指定场景, 可重复指定")
+    parser.add_argument("--output", help="把结果写入json文件, 默认输出到标准输出")
+    args = parser.parse_args()
+    results = {
+        "python": sys.version.split()[0],
+        "scenarios": run(args.repeat, args.scenario or list(SCENARIOS)),
+    }
+    text = json.dumps(results, indent=4, ensure_ascii=False)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
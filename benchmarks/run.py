@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+转换函数的基准测试\n
+用法: python benchmarks/run.py [--data DIR] [--images 1000] [--boxes 8] [--workers 1] [--output result.json]\n
+不指定--data时先用synthetic.py在临时目录中生成数据集, 然后在独立的子进程中逐个运行六个转换函数、三个多目标转换函数和三个获取类别的函数,\n
+以JSON格式输出每个用例的耗时、吞吐量(图片/秒、检测框/秒)、峰值内存及各阶段(scan、probe、parse、serialize、write等)耗时, 便于在版本之间比较\n
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import synthetic
+
+
+# 用例名 -> (模块, 函数, 是否为转换函数)
+CASES = {
+    "yolo2voc": ("image_annotations.yolo", "to_voc", True),
+    "yolo2coco": ("image_annotations.yolo", "to_coco", True),
+    "voc2yolo": ("image_annotations.voc", "to_yolo", True),
+    "voc2coco": ("image_annotations.voc", "to_coco", True),
+    "coco2yolo": ("image_annotations.coco", "to_yolo", True),
+    "coco2voc": ("image_annotations.coco", "to_voc", True),
+    "yolo2multi": ("image_annotations.yolo", "convert", True),
+    "voc2multi": ("image_annotations.voc", "convert", True),
+    "coco2multi": ("image_annotations.coco", "convert", True),
+    "yolo_classes_ids": ("image_annotations.yolo", "get_all_classes_ids", False),
+    "voc_classes": ("image_annotations.voc", "get_all_classes", False),
+    "coco_classes": ("image_annotations.coco", "get_all_classes", False),
+}
+
+
+def _arguments(case: str, data_dir: str, output: str, classes: List[str]) -> list:
+    """
+    生成用例的位置参数\n
+    :param case: 用例名
+    :param data_dir: 数据集目录
+    :param output: 输出路径
+    :param classes: 全部类别
+    :return: 位置参数
+    """
+    images = os.path.join(data_dir, "images")
+    labels = os.path.join(data_dir, "labels")
+    voc = os.path.join(data_dir, "voc")
+    coco = os.path.join(data_dir, "coco.json")
+    return {
+        "yolo2voc": [images, labels, classes, output],
+        "yolo2coco": [images, labels, classes, output + ".json"],
+        "voc2yolo": [voc, classes, output],
+        "voc2coco": [voc, classes, output + ".json"],
+        "coco2yolo": [coco, output],
+        "coco2voc": [coco, images, output],
+        "yolo2multi": [images, labels, classes, {"voc": os.path.join(output, "voc"), "coco": os.path.join(output, "coco.json")}],
+        "voc2multi": [voc, classes, {"yolo": os.path.join(output, "yolo"), "coco": os.path.join(output, "coco.json")}],
+        "coco2multi": [coco, {"yolo": os.path.join(output, "yolo"), "voc": os.path.join(output, "voc")}, images],
+        "yolo_classes_ids": [labels],
+        "voc_classes": [voc],
+        "coco_classes": [coco],
+    }[case]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """
+    当前进程及其已结束子进程的峰值常驻内存\n
+    :return: 峰值内存(MB), 不支持的平台上返回None
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # macOS上单位为字节, Linux上为KB
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 2)
+
+
+def child(case: str, data_dir: str, output: str, workers: int, chunksize: int):
+    """
+    在子进程中运行一个用例, 把结果以JSON输出到标准输出\n
+    :param case: 用例名
+    :param data_dir: 数据集目录
+    :param output: 输出路径
+    :param workers: 并行的进程数
+    :param chunksize: 每次分发给子进程的文件数
+    """
+    from importlib import import_module
+    with open(os.path.join(data_dir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    module, name, convert = CASES[case]
+    stages = {}
+    start = time.perf_counter()
+    func = getattr(import_module(module), name)
+    stages["import"] = time.perf_counter() - start
+    from image_annotations.metrics import ConversionStats
+    stats = ConversionStats()
+    kwargs = {"workers": workers, "chunksize": chunksize} if convert else {}
+    if case != "coco_classes":
+        kwargs["progress"] = False
+    if convert and not case.endswith("coco"):
+        os.makedirs(output, exist_ok=True)
+    start = time.perf_counter()
+    func(*_arguments(case, data_dir, output, meta["classes"]), stats=stats, **kwargs)
+    stages["run"] = time.perf_counter() - start
+    # 转换函数内部各阶段的耗时, 多进程时为各子进程耗时之和
+    stages.update({k: v for k, v in stats.stages.items() if k != "total"})
+    print(json.dumps({"stages": stages, "counts": stats.counts, "peak_rss_mb": _peak_rss_mb()}))
+
+
+def run_case(case: str, data_dir: str, meta: dict, workers: int, chunksize: int, repeat: int) -> dict:
+    """
+    在独立的子进程中多次运行一个用例, 取耗时最小的一次\n
+    :param case: 用例名
+    :param data_dir: 数据集目录
+    :param meta: 数据集的元信息
+    :param workers: 并行的进程数
+    :param chunksize: 每次分发给子进程的文件数
+    :param repeat: 运行次数
+    :return: 用例的统计结果
+    """
+    best = None
+    output_root = tempfile.mkdtemp(prefix="image_annotations_bench_")
+    try:
+        for _ in range(repeat):
+            output = os.path.join(output_root, case)
+            process = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", case, data_dir, output, str(workers), str(chunksize)],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True
+            )
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            if best is None or result["stages"]["run"] < best["stages"]["run"]:
+                best = result
+            shutil.rmtree(output_root)
+            os.makedirs(output_root)
+    finally:
+        shutil.rmtree(output_root, ignore_errors=True)
+    seconds = best["stages"]["run"]
+    return {
+        "seconds": round(seconds, 4),
+        "images_per_second": round(meta["images"] / seconds, 1),
+        "boxes_per_second": round(meta["boxes"] / seconds, 1),
+        "peak_rss_mb": best["peak_rss_mb"],
+        "stages": {k: round(v, 4) for k, v in best["stages"].items()},
+        "counts": best["counts"],
+    }
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        case, data_dir, output, workers, chunksize = sys.argv[2:7]
+        child(case, data_dir, output, int(workers), int(chunksize))
+        return
+    parser = argparse.ArgumentParser(description="转换函数的基准测试")
+    parser.add_argument("--data", help="已生成的数据集目录, 不指定时在临时目录中生成")
+    parser.add_argument("--images", type=int, default=1000, help="生成的图片数")
+    parser.add_argument("--boxes", type=int, default=8, help="每张图片的检测框数")
+    parser.add_argument("--classes", type=int, default=20, help="类别数")
+    parser.add_argument("--size", action="append", type=synthetic.parse_size, help="图片尺寸, 例如640x480, 可重复指定")
+    parser.add_argument("--format", default="jpg", help="图片格式")
+    parser.add_argument("--workers", type=int, default=1, help="转换函数的workers参数")
+    parser.add_argument("--chunksize", type=int, default=64, help="转换函数的chunksize参数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的运行次数, 取最快的一次")
+    parser.add_argument("--case", action="append", choices=list(CASES), help="只运行指定用例, 可重复指定")
+    parser.add_argument("--output", help="把结果写入json文件, 默认输出到标准输出")
+    args = parser.parse_args()
+
+    import image_annotations
+    data_dir = args.data
+    generated = data_dir is None
+    generate_seconds = None
+    if generated:
+        data_dir = tempfile.mkdtemp(prefix="image_annotations_data_")
+        start = time.perf_counter()
+        synthetic.generate(data_dir, args.images, args.boxes, args.classes, args.size or [(640, 480)], args.format)
+        generate_seconds = round(time.perf_counter() - start, 4)
+    try:
+        with open(os.path.join(data_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        results = {
+            "version": image_annotations.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "dataset": {k: v for k, v in meta.items() if k != "classes"},
+            "generate_seconds": generate_seconds,
+            "workers": args.workers,
+            "chunksize": args.chunksize,
+            "cases": {},
+        }
+        for case in args.case or list(CASES):
+            results["cases"][case] = run_case(case, data_dir, meta, args.workers, args.chunksize, args.repeat)
+            print(f"{case}: {results['cases'][case]['seconds']}s", file=sys.stderr)
+    finally:
+        if generated:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    text = json.dumps(results, indent=4, ensure_ascii=False)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+离线生成YOLO、VOC、COCO三种格式的合成数据集, 供基准测试使用\n
+用法: python benchmarks/synthetic.py OUTPUT_DIR [--images 1000] [--boxes 8] [--classes 20] [--size 640x480] [--format jpg]\n
+生成的目录结构:\n
+    images/     图片, 同一尺寸和格式的图片内容相同, 只需编码一次\n
+    labels/     YOLO标注\n
+    voc/        VOC标注\n
+    coco.json   COCO标注\n
+    meta.json   生成参数及图片数、检测框数\n
+"""
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_annotations.writers import CocoWriter, coco_categories, voc_xml
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    """
+    解析形如640x480的图片尺寸\n
+    :param text: 尺寸字符串
+    :return: (宽, 高)
+    """
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def encode_image(width: int, height: int, image_format: str) -> bytes:
+    """
+    编码一张指定尺寸和格式的图片\n
+    :param width: 宽度
+    :param height: 高度
+    :param image_format: 图片格式, 例如jpg、png、bmp
+    :return: 图片文件的内容
+    """
+    import cv2
+    import numpy as np
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[::8, :, 1] = 255
+    ok, data = cv2.imencode("." + image_format, image)
+    if not ok:
+        raise ValueError(f"不支持的图片格式: {image_format}")
+    return data.tobytes()
+
+
+def generate(output_dir: str, images: int = 1000, boxes: int = 8, classes: int = 20, sizes: List[Tuple[int, int]] = ((640, 480),), image_format: str = "jpg", seed: int = 0) -> dict:
+    """
+    生成合成数据集\n
+    :param output_dir: 输出目录
+    :param images: 图片数
+    :param boxes: 每张图片的检测框数
+    :param classes: 类别数
+    :param sizes: 图片尺寸(宽, 高)的列表, 每张图片随机取其一
+    :param image_format: 图片格式
+    :param seed: 随机数种子
+    :return: 数据集的元信息
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    names = [f"class{i}" for i in range(classes)]
+    images_dir = os.path.join(output_dir, "images")
+    labels_dir = os.path.join(output_dir, "labels")
+    voc_dir = os.path.join(output_dir, "voc")
+    for path in (images_dir, labels_dir, voc_dir):
+        os.makedirs(path, exist_ok=True)
+    templates = [encode_image(w, h, image_format) for w, h in sizes]
+    with CocoWriter(os.path.join(output_dir, "coco.json"), coco_categories(names)) as writer:
+        for i in range(images):
+            stem = f"{i:08d}"
+            file_name = f"{stem}.{image_format}"
+            k = int(rng.integers(len(sizes)))
+            width, height = sizes[k]
+            with open(os.path.join(images_dir, file_name), "wb") as f:
+                f.write(templates[k])
+            class_ids = rng.integers(classes, size=boxes)
+            w = rng.uniform(0.02, 0.5, size=boxes)
+            h = rng.uniform(0.02, 0.5, size=boxes)
+            x = rng.uniform(w / 2, 1 - w / 2)
+            y = rng.uniform(h / 2, 1 - h / 2)
+            with open(os.path.join(labels_dir, stem + ".txt"), "w") as f:
+                f.write("\n".join(f"{c} {a:.6f} {b:.6f} {d:.6f} {e:.6f}" for c, a, b, d, e in zip(class_ids, x, y, w, h)))
+            xmin = ((x - w / 2) * width).astype(int)
+            ymin = ((y - h / 2) * height).astype(int)
+            xmax = ((x + w / 2) * width).astype(int)
+            ymax = ((y + h / 2) * height).astype(int)
+            objects = [(names[c], int(a), int(b), int(d), int(e)) for c, a, b, d, e in zip(class_ids, xmin, ymin, xmax, ymax)]
+            with open(os.path.join(voc_dir, stem + ".xml"), "w") as f:
+                f.write(voc_xml("images", file_name, os.path.join(images_dir, file_name), width, height, 3, objects))
+            writer.write({
+                "width": width,
+                "height": height,
+                "file_name": file_name,
+                "license": 0,
+                "flickr_url": "",
+                "coco_url": "",
+                "date_captured": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+            }, [{
+                "category_id": int(c),
+                "segmentation": [],
+                "area": int((d - a) * (e - b)),
+                "bbox": [int(a), int(b), int(d - a), int(e - b)],
+                "iscrowd": 0
+            } for c, a, b, d, e in zip(class_ids, xmin, ymin, xmax, ymax)])
+    meta = {
+        "images": images,
+        "boxes": images * boxes,
+        "classes": names,
+        "sizes": [list(x) for x in sizes],
+        "format": image_format,
+        "seed": seed,
+    }
+    with open(os.path.join(output_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=4, ensure_ascii=False)
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成的YOLO、VOC、COCO数据集")
+    parser.add_argument("output_dir", help="输出目录")
+    parser.add_argument("--images", type=int, default=1000, help="图片数")
+    parser.add_argument("--boxes", type=int, default=8, help="每张图片的检测框数")
+    parser.add_argument("--classes", type=int, default=20, help="类别数")
+    parser.add_argument("--size", action="append", type=parse_size, help="图片尺寸, 例如640x480, 可重复指定")
+    parser.add_argument("--format", default="jpg", help="图片格式, 例如jpg、png、bmp")
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    args = parser.parse_args()
+    meta = generate(args.output_dir, args.images, args.boxes, args.classes, args.size or [(640, 480)], args.format, args.seed)
+    print(json.dumps(meta, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,56 @@
 # -*- coding: utf-8 -*-
-from image_annotations.yolo import to_voc as yolo2voc
-from image_annotations.yolo import to_coco as yolo2coco
-from image_annotations.voc import to_yolo as voc2yolo
-from image_annotations.voc import to_coco as voc2coco
-from image_annotations.coco import to_yolo as coco2yolo
-from image_annotations.coco import to_voc as coco2voc
-from image_annotations.yolo import get_all_classes_ids as yolo_classes_ids
-from image_annotations.voc import get_all_classes as voc_classes
-from image_annotations.coco import get_all_classes as coco_classes
+from importlib import import_module
 
 
 __version__ = "0.2.2"
+
+# 对外暴露的名称 -> (模块, 属性), 首次访问时才导入对应模块, 避免import image_annotations时加载numpy、cv2、tqdm等重量级依赖
+_EXPORTS = {
+    "yolo2voc": ("image_annotations.yolo", "to_voc"),
+    "yolo2coco": ("image_annotations.yolo", "to_coco"),
+    "voc2yolo": ("image_annotations.voc", "to_yolo"),
+    "voc2coco": ("image_annotations.voc", "to_coco"),
+    "coco2yolo": ("image_annotations.coco", "to_yolo"),
+    "coco2voc": ("image_annotations.coco", "to_voc"),
+    "yolo2multi": ("image_annotations.yolo", "convert"),
+    "voc2multi": ("image_annotations.voc", "convert"),
+    "coco2multi": ("image_annotations.coco", "convert"),
+    "yolo2binary": ("image_annotations.yolo", "to_binary"),
+    "voc2binary": ("image_annotations.voc", "to_binary"),
+    "coco2binary": ("image_annotations.coco", "to_binary"),
+    "binary2yolo": ("image_annotations.binary", "to_yolo"),
+    "binary2voc": ("image_annotations.binary", "to_voc"),
+    "binary2coco": ("image_annotations.binary", "to_coco"),
+    "coco_merge": ("image_annotations.coco_ops", "merge"),
+    "coco_split": ("image_annotations.coco_ops", "split"),
+    "coco_append": ("image_annotations.coco_ops", "append"),
+    "yolo_classes_ids": ("image_annotations.yolo", "get_all_classes_ids"),
+    "voc_classes": ("image_annotations.voc", "get_all_classes"),
+    "coco_classes": ("image_annotations.coco", "get_all_classes"),
+    "yolo_class_stats": ("image_annotations.yolo", "class_stats"),
+    "voc_class_stats": ("image_annotations.voc", "class_stats"),
+    "coco_class_stats": ("image_annotations.coco", "class_stats"),
+    "Dataset": ("image_annotations.dataset", "Dataset"),
+    "Validator": ("image_annotations.validation", "Validator"),
+    "Subset": ("image_annotations.subset", "Subset"),
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    """
+    按需导入对外暴露的名称\n
+    :param name: 名称
+    :return: 对应的函数或类
+    """
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, attr = _EXPORTS[name]
+    value = getattr(import_module(module), attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
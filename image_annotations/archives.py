@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import time
+import uuid
+import struct
+import tarfile
+import zipfile
+from contextlib import ExitStack
+from typing import Optional, Iterator, Iterable, Tuple, Callable, Union, BinaryIO
+from image_annotations.utils import is_image, probe_shape
+from image_annotations.scan import Pairing, scan_dir, stem
+from image_annotations.metrics import ConversionStats, stage
+from image_annotations.pipeline import WriteBehind
+
+
+# 支持的归档文件后缀, tar包可带压缩
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz", ".zip")
+# 探测图片尺寸时先读取的字节数, 文件头不在其中时再读取整个文件
+_PROBE_BYTES = 1 << 16
+
+
+def is_archive(path: str) -> bool:
+    """
+    根据后缀判断路径是否是tar或zip归档文件\n
+    :param path: 路径
+    :return: 是否是归档文件
+    """
+    return path.lower().endswith(ARCHIVE_SUFFIXES) and not os.path.isdir(path)
+
+
+def archive_name(path: str) -> str:
+    """
+    去掉归档后缀的文件名, 例如images.tar.gz的名称为images\n
+    :param path: 归档文件路径
+    :return: 名称
+    """
+    name = os.path.basename(path)
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def iter_members(archive_path: str, predicate: Optional[Callable[[str], bool]] = None) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    按归档中的存储顺序依次读取成员, 不解压到磁盘, tar包以流的方式顺序读取\n
+    :param archive_path: 归档文件路径
+    :param predicate: 根据成员名判断是否需要读取的函数, 不需要的成员直接跳过
+    :return: (成员名, 成员内容的文件对象)的生成器, 文件对象只在取下一个成员前有效
+    """
+    if archive_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or (predicate is not None and not predicate(info.filename)):
+                    continue
+                with archive.open(info) as f:
+                    yield info.filename, f
+        return
+    with tarfile.open(archive_path, "r|*") as archive:
+        for member in archive:
+            if not member.isfile() or (predicate is not None and not predicate(member.name)):
+                continue
+            yield member.name, archive.extractfile(member)
+
+
+def stream_shape(f: BinaryIO) -> Union[Tuple[int, int, int], bytes]:
+    """
+    从只能顺序读取的文件对象中获取图片尺寸, 只解析文件头, 不解码图片\n
+    :param f: 图片内容的文件对象
+    :return: (高, 宽, 通道数), 与cv2解码后的shape一致; 文件头无法解析时返回图片的全部内容, 由转换时用bytes_shape解码
+    """
+    data = f.read(_PROBE_BYTES)
+    for attempt in range(2):
+        try:
+            shape = probe_shape(io.BytesIO(data))
+        except struct.error:
+            shape = None
+        if shape is not None:
+            return shape
+        if attempt == 0:
+            data = data + f.read()
+    return data
+
+
+def check_recursive(recursive: bool, *sources: str):
+    """
+    检查recursive参数: 归档中子文件夹里的成员总是会被读取, recursive只作用于文件夹输入, 输入全部是归档时不接受recursive=True\n
+    :param recursive: 是否遍历子文件夹
+    :param sources: 输入的文件夹或归档文件路径
+    """
+    if recursive and all(is_archive(x) for x in sources):
+        raise ValueError(f"归档中子文件夹里的成员总是会被读取, 归档输入不支持recursive: {', '.join(sources)}")
+
+
+def iter_texts(source: str, predicate: Callable[[str], bool], recursive: bool = False, stats: Optional[ConversionStats] = None) -> Iterator[Tuple[str, str]]:
+    """
+    依次读取文件夹或归档中的标注文件\n
+    :param source: 文件夹或归档文件路径
+    :param predicate: 根据文件名判断是否需要读取的函数
+    :param recursive: source为文件夹时是否遍历子文件夹, source为归档时总是读取子文件夹中的成员, 不能为True
+    :param stats: 统计, source为文件夹时记录遍历耗时及文件数
+    :return: (相对路径, 文件内容)的生成器
+    """
+    check_recursive(recursive, source)
+    if is_archive(source):
+        for name, f in iter_members(source, predicate):
+            yield name, _text(f.read())
+        return
+    for path in scan_dir(source, recursive, stats):
+        if predicate(path):
+            with open(os.path.join(source, path), "r") as f:
+                yield path, f.read()
+
+
+class ArchivePairing(Pairing):
+    """
+    配对归档中的图片与标注文件, 图片和标注可以在同一个归档(WebDataset风格的tar分片)中, 也可以分别在归档或文件夹中\n
+    归档中的图片在主进程中顺序读取文件头得到尺寸, 文件头无法解析的图片保留全部内容, 在转换时解码; 标注文件读取为文本, 转换时不再需要访问归档\n
+    图片和标注在同一个归档中时, 只暂存等待配对的一方; 标注单独存放时, 先把全部标注文件读入内存再顺序读取图片, 内存占用约为标注文件的总大小\n
+    归档中子文件夹里的成员总是会被读取, recursive只作用于文件夹输入\n
+    """
+
+    def __init__(self, images_dir: str, annotations_dir: str, label_suffix: str = ".txt", recursive: bool = False, image_filter: Callable[[str], bool] = is_image, keep: Optional[Callable[[str], bool]] = None):
+        """
+        构造函数\n
+        :param images_dir: 图片文件夹或归档
+        :param annotations_dir: 标注文件夹或归档
+        :param label_suffix: 标注文件后缀
+        :param recursive: 是否遍历子文件夹, 只作用于文件夹输入, 两者都是归档时不能为True
+        :param image_filter: 判断文件是否为图片的函数
+        :param keep: 按名称选择图片的函数, 例如Subset.keep_image, 不选择的图片不读取文件头, 对应的标注文件也不读取, None表示全部
+        """
+        check_recursive(recursive, images_dir, annotations_dir)
+        super().__init__(images_dir, annotations_dir, label_suffix, recursive, image_filter)
+        self.keep = keep
+        self.filtered = 0
+
+    def _selected(self, name: str) -> bool:
+        """
+        按名称判断是否读取一个图片或标注文件, 并记录跳过的图片数\n
+        :param name: 相对路径
+        :return: 是否读取
+        """
+        if self.keep is None or self.keep(name):
+            return True
+        if not name.endswith(self.label_suffix):
+            self.filtered = self.filtered + 1
+        return False
+
+    def __iter__(self) -> Iterator[Tuple[str, str, Optional[Tuple[int, int, int]], str]]:
+        """
+        遍历配对结果\n
+        :return: (图片相对路径, 标注文件相对路径, 图片尺寸, 标注文件内容)的生成器, 图片在文件夹中时尺寸为None, 文件头无法解析时为图片内容的字节
+        """
+        start = time.perf_counter()
+        is_label = lambda x: x.endswith(self.label_suffix)
+        wanted_label = lambda x: is_label(x) and self._selected(x)
+        wanted_image = lambda x: self.image_filter(x) and self._selected(x)
+        images, labels, matched = {}, {}, set()
+        if self.images_dir == self.annotations_dir:
+            # 同一个归档中的图片和标注通常相邻存放, 先到的一方暂存, 等另一方到达后配对
+            members = iter_members(self.images_dir, lambda x: wanted_label(x) if is_label(x) else wanted_image(x))
+        else:
+            for name, text in iter_texts(self.annotations_dir, wanted_label, self.recursive):
+                labels[stem(name)] = (name, text)
+            if is_archive(self.images_dir):
+                members = iter_members(self.images_dir, wanted_image)
+            else:
+                members = ((x, None) for x in scan_dir(self.images_dir, self.recursive) if wanted_image(x))
+        for name, f in members:
+            key = stem(name)
+            if is_label(name):
+                if key in images:
+                    image, shape = images.pop(key)
+                    self.paired = self.paired + 1
+                    self.seconds = self.seconds + time.perf_counter() - start
+                    yield image, name, shape, _text(f.read())
+                    start = time.perf_counter()
+                else:
+                    labels[key] = (name, _text(f.read()))
+                continue
+            shape = None if f is None else stream_shape(f)
+            if key not in labels:
+                images[key] = (name, shape)
+                continue
+            label, text = labels.pop(key) if self.images_dir == self.annotations_dir else labels[key]
+            matched.add(key)
+            self.paired = self.paired + 1
+            self.seconds = self.seconds + time.perf_counter() - start
+            yield name, label, shape, text
+            start = time.perf_counter()
+        self.unpaired_images = [x[0] for x in images.values()]
+        self.unpaired_labels = [v[0] for k, v in labels.items() if k not in matched]
+        self.seconds = self.seconds + time.perf_counter() - start
+
+    def record(self, stats: Optional[ConversionStats]):
+        """
+        在配对情况之外记录按名称跳过的图片数, 在遍历结束后调用\n
+        :param stats: 统计
+        """
+        super().record(stats)
+        if stats is not None and self.filtered:
+            stats.count("filtered", self.filtered)
+
+
+def _text(data: Union[str, bytes]) -> str:
+    """
+    把标注文件内容统一为文本, 与以文本模式打开文件一样把\\r\\n及\\r统一为\\n\n
+    :param data: 文本或字节
+    :return: 文本
+    """
+    return io.StringIO(data.decode("utf-8") if isinstance(data, bytes) else data, newline=None).getvalue()
+
+
+class ArchiveWriter(object):
+    """
+    把转换结果写入一个tar或zip归档, 代替在输出文件夹中写大量小文件\n
+    先写入同一文件夹中的临时文件, 关闭时再替换归档文件, 中途出错时删除临时文件, 原有的归档文件保持原样\n
+    """
+
+    def __init__(self, archive_path: str):
+        """
+        构造函数\n
+        :param archive_path: 归档文件路径, 按后缀决定格式及压缩方式
+        """
+        self.archive_path = archive_path
+        self.members = 0
+        folder, name = os.path.split(os.path.abspath(archive_path))
+        self._temp_path = os.path.join(folder, f".{name}.{uuid.uuid4().hex}.tmp")
+        lower = archive_path.lower()
+        if lower.endswith(".zip"):
+            self._zip = zipfile.ZipFile(self._temp_path, "w", zipfile.ZIP_DEFLATED)
+            self._tar = None
+        else:
+            mode = "w"
+            for suffixes, compression in (((".tar.gz", ".tgz"), "gz"), ((".tar.bz2", ".tbz2"), "bz2"), ((".tar.xz", ".txz"), "xz")):
+                if lower.endswith(suffixes):
+                    mode = "w:" + compression
+            self._zip = None
+            self._tar = tarfile.open(self._temp_path, mode)
+        self._mtime = time.time()
+        self._closed = False
+
+    def write(self, name: str, data: Union[str, bytes]):
+        """
+        写入一个成员\n
+        :param name: 成员名, 以/分隔
+        :param data: 成员内容, 文本按utf-8编码
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if self._zip is not None:
+            self._zip.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = self._mtime
+            self._tar.addfile(info, io.BytesIO(data))
+        self.members = self.members + 1
+
+    def close(self):
+        """
+        关闭归档, 写完后替换归档文件\n
+        """
+        if self._closed:
+            return
+        try:
+            (self._zip or self._tar).close()
+        except BaseException:
+            self.abort()
+            raise
+        self._closed = True
+        os.replace(self._temp_path, self.archive_path)
+
+    def abort(self):
+        """
+        放弃写入, 关闭并删除临时文件, 原有的归档文件保持原样\n
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            (self._zip or self._tar).close()
+        finally:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class DirectoryWriter(object):
+    """
+    把转换结果写入输出文件夹, 接口与ArchiveWriter相同, 用于后台写出, 可以在多个线程中同时写入\n
+    """
+
+    def __init__(self, output_dir: str):
+        """
+        构造函数\n
+        :param output_dir: 输出文件夹
+        """
+        self.output_dir = output_dir
+
+    def write(self, name: str, data: Union[str, bytes]):
+        """
+        写入一个文件\n
+        :param name: 相对输出文件夹的路径, 以/分隔, 在子文件夹中时创建对应的子文件夹
+        :param data: 文件内容
+        """
+        path = os.path.join(self.output_dir, name)
+        if "/" in name:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w" if isinstance(data, str) else "wb") as f:
+            f.write(data)
+
+    def close(self):
+        """
+        没有需要释放的资源\n
+        """
+
+    def abort(self):
+        """
+        已经写出的文件保留在输出文件夹中, 与不在后台写出时一致\n
+        """
+
+
+def open_sink(output: str, incremental: bool = False) -> Optional[ArchiveWriter]:
+    """
+    输出路径是归档文件时打开归档写入器\n
+    :param output: 输出文件夹或归档文件路径
+    :param incremental: 是否增量转换, 归档输出不支持增量转换
+    :return: 归档写入器, 输出为文件夹时返回None
+    """
+    if not is_archive(output):
+        return None
+    if incremental:
+        raise ValueError(f"归档输出不支持增量转换: {output}")
+    return ArchiveWriter(output)
+
+
+def open_output(stack: ExitStack, output: str, incremental: bool = False, io_threads: int = 0) -> Union[None, ArchiveWriter, WriteBehind]:
+    """
+    准备输出: 输出为文件夹时创建文件夹, 输出为归档时打开归档写入器并在stack退出时关闭\n
+    :param stack: 管理归档写入器生命周期的ExitStack
+    :param output: 输出文件夹或归档文件路径
+    :param incremental: 是否增量转换, 归档输出不支持增量转换
+    :param io_threads: 大于0时在后台线程中写出结果, 输出为文件夹时用这么多个线程, 归档只用1个线程; 增量转换的输出仍由转换函数直接写入, 保证清单中记录的输出已经写出
+    :return: 写入器, 输出为文件夹且不在后台写出时返回None
+    """
+    sink = open_sink(output, incremental)
+    if sink is None:
+        os.makedirs(output, exist_ok=True)
+        if io_threads > 0 and not incremental:
+            sink = stack.enter_context(WriteBehind(DirectoryWriter(output), io_threads))
+    else:
+        # WriteBehind关闭时一并关闭被包装的归档
+        sink = stack.enter_context(WriteBehind(sink, 1) if io_threads > 0 else sink)
+    return sink
+
+
+def write_result(result, sink: Optional[ArchiveWriter], stats: Optional[ConversionStats] = None) -> int:
+    """
+    收集一个输入的转换结果\n
+    :param result: sink为None时为已写入的文件数, 否则为(成员名, 内容), 不需要输出或被跳过时为假值
+    :param sink: 写入器, 见open_output
+    :param stats: 统计
+    :return: 转换的文件数
+    """
+    if not result:
+        return 0
+    if sink is None:
+        return result
+    with stage("write", stats):
+        sink.write(*result)
+    return 1
+
+
+def write_results(results: Iterable, sink: Optional[ArchiveWriter], stats: Optional[ConversionStats] = None) -> int:
+    """
+    收集逐个输入的转换结果\n
+    :param results: sink为None时为已写入的文件数, 否则为(成员名, 内容)
+    :param sink: 写入器, 见open_output
+    :param stats: 统计
+    :return: 转换的文件数
+    """
+    return sum(write_result(x, sink, stats) for x in results)
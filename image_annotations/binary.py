@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import struct
+from typing import List, Optional, Iterator, Sequence, Union, Tuple
+import numpy as np
+from image_annotations.exceptions import BadFileException
+from image_annotations.metrics import ConversionStats, stage, timed
+
+
+# 文件格式: 8字节魔数, 8字节小端无符号整数表示的头部长度, utf-8编码的json头部, 然后是按_ALIGN字节对齐的各个数组
+# 头部记录类别名称以及每个数组的dtype、shape和相对数据区起点的偏移, 字符串表以utf-8字节数组加上(N+1)个偏移的形式保存
+MAGIC = b"IADSET\x00\x01"
+SUFFIX = ".iads"
+_ALIGN = 64
+_VERSION = 1
+# Dataset中以数组保存的列, 读取时直接作为内存映射的视图, 不会复制
+_COLUMNS = ("widths", "heights", "depths", "image_ids", "offsets", "box_images", "class_ids", "x", "y", "w", "h")
+
+
+def _aligned(n: int) -> int:
+    """
+    向上对齐到_ALIGN的整数倍\n
+    :param n: 字节数
+    :return: 对齐后的字节数
+    """
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class StringTable(Sequence):
+    """
+    保存在连续字节数组中的字符串列表, 按下标访问时才解码, 读取二进制数据集时不需要逐个创建字符串\n
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        """
+        构造函数\n
+        :param data: 全部字符串utf-8编码后拼接成的uint8数组
+        :param offsets: (N+1)个int64偏移, 第i个字符串为data[offsets[i]:offsets[i+1]]
+        """
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def encode(cls, strings: Sequence[str]) -> "StringTable":
+        """
+        把字符串列表编码成字符串表\n
+        :param strings: 字符串列表
+        :return: 字符串表
+        """
+        encoded = [x.encode("utf-8") for x in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index = index + len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.data[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        # 顺序遍历时一次取出全部字节, 避免逐个切片
+        data = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield data[start:end].decode("utf-8")
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({len(self)} strings)"
+
+
+def save(dataset: "Dataset", path: str) -> int:
+    """
+    把数据集保存为二进制格式\n
+    :param dataset: 数据集
+    :param path: 输出路径, 通常以.iads结尾
+    :return: 保存了几张图片
+    """
+    names = dataset.file_names if isinstance(dataset.file_names, StringTable) else StringTable.encode(dataset.file_names)
+    arrays = [(name, getattr(dataset, name)) for name in _COLUMNS]
+    arrays = arrays + [("file_names.data", names.data), ("file_names.offsets", names.offsets)]
+    layout = {}
+    position = 0
+    for name, array in arrays:
+        # 统一保存为小端字节序, 读取时无需转换
+        dtype = array.dtype.newbyteorder("<")
+        layout[name] = {"dtype": dtype.str, "shape": list(array.shape), "offset": position}
+        position = _aligned(position + array.size * dtype.itemsize)
+    header = json.dumps({"version": _VERSION, "classes": dataset.classes, "images": len(dataset), "boxes": dataset.num_boxes, "arrays": layout}, ensure_ascii=False).encode("utf-8")
+    start = _aligned(len(MAGIC) + 8 + len(header))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+        for name, array in arrays:
+            f.write(b"\x00" * (start + layout[name]["offset"] - f.tell()))
+            f.write(np.ascontiguousarray(array, dtype=layout[name]["dtype"]).tobytes())
+        f.write(b"\x00" * (start + position - f.tell()))
+    return len(dataset)
+
+
+def _read_header(path: str) -> Tuple[dict, int]:
+    """
+    读取并校验文件头部\n
+    :param path: 文件路径
+    :return: (头部, 数据区起点)
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(len(MAGIC) + 8)
+        if len(prefix) < len(MAGIC) + 8 or prefix[:len(MAGIC)] != MAGIC:
+            raise BadFileException(path, "不是二进制数据集文件")
+        length = struct.unpack("<Q", prefix[len(MAGIC):])[0]
+        header = json.loads(f.read(length).decode("utf-8"))
+    if header.get("version") != _VERSION:
+        raise BadFileException(path, f"不支持的版本{header.get('version')}")
+    return header, _aligned(len(MAGIC) + 8 + length)
+
+
+def load(path: str) -> "Dataset":
+    """
+    以内存映射的方式读取二进制格式的数据集, 数组都是只读的映射视图, 不会读入或复制数据\n
+    :param path: 文件路径
+    :return: 数据集
+    """
+    from image_annotations.dataset import Dataset
+    header, start = _read_header(path)
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    arrays = {}
+    for name, item in header["arrays"].items():
+        dtype = np.dtype(item["dtype"])
+        begin = start + item["offset"]
+        end = begin + int(np.prod(item["shape"], dtype=np.int64)) * dtype.itemsize
+        if end > len(buffer):
+            raise BadFileException(path, f"数组{name}超出文件末尾")
+        arrays[name] = buffer[begin:end].view(dtype).reshape(item["shape"])
+    names = StringTable(arrays.pop("file_names.data"), arrays.pop("file_names.offsets"))
+    return Dataset.from_columns(header["classes"], names, **arrays)
+
+
+def read_classes(path: str) -> List[str]:
+    """
+    只读取头部, 获取全部类别名称\n
+    :param path: 文件路径
+    :return: 全部类别名称组成的列表, 类别ID即为其下标
+    """
+    return _read_header(path)[0]["classes"]
+
+
+def to_yolo(binary_path: str, output_dir: str, stats: Optional[ConversionStats] = None) -> int:
+    """
+    把二进制格式的数据集转换成YOLO格式, 不需要解析任何标注文件\n
+    :param binary_path: 二进制数据集路径
+    :param output_dir: 输出文件夹
+    :param stats: 记录各阶段耗时及计数的统计
+    :return: 转换了几张图片
+    """
+    with timed(stats, "binary.to_yolo"):
+        with stage("parse", stats):
+            dataset = load(binary_path)
+        with stage("write", stats):
+            return _counted(dataset, dataset.to_yolo(output_dir), stats)
+
+
+def to_voc(binary_path: str, images_dir: str, output_dir: str, stats: Optional[ConversionStats] = None) -> int:
+    """
+    把二进制格式的数据集转换成VOC格式, 不需要解析任何标注文件\n
+    :param binary_path: 二进制数据集路径
+    :param images_dir: 图片文件夹
+    :param output_dir: 输出文件夹
+    :param stats: 记录各阶段耗时及计数的统计
+    :return: 转换了几张图片
+    """
+    with timed(stats, "binary.to_voc"):
+        with stage("parse", stats):
+            dataset = load(binary_path)
+        with stage("write", stats):
+            return _counted(dataset, dataset.to_voc(output_dir, images_dir), stats)
+
+
+def to_coco(binary_path: str, output_path: str, indent: Optional[int] = 4, stats: Optional[ConversionStats] = None) -> int:
+    """
+    把二进制格式的数据集转换成COCO格式, 不需要解析任何标注文件\n
+    :param binary_path: 二进制数据集路径
+    :param output_path: 输出路径
+    :param indent: 输出json的缩进空格数, None表示不带空白的紧凑格式
+    :param stats: 记录各阶段耗时及计数的统计
+    :return: 转换了几张图片
+    """
+    with timed(stats, "binary.to_coco"):
+        with stage("parse", stats):
+            dataset = load(binary_path)
+        with stage("write", stats):
+            return _counted(dataset, dataset.to_coco(output_path, indent), stats)
+
+
+def _counted(dataset: "Dataset", converted: int, stats: Optional[ConversionStats]) -> int:
+    """
+    记录转换的图片数及检测框数\n
+    :param dataset: 数据集
+    :param converted: 转换了几张图片
+    :param stats: 统计
+    :return: converted
+    """
+    if stats is not None:
+        stats.count("images", converted)
+        stats.count("boxes", dataset.num_boxes)
+    return converted
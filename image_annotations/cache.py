@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import sqlite3
+from typing import List, Optional, Tuple, Union
+from image_annotations.utils import image_shape, parallel_map, Skipping
+from image_annotations.metrics import ConversionStats, stage
+
+
+def default_cache_path() -> str:
+    """
+    默认的图片信息缓存路径\n
+    :return: 缓存文件路径
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "image_annotations", "images.sqlite")
+
+
+# 命中的缓存距离上次更新最近使用时间超过这么多秒才再次更新, 淘汰顺序只需要精确到这个粒度
+_TOUCH_INTERVAL = 3600.0
+
+
+class ImageCache(object):
+    """
+    持久化的图片尺寸缓存, 以图片的绝对路径为键, 文件大小或修改时间变化后缓存失效\n
+    缓存条目数超过上限时按最近使用时间淘汰\n
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, max_entries: int = 10000000):
+        """
+        构造函数\n
+        :param cache_path: 缓存文件路径, 默认为default_cache_path()
+        :param max_entries: 最多缓存多少张图片
+        """
+        self.cache_path = default_cache_path() if cache_path is None else cache_path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        self._connection = sqlite3.connect(self.cache_path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS images (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, height INTEGER, width INTEGER, depth INTEGER, used REAL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS images_used ON images (used)")
+
+    def _lookup(self, path: str) -> Tuple[Optional[Tuple[int, int, int]], float]:
+        """
+        查询一张图片的缓存, 不更新最近使用时间\n
+        :param path: 图片的绝对路径
+        :return: ((高, 宽, 通道数), 最近使用时间), 没有缓存、缓存已失效或无法获取文件信息时尺寸为None
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # 文件不存在或没有权限时视为未命中, 由读取图片时报告BadFileException
+            return None, 0.0
+        row = self._connection.execute("SELECT size, mtime, height, width, depth, used FROM images WHERE path = ?", (path,)).fetchone()
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns:
+            return None, 0.0
+        return (row[2], row[3], row[4]), row[5]
+
+    def _touch(self, paths: List[str]):
+        """
+        批量更新命中的缓存的最近使用时间\n
+        :param paths: 图片的绝对路径
+        """
+        now = time.time()
+        self._connection.executemany("UPDATE images SET used = ? WHERE path = ?", ((now, x) for x in paths))
+
+    def get(self, image_path: str) -> Optional[Tuple[int, int, int]]:
+        """
+        读取缓存的图片尺寸, 不会读取图片内容\n
+        :param image_path: 图片路径
+        :return: (高, 宽, 通道数), 没有缓存、缓存已失效或无法获取文件信息时返回None
+        """
+        path = os.path.abspath(image_path)
+        shape, used = self._lookup(path)
+        if shape is not None and time.time() - used >= _TOUCH_INTERVAL:
+            self._touch([path])
+        return shape
+
+    def put(self, image_path: str, shape: Tuple[int, int, int]):
+        """
+        写入图片尺寸, 会替换掉同一路径上已失效的缓存\n
+        :param image_path: 图片路径
+        :param shape: (高, 宽, 通道数)
+        """
+        path = os.path.abspath(image_path)
+        stat = os.stat(path)
+        self._connection.execute(
+            "INSERT OR REPLACE INTO images (path, size, mtime, height, width, depth, used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns, shape[0], shape[1], shape[2], time.time())
+        )
+
+    def shapes(self, image_paths: List[str], workers: Optional[int] = 1, chunksize: int = 64, stats: Optional[ConversionStats] = None, on_error: str = "raise") -> List[Optional[Tuple[int, int, int]]]:
+        """
+        批量获取图片尺寸, 只有没有命中缓存的图片才会被读取, 读取结果写回缓存\n
+        :param image_paths: 图片路径
+        :param workers: 读取图片时并行的进程数
+        :param chunksize: 每次分发给子进程的图片数
+        :param stats: 记录查询缓存及读取图片耗时的统计
+        :param on_error: 图片损坏时的处理方式, raise表示抛出BadFileException, skip表示该图片的尺寸为None且不写入缓存, 由转换时重新读取并记录错误
+        :return: 与image_paths一一对应的(高, 宽, 通道数)
+        """
+        with stage("cache", stats):
+            paths = [os.path.abspath(x) for x in image_paths]
+            results, stale = [], []
+            deadline = time.time() - _TOUCH_INTERVAL
+            for path in paths:
+                shape, used = self._lookup(path)
+                results.append(shape)
+                if shape is not None and used <= deadline:
+                    stale.append(path)
+            # 命中的缓存一次批量更新最近使用时间, 最近更新过的条目不再写入
+            self._touch(stale)
+        missing = [i for i, x in enumerate(results) if x is None]
+        if stats is not None:
+            stats.count("cache_hits", len(results) - len(missing))
+        probe = image_shape if on_error == "raise" else Skipping(image_shape)
+        for i, shape in zip(missing, parallel_map(probe, [image_paths[i] for i in missing], workers, chunksize, stats)):
+            # 读取失败的结果为假, 不写入缓存
+            if not shape:
+                continue
+            results[i] = tuple(shape)
+            with stage("cache", stats):
+                self.put(image_paths[i], shape)
+        with stage("cache", stats):
+            self.evict()
+            self._connection.commit()
+        return results
+
+    def evict(self) -> int:
+        """
+        淘汰最久未使用的缓存, 使条目数不超过上限\n
+        :return: 淘汰的条目数
+        """
+        count = self._connection.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+        if count <= self.max_entries:
+            return 0
+        self._connection.execute(
+            "DELETE FROM images WHERE path IN (SELECT path FROM images ORDER BY used LIMIT ?)",
+            (count - self.max_entries,)
+        )
+        return count - self.max_entries
+
+    def close(self):
+        """
+        提交并关闭缓存\n
+        """
+        self._connection.commit()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_cache(image_cache: Union[None, bool, str]) -> Optional[ImageCache]:
+    """
+    根据转换函数的image_cache参数打开缓存\n
+    :param image_cache: None或False表示不使用缓存, True表示使用默认路径, 字符串表示缓存文件路径
+    :return: 缓存, 不使用缓存时返回None
+    """
+    if image_cache is None or image_cache is False:
+        return None
+    return ImageCache(None if image_cache is True else image_cache)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, Optional, Callable, Iterable, Iterator, Sequence, Tuple, Any
+from contextlib import closing
+import numpy as np
+from image_annotations.utils import parallel_map
+from image_annotations.metrics import ConversionStats, Progress, track
+
+
+# 像素坐标系下检测框尺寸(面积的平方根)的默认分箱, 与COCO的small/medium/large划分一致
+PIXEL_BINS = (0.0, 32.0, 96.0, float("inf"))
+# YOLO归一化坐标下检测框尺寸的默认分箱
+RELATIVE_BINS = (0.0, 0.05, 0.15, 0.3, float("inf"))
+
+
+class ClassStats(object):
+    """
+    数据集中各类别的统计: 检测框数、出现的图片数及检测框尺寸的直方图\n
+    检测框尺寸为面积的平方根, YOLO为归一化后的值, VOC及COCO为像素值\n
+    """
+
+    def __init__(self, bins: Sequence[float] = PIXEL_BINS):
+        """
+        构造函数\n
+        :param bins: 尺寸直方图的分箱边界, 超出范围的值计入第一个或最后一个分箱
+        """
+        self.bins = np.asarray(bins, dtype=np.float64)
+        self.objects: Dict[Any, int] = {}
+        self.images: Dict[Any, int] = {}
+        self.histograms: Dict[Any, np.ndarray] = {}
+        self.names: Dict[Any, str] = {}
+        self.files = 0
+        self.complete = True
+
+    @property
+    def classes(self) -> list:
+        """
+        出现过的全部类别, 已排序\n
+        :return: 类别ID或类别名称组成的列表
+        """
+        return sorted(self.objects)
+
+    def update(self, keys: Sequence, sizes: Sequence[float], images: Optional[Sequence[int]] = None):
+        """
+        累加一批检测框\n
+        :param keys: 每个检测框的类别ID或类别名称
+        :param sizes: 每个检测框的尺寸
+        :param images: 每个检测框所属图片的编号, 为None时表示这批检测框都属于同一张图片
+        """
+        keys = np.asarray(keys)
+        if len(keys) == 0:
+            return
+        sizes = np.asarray(sizes, dtype=np.float64)
+        unique, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        objects = np.bincount(inverse, minlength=len(unique))
+        if images is None:
+            image_counts = np.ones(len(unique), dtype=np.int64)
+        else:
+            pairs = np.unique(np.stack([inverse, np.asarray(images, dtype=np.int64)]), axis=1)
+            image_counts = np.bincount(pairs[0], minlength=len(unique))
+        index = np.clip(np.searchsorted(self.bins, sizes, side="right") - 1, 0, len(self.bins) - 2)
+        histograms = np.zeros((len(unique), len(self.bins) - 1), dtype=np.int64)
+        np.add.at(histograms, (inverse, index), 1)
+        for i, key in enumerate(unique.tolist()):
+            self.objects[key] = self.objects.get(key, 0) + int(objects[i])
+            self.images[key] = self.images.get(key, 0) + int(image_counts[i])
+            if key in self.histograms:
+                self.histograms[key] = self.histograms[key] + histograms[i]
+            else:
+                self.histograms[key] = histograms[i]
+
+    def merge(self, other: "ClassStats"):
+        """
+        合并另一份统计, 分箱必须相同\n
+        :param other: 另一份统计
+        """
+        for key, value in other.objects.items():
+            self.objects[key] = self.objects.get(key, 0) + value
+            self.images[key] = self.images.get(key, 0) + other.images[key]
+            self.histograms[key] = self.histograms.get(key, 0) + other.histograms[key]
+        self.names.update(other.names)
+        self.files = self.files + other.files
+        self.complete = self.complete and other.complete
+
+    def as_dict(self) -> dict:
+        """
+        转换为字典, 便于输出为json\n
+        :return: 字典
+        """
+        return {
+            "files": self.files,
+            "complete": self.complete,
+            "bins": self.bins.tolist(),
+            "classes": [
+                {
+                    "class": key,
+                    "name": self.names.get(key, key),
+                    "objects": self.objects[key],
+                    "images": self.images[key],
+                    "histogram": self.histograms[key].tolist()
+                } for key in self.classes
+            ]
+        }
+
+    def __repr__(self) -> str:
+        classes = ", ".join(f"{self.names.get(k, k)}={self.objects[k]}" for k in self.classes)
+        return f"{self.__class__.__name__}({self.files} files{'' if self.complete else ', partial'}: {classes})"
+
+
+def _limited(items: Iterable, sample: int, result: ClassStats) -> Iterator:
+    """
+    最多返回sample个元素, 还有剩余元素时把统计标记为不完整\n
+    :param items: 元素
+    :param sample: 最多返回的个数
+    :param result: 统计
+    :return: 元素的迭代器
+    """
+    iterator = iter(items)
+    for _ in range(sample):
+        try:
+            yield next(iterator)
+        except StopIteration:
+            return
+    for _ in iterator:
+        result.complete = False
+        return
+
+
+def scan(func: Callable[[Any], Tuple[Sequence, Sequence[float]]], items: Iterable, bins: Sequence[float], workers: Optional[int] = 1, chunksize: int = 64, sample: Optional[int] = None, stable_after: Optional[int] = None, progress: Progress = None, stats: Optional[ConversionStats] = None) -> ClassStats:
+    """
+    逐文件统计类别, 可以并行, 可以只统计一部分文件后提前结束\n
+    :param func: 处理一个文件的函数, 返回(每个检测框的类别, 每个检测框的尺寸), 多进程时必须能被pickle
+    :param items: 待处理的文件
+    :param bins: 尺寸直方图的分箱边界
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param sample: 最多统计多少个文件, None表示全部
+    :param stable_after: 连续这么多个文件没有出现新类别时提前结束, None表示不提前结束
+    :param progress: 进度报告方式
+    :param stats: 记录各阶段耗时及计数的统计
+    :return: 类别统计, 提前结束时complete为False
+    """
+    result = ClassStats(bins)
+    if sample is not None:
+        items = _limited(items, sample, result)
+    unchanged = 0
+    # 提前结束时关闭生成器, 进程池随之终止
+    with closing(parallel_map(func, items, workers, chunksize, stats)) as results:
+        for keys, sizes in track(results, None, progress):
+            known = len(result.objects)
+            result.files = result.files + 1
+            result.update(keys, sizes)
+            unchanged = unchanged + 1 if len(result.objects) == known else 0
+            if stable_after is not None and unchanged >= stable_after:
+                result.complete = False
+                break
+    if stats is not None:
+        stats.count("boxes", sum(result.objects.values()))
+        stats.count("images", result.files)
+    return result
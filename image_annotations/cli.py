@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import sys
+import json
+import argparse
+from typing import List, Optional
+from image_annotations.exceptions import BadFileException
+from image_annotations.metrics import ConversionStats, LogProgress
+
+
+# 每个子命令的位置参数, 与转换函数的参数名一致
+_COMMANDS = {
+    "yolo2voc": ("image_annotations.yolo", "to_voc", ("images_dir", "annotations_dir", "output_dir")),
+    "yolo2coco": ("image_annotations.yolo", "to_coco", ("images_dir", "annotations_dir", "output_path")),
+    "voc2yolo": ("image_annotations.voc", "to_yolo", ("annotations_dir", "output_dir")),
+    "voc2coco": ("image_annotations.voc", "to_coco", ("annotations_dir", "output_path")),
+    "coco2yolo": ("image_annotations.coco", "to_yolo", ("annotation_path", "output_dir")),
+    "coco2voc": ("image_annotations.coco", "to_voc", ("annotation_path", "images_dir", "output_dir")),
+}
+# 报告中最多打印的损坏文件数, 完整列表见--report
+_SHOWN_ERRORS = 20
+
+
+def _parser() -> argparse.ArgumentParser:
+    """
+    构造命令行解析器\n
+    :return: 解析器
+    """
+    parser = argparse.ArgumentParser(prog="image-annotations", description="图像标注格式转换器, 转换YOLO、VOC、COCO格式的图像标注文件")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, (_, _, positionals) in _COMMANDS.items():
+        sub = subparsers.add_parser(command, help=f"{command.replace('2', '格式转')}格式")
+        for name in positionals:
+            sub.add_argument(name)
+        if not command.startswith("coco"):
+            sub.add_argument("--classes", required=command.startswith("yolo"), help="类别文件, 每行一个类别名称, 行号即类别ID, VOC输入省略时从标注中收集")
+            sub.add_argument("--recursive", action="store_true", help="遍历子文件夹, 只作用于文件夹输入, 归档中子文件夹里的成员总是会被读取")
+            sub.add_argument("--checksum", action="store_true", help="断点续转时, 文件大小或修改时间变化后再比较文件内容")
+        if command.startswith("yolo"):
+            sub.add_argument("--image-cache", nargs="?", const=True, default=None, help="图片尺寸缓存, 不带值时使用默认路径")
+        if command.endswith("coco"):
+            sub.add_argument("--indent", type=int, default=4, help="输出json的缩进空格数, 默认4")
+            sub.add_argument("--compact", action="store_true", help="输出不带空白的紧凑json")
+        sub.add_argument("--workers", type=int, default=1, help="并行的进程数, 0表示使用全部CPU, 默认1")
+        sub.add_argument("--io-threads", type=int, default=0, help="预读输入及在后台写出结果的线程数, 适合NFS、对象存储等延迟高的文件系统, 默认0表示不启用")
+        sub.add_argument("--chunksize", type=int, default=64, help="每次分发给子进程的文件数, 默认64")
+        sub.add_argument("--on-error", choices=("raise", "skip"), default="raise", help="遇到损坏的文件时中止(raise)还是跳过并报告(skip), 默认raise")
+        sub.add_argument("--validate", nargs="?", const="default", choices=("default", "report", "drop"), default=None, help="校验检测框, 不带值时使用默认策略(越界裁剪, 其余丢弃), report只计数, drop全部丢弃")
+        sub.add_argument("--min-area", type=float, default=0.0, help="校验时检测框的最小面积(像素), 默认0表示不检查")
+        sub.add_argument("--select-classes", nargs="+", default=None, help="只转换这些类别的检测框, 保留的类别按给出的顺序重新编号")
+        sub.add_argument("--select-images", nargs="+", default=None, help="只转换这些图片, 与去掉后缀的相对路径比较, 可以含有通配符")
+        sub.add_argument("--min-box-area", type=float, default=0.0, help="只转换面积不小于该值(像素)的检测框")
+        sub.add_argument("--max-box-area", type=float, default=None, help="只转换面积不大于该值(像素)的检测框")
+        sub.add_argument("--sample", type=float, default=None, help="按文件名的哈希值只转换这个比例的图片, 0到1之间")
+        sub.add_argument("--seed", type=int, default=0, help="--sample抽样的随机种子, 默认0")
+        sub.add_argument("--keep-empty", action="store_true", help="按类别或面积过滤后没有检测框的图片仍然输出")
+        sub.add_argument("--no-remap", action="store_true", help="不重新编号保留的类别, 保持原来的类别ID")
+        sub.add_argument("--no-checkpoint", action="store_true", help="不记录检查点, 中断后需要从头转换; 输入或输出为归档时总是不记录")
+        sub.add_argument("--report", help="把统计及跳过的文件写入该json文件")
+        sub.add_argument("--log-interval", type=float, default=None, help="每隔这么多秒把进度写入日志, 代替进度条")
+        sub.add_argument("--quiet", action="store_true", help="不显示进度")
+    return parser
+
+
+def _read_classes(path: str) -> List[str]:
+    """
+    读取类别文件\n
+    :param path: 文件路径, 每行一个类别名称
+    :return: 类别名称组成的列表
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _report(stats: ConversionStats, converted: int, report: Optional[str]):
+    """
+    输出转换结果及跳过的文件\n
+    :param stats: 统计
+    :param converted: 转换数
+    :param report: 统计输出路径
+    """
+    print(f"{stats.converter}: 转换{converted}个, 跳过{len(stats.errors)}个损坏的文件, 复用检查点中的{stats.counts.get('reused', 0)}个", file=sys.stderr)
+    for error in stats.errors[:_SHOWN_ERRORS]:
+        print(f"  {error['path']}: {error['message']}", file=sys.stderr)
+    if len(stats.errors) > _SHOWN_ERRORS:
+        print(f"  ...共{len(stats.errors)}个", file=sys.stderr)
+    if report is not None:
+        with open(report, "w", encoding="utf-8") as f:
+            json.dump({"converted": converted, **stats.as_dict()}, f, indent=4, ensure_ascii=False)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    命令行入口, 把一次转换作为可断点续转的任务运行\n
+    默认以增量方式转换并定期提交检查点, 中断或出错后用相同的命令重新运行, 已完成且没有变化的文件直接复用上次的结果\n
+    :param argv: 命令行参数, 默认为sys.argv[1:]
+    :return: 退出码, 0表示成功
+    """
+    from importlib import import_module
+    from image_annotations.archives import is_archive
+    args = _parser().parse_args(argv)
+    module, name, positionals = _COMMANDS[args.command]
+    module = import_module(module)
+    kwargs = {x: getattr(args, x) for x in positionals}
+    kwargs.update(workers=args.workers or None, chunksize=args.chunksize, on_error=args.on_error, io_threads=args.io_threads)
+    if args.validate is not None:
+        from image_annotations.validation import Validator
+        kwargs["validate"] = Validator(True if args.validate == "default" else args.validate, args.min_area)
+    if args.select_classes or args.select_images or args.min_box_area > 0 or args.max_box_area is not None or args.sample is not None:
+        from image_annotations.subset import Subset
+        kwargs["subset"] = Subset(args.select_classes, args.min_box_area, args.max_box_area, args.select_images, args.sample, args.seed, not args.no_remap, args.keep_empty)
+    if args.command.startswith("yolo"):
+        kwargs["classes"] = _read_classes(args.classes)
+        kwargs["image_cache"] = args.image_cache
+    elif args.command.startswith("voc"):
+        # 收集到的类别按名称排序, 保证重新运行时类别ID不变, 检查点仍然有效
+        kwargs["classes"] = _read_classes(args.classes) if args.classes else sorted(module.get_all_classes(args.annotations_dir, progress=False, recursive=args.recursive))
+    if not args.command.startswith("coco"):
+        kwargs.update(recursive=args.recursive, checksum=args.checksum)
+    if args.command.endswith("coco"):
+        kwargs["indent"] = None if args.compact else args.indent
+    paths = [kwargs[x] for x in positionals]
+    # 增量转换的清单即检查点, 归档输入输出不支持增量转换
+    kwargs["incremental"] = not args.no_checkpoint and not any(is_archive(x) for x in paths)
+    stats = ConversionStats()
+    if args.quiet:
+        kwargs["progress"] = False
+    elif args.log_interval is not None:
+        import logging
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+        kwargs["progress"] = LogProgress(args.log_interval)
+    else:
+        kwargs["progress"] = True
+    output = kwargs.get("output_dir", kwargs.get("output_path"))
+    try:
+        converted = getattr(module, name)(stats=stats, **kwargs)
+    except BadFileException as e:
+        print(f"{e}, 可以修复该文件或加上--on-error skip后重新运行, 已完成的部分会从检查点继续", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print(f"已中断, 用相同的命令重新运行即可从检查点继续: {output}" if kwargs["incremental"] else "已中断", file=sys.stderr)
+        return 130
+    _report(stats, converted, args.report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
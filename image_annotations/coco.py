@@ -1,88 +1,454 @@
 # -*- coding: utf-8 -*-
 import os
-from typing import List
-from pycocotools.coco import COCO
-from xml.etree.ElementTree import tostring
-from xml.dom.minidom import parseString
-from image_annotations.utils import dict2element
-from image_annotations.utils import prefix_name
+import json
+import hashlib
+from typing import List, Optional, Tuple, Dict, Callable, Union, Sequence
+from array import array
+from functools import partial
+from contextlib import ExitStack, closing
+import numpy as np
+from image_annotations.utils import prefix_name, parallel_map
+from image_annotations.readers import CocoReader, number
+from image_annotations.writers import voc_xml
+from image_annotations.manifest import Manifest, MANIFEST_NAME
+from image_annotations.archives import ArchiveWriter, open_output, write_result, write_results
+from image_annotations.pipeline import WriteBehind
+from image_annotations.metrics import ConversionStats, Progress, stage, timed, count, track
+from image_annotations.class_stats import ClassStats, PIXEL_BINS
+from image_annotations.validation import Policy, Validator, validator
+from image_annotations.subset import Subset
 
 
-def to_yolo(annotation_path: str, output_dir: str) -> int:
+# 单张图片的校验函数, 输入输出都是(图片, 类别ID, 框, 框的各个值是否为整数), 丢弃整张图片时返回None
+Checker = Optional[Callable[[tuple], Optional[tuple]]]
+
+
+def _checked(checker: Validator, category_ids: np.ndarray, item: Tuple[dict, np.ndarray, np.ndarray, np.ndarray]) -> Optional[Tuple[dict, np.ndarray, np.ndarray, np.ndarray]]:
     """
-    转换成YOLO格式\n
+    校验一张图片的COCO标注\n
+    :param checker: 检测框校验器
+    :param category_ids: 排序后的全部类别ID, 不在其中的类别ID视为未知类别
+    :param item: (图片, 类别ID, 框, 框的各个值是否为整数)
+    :return: 校验后的item, 丢弃了这张图片时返回None
+    """
+    image, ids, bboxes, bbox_is_int = item
+    with stage("validate"):
+        width, height = image.get("width"), image.get("height")
+        if not checker.check_size(width, height):
+            return None
+        index = np.minimum(np.searchsorted(category_ids, ids), max(len(category_ids) - 1, 0))
+        known = category_ids[index] == ids if len(category_ids) else np.zeros(len(ids), dtype=np.bool_)
+        corners = np.concatenate([bboxes[:, :2], bboxes[:, :2] + bboxes[:, 2:]], axis=1)
+        keep, clipped, _ = checker.check(np.where(known, index, -1), corners, width or 0, height or 0)
+        # 只换算被裁剪的框, 其余的框保持原值, 避免浮点误差
+        changed = (clipped != corners).any(axis=1)
+        if changed.any():
+            bboxes = bboxes.copy()
+            bboxes[changed] = np.concatenate([clipped[changed, :2], clipped[changed, 2:] - clipped[changed, :2]], axis=1)
+            bbox_is_int = bbox_is_int.copy()
+            bbox_is_int[changed] = bbox_is_int[changed] & (bboxes[changed] == np.round(bboxes[changed]))
+    return image, ids[keep], bboxes[keep], bbox_is_int[keep]
+
+
+def _checker(checker: Optional[Validator], categories: List[dict]) -> Checker:
+    """
+    生成单张图片的校验函数\n
+    :param checker: 检测框校验器, None表示不校验
+    :param categories: 全部类别
+    :return: 校验函数, 不校验时为None
+    """
+    if checker is None:
+        return None
+    category_ids = np.unique(np.array([x["id"] for x in categories], dtype=np.int64))
+    return partial(_checked, validator(checker, len(category_ids)), category_ids)
+
+
+def _load(annotation_path: str, subset: Optional[Subset], stats: Optional[ConversionStats]) -> Tuple[CocoReader, List[dict]]:
+    """
+    读取COCO文件, 按子集条件只保留需要的图片及标注\n
+    images位于annotations之前时, 不保留的图片的标注不会被存入数组; 之后只遍历保留的图片, 每张图片只读取其保留的标注所在的范围\n
     :param annotation_path: json文件路径
-    :param output_dir: 输出文件夹
-    :return: 转换了几张图片
+    :param subset: 子集条件, None表示全部转换
+    :param stats: 统计, 按子集跳过的图片数记为filtered
+    :return: (读取器, 输出的类别)
+    """
+    with stage("parse", stats):
+        if subset is None:
+            reader = CocoReader(annotation_path).load()
+            return reader, reader.categories()
+        skipped = set()
+
+        def keep_image(image: dict) -> bool:
+            if subset.keep_image(image["file_name"]):
+                return True
+            skipped.add(image["id"])
+            return False
+
+        reader = CocoReader(annotation_path).load(keep_image if subset.filters_images else None)
+        subset = subset.bind([x["name"] for x in reader.categories()], [x["id"] for x in reader.categories()])
+        images = len(reader)
+        if subset.filters_boxes:
+            bboxes = reader.bboxes
+            corners = np.concatenate([bboxes[:, :2], bboxes[:, :2] + bboxes[:, 2:]], axis=1)
+            keep = subset.keep_boxes(reader.category_ids, corners)
+            reader.select(keep, subset.class_ids(reader.category_ids), not subset.keep_empty)
+    if stats is not None and len(skipped) + images - len(reader):
+        stats.count("filtered", len(skipped) + images - len(reader))
+    return reader, [{"id": k, "name": v} for k, v in subset.categories.items()]
+
+
+def _to_yolo(output_dir: Optional[str], check: Checker, item: Tuple[dict, np.ndarray, np.ndarray, np.ndarray]) -> Union[None, int, Tuple[str, str]]:
     """
-    count = 0
-    os.makedirs(output_dir, exist_ok=True)
-    coco = COCO(annotation_path)
-    for image in coco.loadImgs(coco.getImgIds()):
-        width = image["width"]
-        height = image["height"]
-        results = ""
+    把一张图片的COCO标注转换成YOLO格式\n
+    :param output_dir: 输出文件夹, 为None时不写文件, 返回输出内容
+    :param check: 校验函数, None表示不校验
+    :param item: (图片, 类别ID, 框, 框的各个值是否为整数)
+    :return: 转换了几张图片, output_dir为None时返回(输出文件名, 文件内容), 校验时丢弃了这张图片则返回None
+    """
+    if check is not None:
+        item = check(item)
+        if item is None:
+            return None
+    count("boxes", len(item[1]))
+    return _write_yolo(output_dir, item)
+
+
+def _write_yolo(output_dir: Optional[str], item: Tuple[dict, np.ndarray, np.ndarray, np.ndarray]) -> Union[int, Tuple[str, str]]:
+    """
+    生成一张图片的YOLO标注并写入输出文件夹\n
+    :param output_dir: 输出文件夹, 为None时不写文件, 返回输出内容
+    :param item: (图片, 类别ID, 框, 框的各个值是否为整数)
+    :return: 转换了几张图片, output_dir为None时返回(输出文件名, 文件内容)
+    """
+    image, category_ids, bboxes, _ = item
+    width = image["width"]
+    height = image["height"]
+    results = ""
+    with stage("serialize"):
+        for category_id, (xmin, ymin, w, h) in zip(category_ids.tolist(), bboxes.tolist()):
+            result = "{} {:.4f} {:.4f} {:.4f} {:.4f}\n".format(
+                category_id,
+                (xmin + 0.5 * w) / width,
+                (ymin + 0.5 * h) / height,
+                w / width,
+                h / height
+            )
+            results = results + result
+    if output_dir is None:
+        return prefix_name(image["file_name"]) + ".txt", results.strip()
+    with stage("write"):
         with open(os.path.join(output_dir, prefix_name(image["file_name"]) + ".txt"), "w") as f:
-            for annotation in coco.loadAnns(coco.getAnnIds([image["id"]])):
-                xmin, ymin, w, h = annotation["bbox"]
-                result = "{} {:.4f} {:.4f} {:.4f} {:.4f}\n".format(
-                    annotation["category_id"],
-                    (xmin + 0.5 * w) / width,
-                    (ymin + 0.5 * h) / height,
-                    w / width,
-                    h / height
-                )
-                results = results + result
             f.write(results.strip())
-        count = count + 1
-    return count
+    return 1
 
 
-def to_voc(annotation_path: str, images_dir: str, output_dir: str) -> int:
+def _signature(item: Tuple[dict, np.ndarray, np.ndarray, np.ndarray]) -> str:
     """
-    转换成VOC格式\n
-    :param annotation_path: json文件路径
-    :param images_dir: 图片文件夹
+    根据一张图片及其标注的内容生成签名, 用于增量转换\n
+    :param item: (图片, 类别ID, 框, 框的各个值是否为整数)
+    :return: 签名
+    """
+    image, category_ids, bboxes, bbox_is_int = item
+    digest = hashlib.blake2b(json.dumps(image, sort_keys=True).encode("utf-8"), digest_size=16)
+    for array in (category_ids, bboxes, bbox_is_int):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _convert(func: Callable, item_output: Callable, converter: str, options: dict, output_dir: str, reader: CocoReader, workers: Optional[int], chunksize: int, incremental: bool, progress: Progress, stats: Optional[ConversionStats], sink: Union[None, ArchiveWriter, WriteBehind] = None, on_error: str = "raise") -> int:
+    """
+    按图片逐个转换, 可选增量转换\n
+    :param func: 转换一张图片的函数
+    :param item_output: 获取一张图片对应输出路径的函数
+    :param converter: 转换器名称
+    :param options: 影响转换结果的选项
     :param output_dir: 输出文件夹
+    :param reader: COCO读取器
+    :param workers: 并行的进程数
+    :param chunksize: 每次分发给子进程的图片数
+    :param incremental: 是否增量转换
+    :param progress: 进度报告方式
+    :param stats: 统计
+    :param sink: 写入器, 不为None时func返回(输出文件名, 文件内容), 由主进程写入归档或交给后台线程写出
+    :param on_error: 遇到损坏的输入时的处理方式, raise表示抛出, skip表示跳过
     :return: 转换了几张图片
     """
-    count = 0
-    os.makedirs(output_dir, exist_ok=True)
-    coco = COCO(annotation_path)
-    for image in coco.loadImgs(coco.getImgIds()):
-        annotation = dict()
-        annotation["folder"] = os.path.basename(images_dir)
-        annotation["filename"] = image["file_name"]
-        annotation["path"] = os.path.join(os.path.abspath(images_dir), annotation["filename"])
-        annotation["source"] = {"database": "Unknown"}
-        annotation["size"] = {"width": str(image["width"]), "height": str(image["height"]), "depth": "3"}
-        annotation["segmented"] = "0"
-        annotation["object"] = list()
-        for annotation in coco.loadAnns(coco.getAnnIds([image["id"]])):
-            xmin, ymin, w, h = annotation["bbox"]
-            annotation["object"].append({
-                "name": coco.loadCats([annotation["category_id"]])[0]["name"],
-                "pose": "Unspecified",
-                "truncated": "0",
-                "difficult": "0",
-                "bndbox": {"xmin": str(xmin), "ymin": str(ymin), "xmax": str(xmin + w), "ymax": str(ymin + h)}
-            })
-        xml = parseString(tostring(dict2element("annotation", annotation))).toprettyxml(indent="\t")
+    if not incremental:
+        converted = write_results(track(parallel_map(func, reader, workers, chunksize, stats, on_error), len(reader), progress), sink, stats)
+    else:
+        with Manifest(os.path.join(output_dir, MANIFEST_NAME), {"converter": converter, **options}) as manifest:
+            results = manifest.map(
+                func, reader,
+                key=lambda x: x[0]["file_name"],
+                signature=_signature,
+                output=item_output,
+                workers=workers, chunksize=chunksize, stats=stats, on_error=on_error
+            )
+            converted = write_results(track(results, len(reader), progress), None)
+            manifest.prune()
+    if stats is not None:
+        stats.count("files", len(reader))
+        stats.count("images", converted)
+    return converted
+
+
+def to_yolo(annotation_path: str, output_dir: str, *, workers: Optional[int] = 1, chunksize: int = 64, incremental: bool = False, progress: Progress = True, stats: Optional[ConversionStats] = None, on_error: str = "raise", validate: Union[Policy, Validator] = None, io_threads: int = 0, subset: Optional[Subset] = None) -> int:
+    """
+    转换成YOLO格式\n
+    :param annotation_path: json文件路径
+    :param output_dir: 输出文件夹, 以归档后缀结尾时写入tar或zip归档
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的图片数
+    :param incremental: 是否增量转换, 只重写标注有变化的图片, 并删除已不存在的图片的输出
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一张图片调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param on_error: 遇到损坏的文件时的处理方式, raise表示抛出BadFileException, skip表示跳过该文件并记录到stats的errors中
+    :param validate: 转换时在同一次遍历中校验检测框, None或False表示不校验, True表示默认策略, 也可以是report、drop、{问题: 处理方式}或Validator, 各类问题的个数记为stats中的invalid_<问题>
+    :param io_threads: 大于0时用这么多个线程在后台写出结果, 适合NFS、对象存储等每次写入都要等待往返延迟的文件系统, 0表示不启用; 增量转换时不启用
+    :param subset: 只转换数据集的一个子集, 按名称或抽样比例不保留的图片的标注不会被存入内存, 保留的类别默认重新编号, None表示全部转换
+    :return: 转换了几张图片
+    """
+    with timed(stats, "coco.to_yolo"), ExitStack() as stack:
+        sink = open_output(stack, output_dir, incremental, io_threads)
+        reader, categories = _load(annotation_path, subset, stats)
+        checker = validator(validate)
+        func = partial(_to_yolo, None if sink is not None else output_dir, _checker(checker, categories))
+        item_output = lambda x: os.path.join(output_dir, prefix_name(x[0]["file_name"]) + ".txt")
+        options = {}
+        if checker is not None:
+            # 类别ID是否有效取决于categories
+            options["validate"] = checker.options()
+            options["categories"] = sorted(x["id"] for x in categories)
+        if subset is not None:
+            options["subset"] = subset.options()
+        return _convert(func, item_output, "coco.to_yolo", options, output_dir, reader, workers, chunksize, incremental, progress, stats, sink, on_error)
+
+
+def _to_voc(images_dir: str, categories: Dict[int, str], output_dir: Optional[str], check: Checker, item: Tuple[dict, np.ndarray, np.ndarray, np.ndarray]) -> Union[None, int, Tuple[str, str]]:
+    """
+    把一张图片的COCO标注转换成VOC格式\n
+    :param images_dir: 图片文件夹
+    :param categories: 类别ID到类别名称的映射
+    :param output_dir: 输出文件夹, 为None时不写文件, 返回输出内容
+    :param check: 校验函数, None表示不校验
+    :param item: (图片, 类别ID, 框, 框的各个值是否为整数)
+    :return: 转换了几张图片, output_dir为None时返回(输出文件名, xml字符串), 校验时丢弃了这张图片则返回None
+    """
+    if check is not None:
+        item = check(item)
+        if item is None:
+            return None
+    count("boxes", len(item[1]))
+    return _write_voc(images_dir, categories, output_dir, item)
+
+
+def _write_voc(images_dir: str, categories: Dict[int, str], output_dir: Optional[str], item: Tuple[dict, np.ndarray, np.ndarray, np.ndarray]) -> Union[int, Tuple[str, str]]:
+    """
+    生成一张图片的VOC标注并写入输出文件夹\n
+    :param images_dir: 图片文件夹
+    :param categories: 类别ID到类别名称的映射
+    :param output_dir: 输出文件夹, 为None时不写文件, 返回输出内容
+    :param item: (图片, 类别ID, 框, 框的各个值是否为整数)
+    :return: 转换了几张图片, output_dir为None时返回(输出文件名, xml字符串)
+    """
+    image, category_ids, bboxes, bbox_is_int = item
+    objects = []
+    for category_id, bbox, is_int in zip(category_ids.tolist(), bboxes.tolist(), bbox_is_int.tolist()):
+        xmin, ymin, w, h = map(number, bbox, is_int)
+        objects.append((categories[category_id], xmin, ymin, xmin + w, ymin + h))
+    path = os.path.join(os.path.abspath(images_dir), image["file_name"])
+    with stage("serialize"):
+        xml = voc_xml(os.path.basename(images_dir), image["file_name"], path, image["width"], image["height"], 3, objects)
+    if output_dir is None:
+        return f"{prefix_name(image['file_name'])}.xml", xml
+    with stage("write"):
         with open(os.path.join(output_dir, f"{prefix_name(image['file_name'])}.xml"), "w") as f:
             f.write(xml)
-        count = count + 1
-    return count
+    return 1
+
+
+def to_voc(annotation_path: str, images_dir: str, output_dir: str, *, workers: Optional[int] = 1, chunksize: int = 64, incremental: bool = False, progress: Progress = True, stats: Optional[ConversionStats] = None, on_error: str = "raise", validate: Union[Policy, Validator] = None, io_threads: int = 0, subset: Optional[Subset] = None) -> int:
+    """
+    转换成VOC格式\n
+    :param annotation_path: json文件路径
+    :param images_dir: 图片文件夹
+    :param output_dir: 输出文件夹, 以归档后缀结尾时写入tar或zip归档
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的图片数
+    :param incremental: 是否增量转换, 只重写标注有变化的图片, 并删除已不存在的图片的输出
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一张图片调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param on_error: 遇到损坏的文件时的处理方式, raise表示抛出BadFileException, skip表示跳过该文件并记录到stats的errors中
+    :param validate: 转换时在同一次遍历中校验检测框, None或False表示不校验, True表示默认策略, 也可以是report、drop、{问题: 处理方式}或Validator, 各类问题的个数记为stats中的invalid_<问题>
+    :param io_threads: 大于0时用这么多个线程在后台写出结果, 适合NFS、对象存储等每次写入都要等待往返延迟的文件系统, 0表示不启用; 增量转换时不启用
+    :param subset: 只转换数据集的一个子集, 按名称或抽样比例不保留的图片的标注不会被存入内存, 保留的类别默认重新编号, None表示全部转换
+    :return: 转换了几张图片
+    """
+    with timed(stats, "coco.to_voc"), ExitStack() as stack:
+        sink = open_output(stack, output_dir, incremental, io_threads)
+        reader, category_list = _load(annotation_path, subset, stats)
+        categories = {x["id"]: x["name"] for x in category_list}
+        checker = validator(validate)
+        func = partial(_to_voc, images_dir, categories, None if sink is not None else output_dir, _checker(checker, category_list))
+        item_output = lambda x: os.path.join(output_dir, f"{prefix_name(x[0]['file_name'])}.xml")
+        options = {"images_dir": os.path.abspath(images_dir), "categories": sorted(categories.items())}
+        if checker is not None:
+            options["validate"] = checker.options()
+        if subset is not None:
+            options["subset"] = subset.options()
+        return _convert(func, item_output, "coco.to_voc", options, output_dir, reader, workers, chunksize, incremental, progress, stats, sink, on_error)
+
+
+def _to_targets(images_dir: Optional[str], categories: Dict[int, str], yolo: bool, yolo_dir: Optional[str], voc: bool, voc_dir: Optional[str], check: Checker, item: Tuple[dict, np.ndarray, np.ndarray, np.ndarray]) -> Optional[Tuple[Union[None, int, Tuple[str, str]], Union[None, int, Tuple[str, str]]]]:
+    """
+    把一张图片的COCO标注同时转换成YOLO及VOC格式\n
+    :param images_dir: 图片文件夹
+    :param categories: 类别ID到类别名称的映射
+    :param yolo: 是否生成YOLO格式
+    :param yolo_dir: YOLO输出文件夹, 为None时返回输出内容
+    :param voc: 是否生成VOC格式
+    :param voc_dir: VOC输出文件夹, 为None时返回输出内容
+    :param check: 校验函数, None表示不校验
+    :param item: (图片, 类别ID, 框, 框的各个值是否为整数)
+    :return: (YOLO结果, VOC结果), 不需要的格式为None, 校验时丢弃了这张图片则返回None
+    """
+    if check is not None:
+        item = check(item)
+        if item is None:
+            return None
+    count("boxes", len(item[1]))
+    yolo_result = _write_yolo(yolo_dir, item) if yolo else None
+    voc_result = _write_voc(images_dir, categories, voc_dir, item) if voc else None
+    return yolo_result, voc_result
+
+
+def convert(annotation_path: str, targets: Dict[str, str], images_dir: Optional[str] = None, workers: Optional[int] = 1, chunksize: int = 64, progress: Progress = True, stats: Optional[ConversionStats] = None, on_error: str = "raise", validate: Union[Policy, Validator] = None, io_threads: int = 0, subset: Optional[Subset] = None) -> int:
+    """
+    只读取一次json文件, 同时转换成多种格式\n
+    :param annotation_path: json文件路径
+    :param targets: 目标格式到输出文件夹的映射, 支持yolo和voc, 输出文件夹以归档后缀结尾时写入归档
+    :param images_dir: 图片文件夹, 转换成VOC格式时需要
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的图片数
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一张图片调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param on_error: 遇到损坏的文件时的处理方式, raise表示抛出BadFileException, skip表示跳过该文件并记录到stats的errors中
+    :param validate: 转换时在同一次遍历中校验检测框, None或False表示不校验, True表示默认策略, 也可以是report、drop、{问题: 处理方式}或Validator, 各类问题的个数记为stats中的invalid_<问题>
+    :param io_threads: 大于0时用这么多个线程在后台写出结果, 适合NFS、对象存储等每次写入都要等待往返延迟的文件系统, 0表示不启用
+    :param subset: 只转换数据集的一个子集, 按名称或抽样比例不保留的图片的标注不会被存入内存, 保留的类别默认重新编号, None表示全部转换
+    :return: 转换了几张图片
+    """
+    unknown = set(targets) - {"yolo", "voc"}
+    if unknown or not targets:
+        raise ValueError(f"不支持的目标格式: {sorted(unknown)}, COCO格式可以转换成yolo、voc")
+    if "voc" in targets and images_dir is None:
+        raise ValueError("转换成VOC格式时需要images_dir")
+    with timed(stats, "coco.convert"), ExitStack() as stack:
+        sinks = {k: open_output(stack, v, io_threads=io_threads) for k, v in targets.items()}
+        reader, category_list = _load(annotation_path, subset, stats)
+        categories = {x["id"]: x["name"] for x in category_list}
+        func = partial(
+            _to_targets, images_dir, categories,
+            "yolo" in targets, None if sinks.get("yolo") is not None else targets.get("yolo"),
+            "voc" in targets, None if sinks.get("voc") is not None else targets.get("voc"),
+            _checker(validator(validate), category_list)
+        )
+        converted = 0
+        for result in track(parallel_map(func, reader, workers, chunksize, stats, on_error), len(reader), progress):
+            if result is None:
+                continue
+            yolo_result, voc_result = result
+            converted = converted + 1
+            if yolo_result is not None:
+                write_result(yolo_result, sinks["yolo"], stats)
+            if voc_result is not None:
+                write_result(voc_result, sinks["voc"], stats)
+        if stats is not None:
+            stats.count("files", len(reader))
+            stats.count("images", converted)
+    return converted
+
+
+def to_binary(annotation_path: str, output_path: str, stats: Optional[ConversionStats] = None) -> int:
+    """
+    转换成二进制格式, 之后可以用Dataset.load以内存映射的方式读取, 或用binary模块转换成其他格式而不再解析json\n
+    :param annotation_path: json文件路径
+    :param output_path: 输出路径, 通常以.iads结尾
+    :param stats: 记录各阶段耗时及计数的统计
+    :return: 转换了几张图片
+    """
+    from image_annotations.dataset import Dataset
+    with timed(stats, "coco.to_binary"):
+        with stage("parse", stats):
+            dataset = Dataset.from_coco(annotation_path)
+        with stage("write", stats):
+            dataset.save(output_path)
+        if stats is not None:
+            stats.count("images", len(dataset))
+            stats.count("boxes", dataset.num_boxes)
+    return len(dataset)
+
+
+def class_stats(annotation_path: str, bins: Sequence[float] = PIXEL_BINS, counts: bool = True, sample: Optional[int] = None, stable_after: Optional[int] = None, stats: Optional[ConversionStats] = None) -> ClassStats:
+    """
+    统计各类别的检测框数、图片数及检测框尺寸的直方图, 只流式读取categories和annotations, 不解析images\n
+    :param annotation_path: json文件路径
+    :param bins: 尺寸(像素面积的平方根)直方图的分箱边界
+    :param counts: 是否统计annotations, 为False时只读取categories, 各类别的计数均为0
+    :param sample: 最多统计多少个标注, None表示全部
+    :param stable_after: 连续这么多个标注没有出现新类别时提前结束, None表示不提前结束
+    :param stats: 记录各阶段耗时及计数的统计
+    :return: 以类别ID为键的类别统计, names为类别ID到类别名称的映射, 提前结束时complete为False
+    """
+    result = ClassStats(bins)
+    with timed(stats, "coco.class_stats"):
+        reader = CocoReader(annotation_path)
+        with stage("parse", stats):
+            result.names = {x["id"]: x["name"] for x in reader.categories()}
+        for category_id in result.names:
+            result.objects[category_id] = 0
+            result.images[category_id] = 0
+            result.histograms[category_id] = np.zeros(len(result.bins) - 1, dtype=np.int64)
+        if not counts:
+            return result
+        image_ids, category_ids, sizes = array("q"), array("q"), array("d")
+        seen = set()
+        unchanged = 0
+        with stage("parse", stats), closing(reader.iter_annotations()) as annotations:
+            for annotation in annotations:
+                if sample is not None and len(image_ids) >= sample:
+                    result.complete = False
+                    break
+                _, _, w, h = annotation["bbox"]
+                image_ids.append(annotation["image_id"])
+                category_ids.append(annotation["category_id"])
+                sizes.append(max(w, 0) * max(h, 0))
+                if annotation["category_id"] in seen:
+                    unchanged = unchanged + 1
+                else:
+                    seen.add(annotation["category_id"])
+                    unchanged = 0
+                if stable_after is not None and unchanged >= stable_after:
+                    result.complete = False
+                    break
+        with stage("serialize", stats):
+            result.update(np.frombuffer(category_ids, dtype=np.int64), np.sqrt(np.frombuffer(sizes, dtype=np.float64)), np.frombuffer(image_ids, dtype=np.int64))
+        result.files = len(np.unique(np.frombuffer(image_ids, dtype=np.int64)))
+        if stats is not None:
+            stats.count("boxes", len(category_ids))
+            stats.count("images", result.files)
+    return result
 
 
-def get_all_classes(annotation_path: str) -> List[str]:
+def get_all_classes(annotation_path: str, *, stats: Optional[ConversionStats] = None) -> List[str]:
     """
     获取全部类别名称\n
     :param annotation_path: 标注文件路径
+    :param stats: 记录各阶段耗时及计数的统计
     :return: 全部类别名称组成的列表
     """
-    coco = COCO(annotation_path)
-    cats = coco.loadCats(coco.getCatIds())
-    cats = sorted(cats, key=lambda x: x["id"])
+    with timed(stats, "coco.get_all_classes"), stage("parse", stats):
+        cats = sorted(CocoReader(annotation_path).categories(), key=lambda x: x["id"])
     return [x["name"] for x in cats]
 
 
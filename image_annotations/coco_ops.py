@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import hashlib
+import tempfile
+from array import array
+from itertools import islice
+from contextlib import ExitStack
+from typing import List, Optional, Tuple, Dict, Iterable, Iterator, Sequence, BinaryIO
+import numpy as np
+from image_annotations.exceptions import BadFileException
+from image_annotations.readers import CocoReader, _JsonStream
+from image_annotations.writers import CocoWriter, CocoFormat
+from image_annotations.metrics import ConversionStats, stage, timed
+
+
+# 每批重映射的标注数
+_BATCH = 1 << 16
+
+
+class IdMap(object):
+    """
+    旧ID到新值的映射, 以排序后的数组保存, 按批用二分查找完成重映射\n
+    """
+
+    def __init__(self, old_ids: Sequence[int], new_ids: Sequence[int]):
+        """
+        构造函数\n
+        :param old_ids: 旧ID
+        :param new_ids: 对应的新值
+        """
+        old_ids = np.asarray(old_ids, dtype=np.int64)
+        order = np.argsort(old_ids, kind="stable")
+        self.old_ids = old_ids[order]
+        self.new_ids = np.asarray(new_ids, dtype=np.int64)[order]
+
+    def __call__(self, ids: Sequence[int]) -> np.ndarray:
+        """
+        批量映射\n
+        :param ids: 旧ID
+        :return: 新值, 找不到的旧ID映射为-1
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(self.old_ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int64)
+        index = np.minimum(np.searchsorted(self.old_ids, ids), len(self.old_ids) - 1)
+        return np.where(self.old_ids[index] == ids, self.new_ids[index], -1)
+
+
+def _batches(items: Iterable, size: int = _BATCH) -> Iterator[list]:
+    """
+    把元素按固定大小分批\n
+    :param items: 元素
+    :param size: 每批的元素数
+    :return: 列表的迭代器
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _without_id(image: dict) -> dict:
+    """
+    去掉图片的id, 由写入器重新分配\n
+    :param image: COCO图片
+    :return: 不含id的图片
+    """
+    return {k: v for k, v in image.items() if k != "id"}
+
+
+def _remapped(annotations: Iterable[dict], image_map: IdMap, category_map: IdMap, stats: Optional[ConversionStats] = None) -> Iterator[dict]:
+    """
+    按批重映射标注的image_id和category_id\n
+    :param annotations: COCO标注
+    :param image_map: 旧图片ID到新图片ID的映射
+    :param category_map: 旧类别ID到新类别ID的映射
+    :param stats: 统计, 记录因图片或类别不存在而丢弃的标注数
+    :return: 不含id的新标注的迭代器
+    """
+    for batch in _batches(annotations):
+        image_ids = image_map([x["image_id"] for x in batch])
+        category_ids = category_map([x["category_id"] for x in batch])
+        dropped = 0
+        for annotation, image_id, category_id in zip(batch, image_ids.tolist(), category_ids.tolist()):
+            if image_id < 0 or category_id < 0:
+                dropped = dropped + 1
+                continue
+            result = {k: v for k, v in annotation.items() if k != "id"}
+            result["image_id"] = image_id
+            result["category_id"] = category_id
+            yield result
+        if stats is not None and dropped:
+            stats.count("dropped", dropped)
+
+
+def _merge_categories(category_lists: List[List[dict]]) -> Tuple[List[dict], List[IdMap]]:
+    """
+    按名称合并多个文件的类别, 保留第一个文件的类别ID, 新出现的类别依次分配更大的ID\n
+    :param category_lists: 每个文件的类别
+    :return: (合并后的类别, 每个文件旧类别ID到新类别ID的映射)
+    """
+    merged = []
+    by_name = {}
+    next_id = 0
+    maps = []
+    for categories in category_lists:
+        old_ids, new_ids = [], []
+        for category in categories:
+            if category["name"] not in by_name:
+                new_id = category["id"] if not maps else next_id
+                merged.append({**category, "id": new_id})
+                by_name[category["name"]] = new_id
+                next_id = max(next_id, new_id + 1)
+            old_ids.append(category["id"])
+            new_ids.append(by_name[category["name"]])
+        maps.append(IdMap(old_ids, new_ids))
+    return merged, maps
+
+
+def merge(annotation_paths: Sequence[str], output_path: str, indent: Optional[int] = 4, stats: Optional[ConversionStats] = None) -> int:
+    """
+    流式合并多个COCO文件, 类别按名称合并, 图片ID和标注ID重新连续编号, 不会把任何一个文件整体载入内存\n
+    :param annotation_paths: 输入的json文件路径, 输出中的info和licenses取自第一个文件
+    :param output_path: 输出路径
+    :param indent: 输出json的缩进空格数, None表示不带空白的紧凑格式
+    :param stats: 记录各阶段耗时及计数的统计
+    :return: 合并后的图片数
+    """
+    if not annotation_paths:
+        raise ValueError("至少需要一个输入文件")
+    with timed(stats, "coco.merge"):
+        readers = [CocoReader(x) for x in annotation_paths]
+        with stage("parse", stats):
+            categories, category_maps = _merge_categories([x.categories() for x in readers])
+            info, licenses = readers[0].field("info"), readers[0].field("licenses")
+        with CocoWriter(output_path, categories, indent, info, licenses) as writer:
+            for reader, category_map in zip(readers, category_maps):
+                old_ids = array("q")
+                start = writer.images
+                for image in reader.iter_images():
+                    old_ids.append(image["id"])
+                    writer.write(_without_id(image))
+                image_map = IdMap(old_ids, np.arange(start, writer.images))
+                for annotation in _remapped(reader.iter_annotations(), image_map, category_map, stats):
+                    writer.write_annotation(annotation)
+        if stats is not None:
+            stats.count("images", writer.images)
+            stats.count("boxes", writer.annotations)
+    return writer.images
+
+
+def _bucket(file_name: str, seed: int, bounds: np.ndarray) -> int:
+    """
+    根据文件名的哈希值确定图片属于哪个输出, 同一文件名在不同次运行中的结果相同\n
+    :param file_name: 图片文件名
+    :param seed: 随机种子
+    :param bounds: 各输出的累积比例
+    :return: 输出的下标
+    """
+    digest = hashlib.blake2b(f"{seed}:{file_name}".encode("utf-8"), digest_size=8).digest()
+    position = int.from_bytes(digest, "little") / float(1 << 64)
+    return min(int(np.searchsorted(bounds, position, side="right")), len(bounds) - 1)
+
+
+def split(annotation_path: str, outputs: Dict[str, float], seed: int = 0, indent: Optional[int] = 4, stats: Optional[ConversionStats] = None) -> Dict[str, int]:
+    """
+    按比例把一个COCO文件流式拆分成多个, 每张图片按文件名的哈希值确定去向, 各输出中的ID重新连续编号\n
+    :param annotation_path: json文件路径
+    :param outputs: 输出路径 -> 比例, 比例不必归一化
+    :param seed: 随机种子, 相同的种子得到相同的拆分
+    :param indent: 输出json的缩进空格数, None表示不带空白的紧凑格式
+    :param stats: 记录各阶段耗时及计数的统计
+    :return: 输出路径 -> 图片数
+    """
+    weights = np.asarray(list(outputs.values()), dtype=np.float64)
+    if len(weights) == 0 or np.any(weights < 0) or weights.sum() <= 0:
+        raise ValueError(f"无效的拆分比例: {outputs}")
+    bounds = np.cumsum(weights / weights.sum())
+    with timed(stats, "coco.split"):
+        reader = CocoReader(annotation_path)
+        with stage("parse", stats):
+            categories = reader.categories()
+            category_map = IdMap([x["id"] for x in categories], [x["id"] for x in categories])
+            info, licenses = reader.field("info"), reader.field("licenses")
+        with ExitStack() as stack:
+            writers = [stack.enter_context(CocoWriter(x, categories, indent, info, licenses)) for x in outputs]
+            old_ids, buckets, new_ids = array("q"), array("q"), array("q")
+            for image in reader.iter_images():
+                bucket = _bucket(image["file_name"], seed, bounds)
+                old_ids.append(image["id"])
+                buckets.append(bucket)
+                new_ids.append(writers[bucket].write(_without_id(image)))
+            # 把输出下标编码进新ID, 一次查找同时得到去向和新ID
+            image_map = IdMap(old_ids, np.asarray(buckets, dtype=np.int64) << 40 | np.asarray(new_ids, dtype=np.int64))
+            for annotation in _remapped(reader.iter_annotations(), image_map, category_map, stats):
+                bucket, image_id = annotation["image_id"] >> 40, annotation["image_id"] & ((1 << 40) - 1)
+                annotation["image_id"] = image_id
+                writers[bucket].write_annotation(annotation)
+        if stats is not None:
+            stats.count("images", sum(x.images for x in writers))
+            stats.count("boxes", sum(x.annotations for x in writers))
+    return {path: writer.images for path, writer in zip(outputs, writers)}
+
+
+class _Span(object):
+    """
+    COCO文件中一个顶层数组的位置信息\n
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.max_id = -1
+        # 最后一个元素结尾的位置, 数组为空时为"]"的位置
+        self.insert = None
+
+
+def _layout(annotation_path: str) -> Dict[str, _Span]:
+    """
+    扫描一遍COCO文件, 记录images和annotations数组的元素数、最大ID及新元素的插入位置\n
+    以latin-1打开文件, 字符位置即为字节位置\n
+    :param annotation_path: json文件路径
+    :return: 数组名 -> 位置信息
+    """
+    spans = {}
+    with open(annotation_path, "r", encoding="latin-1", newline="") as f:
+        stream = _JsonStream(f)
+        for name in stream.keys():
+            if name not in ("images", "annotations"):
+                stream.skip()
+                continue
+            span = _Span()
+            for item in stream.items():
+                span.count = span.count + 1
+                span.max_id = max(span.max_id, item["id"])
+                span.insert = stream.tell()
+            if span.count == 0:
+                span.insert = stream.tell() - 1
+            spans[name] = span
+    for name in ("images", "annotations"):
+        if name not in spans:
+            raise BadFileException(annotation_path, f"缺少{name}字段")
+    return spans
+
+
+def append(annotation_path: str, annotation_paths: Sequence[str], indent: Optional[int] = 4, stats: Optional[ConversionStats] = None) -> int:
+    """
+    把其他COCO文件中的图片和标注原地追加到一个COCO文件中, 新的ID接在已有的最大ID之后\n
+    只重写images数组末尾之后的部分, 已有的标注按原始字节复制, 不会重新解析或序列化\n
+    :param annotation_path: 被追加的json文件路径
+    :param annotation_paths: 追加的json文件路径, 其中的类别必须都已存在于被追加的文件中(按名称匹配)
+    :param indent: 新元素的缩进空格数, 应与被追加的文件一致, None表示不带空白的紧凑格式
+    :param stats: 记录各阶段耗时及计数的统计
+    :return: 追加了几张图片
+    """
+    with timed(stats, "coco.append"):
+        with stage("parse", stats):
+            spans = _layout(annotation_path)
+            categories = {x["name"]: x["id"] for x in CocoReader(annotation_path).categories()}
+            readers = [CocoReader(x) for x in annotation_paths]
+            category_maps = []
+            for reader in readers:
+                missing = [x["name"] for x in reader.categories() if x["name"] not in categories]
+                if missing:
+                    raise ValueError(f"{reader.annotation_path}中的类别不在{annotation_path}中, 无法原地追加: {missing}")
+                category_maps.append(IdMap([x["id"] for x in reader.categories()], [categories[x["name"]] for x in reader.categories()]))
+        directory = os.path.dirname(os.path.abspath(annotation_path))
+        fmt = CocoFormat(indent)
+        images, annotations = spans["images"], spans["annotations"]
+        image_id, annotation_id = images.max_id + 1, annotations.max_id + 1
+        with ExitStack() as stack:
+            # 新元素先写入临时文件, 全部生成后再拼接, 出错时原文件保持不变
+            new_images = stack.enter_context(tempfile.TemporaryFile("w+b", dir=directory))
+            new_annotations = stack.enter_context(tempfile.TemporaryFile("w+b", dir=directory))
+            added_images = added_annotations = 0
+            for reader, category_map in zip(readers, category_maps):
+                old_ids = array("q")
+                start = image_id + added_images
+                for image in reader.iter_images():
+                    old_ids.append(image["id"])
+                    new_images.write(fmt.item({"id": start + len(old_ids) - 1, **_without_id(image)}, images.count + added_images).encode("utf-8"))
+                    added_images = added_images + 1
+                image_map = IdMap(old_ids, np.arange(start, start + len(old_ids)))
+                for annotation in _remapped(reader.iter_annotations(), image_map, category_map, stats):
+                    new_annotations.write(fmt.item({"id": annotation_id + added_annotations, **annotation}, annotations.count + added_annotations).encode("utf-8"))
+                    added_annotations = added_annotations + 1
+            if images.count == 0 and added_images > 0:
+                new_images.write(fmt.close_sep.encode("utf-8"))
+            if annotations.count == 0 and added_annotations > 0:
+                new_annotations.write(fmt.close_sep.encode("utf-8"))
+            with stage("write", stats):
+                inserts = sorted([(images.insert, new_images), (annotations.insert, new_annotations)], key=lambda x: x[0])
+                first = inserts[0][0]
+                tail = stack.enter_context(tempfile.TemporaryFile("w+b", dir=directory))
+                with open(annotation_path, "r+b") as f:
+                    f.seek(first)
+                    shutil.copyfileobj(f, tail)
+                    tail.seek(0)
+                    f.seek(first)
+                    f.truncate()
+                    position = first
+                    for insert, spool in inserts:
+                        _copy(tail, f, insert - position)
+                        position = insert
+                        spool.seek(0)
+                        shutil.copyfileobj(spool, f)
+                    shutil.copyfileobj(tail, f)
+        if stats is not None:
+            stats.count("images", added_images)
+            stats.count("boxes", added_annotations)
+    return added_images
+
+
+def _copy(src: BinaryIO, dst: BinaryIO, size: int):
+    """
+    从src复制指定字节数到dst\n
+    :param src: 源文件对象
+    :param dst: 目标文件对象
+    :param size: 字节数
+    """
+    while size > 0:
+        chunk = src.read(min(size, 1 << 20))
+        if not chunk:
+            return
+        dst.write(chunk)
+        size = size - len(chunk)
@@ -0,0 +1,444 @@
+# -*- coding: utf-8 -*-
+import os
+from datetime import datetime
+from typing import List, Optional, Union, Iterator, Sequence, Tuple, Dict
+import numpy as np
+from image_annotations.metrics import count
+from image_annotations.readers import CocoReader
+from image_annotations.writers import CocoWriter, coco_categories, voc_xml
+from image_annotations.yolo import read_labels, image_folder
+from image_annotations.scan import output_path
+from image_annotations.voc import read_arrays
+from image_annotations.validation import Policy, Validator, validator
+from image_annotations.exceptions import BadFileException
+
+
+class BoxRecord(object):
+    """
+    一个检测框, 坐标为像素坐标系下的左上角及宽高\n
+    """
+    __slots__ = ("class_id", "name", "x", "y", "w", "h")
+
+    def __init__(self, class_id: int, name: str, x: float, y: float, w: float, h: float):
+        """
+        构造函数\n
+        :param class_id: 类别ID
+        :param name: 类别名称
+        :param x: 左上角x坐标
+        :param y: 左上角y坐标
+        :param w: 宽度
+        :param h: 高度
+        """
+        self.class_id = class_id
+        self.name = name
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.class_id}, {self.name!r}, {self.x}, {self.y}, {self.w}, {self.h})"
+
+
+class ImageRecord(object):
+    """
+    一张图片及其全部检测框\n
+    """
+    __slots__ = ("id", "file_name", "width", "height", "depth", "boxes")
+
+    def __init__(self, image_id: int, file_name: str, width: int, height: int, depth: int, boxes: List[BoxRecord]):
+        """
+        构造函数\n
+        :param image_id: 图片ID
+        :param file_name: 图片文件名
+        :param width: 宽度
+        :param height: 高度
+        :param depth: 通道数
+        :param boxes: 检测框
+        """
+        self.id = image_id
+        self.file_name = file_name
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.boxes = boxes
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.id}, {self.file_name!r}, {self.width}, {self.height}, {self.depth}, {len(self.boxes)} boxes)"
+
+
+def _number(value: float) -> Union[int, float]:
+    """
+    写入COCO时, 整数值写成int, 其余保留两位小数\n
+    :param value: 数值
+    :return: int或float
+    """
+    return int(value) if value.is_integer() else round(value, 2)
+
+
+class Dataset(object):
+    """
+    列式存储的目标检测数据集, 作为YOLO、VOC、COCO之间转换的中间表示\n
+    图片表和检测框表都以NumPy数组保存, 检测框按所属图片的下标排序, 坐标为像素坐标系下的左上角及宽高(float32)\n
+    """
+
+    def __init__(self, classes: List[str], file_names: List[str], widths: Sequence[int], heights: Sequence[int], depths: Sequence[int], box_images: Sequence[int], class_ids: Sequence[int], x: Sequence[float], y: Sequence[float], w: Sequence[float], h: Sequence[float], image_ids: Optional[Sequence[int]] = None):
+        """
+        构造函数\n
+        :param classes: 类别名称, 类别ID即为其下标
+        :param file_names: 图片文件名
+        :param widths: 图片宽度
+        :param heights: 图片高度
+        :param depths: 图片通道数
+        :param box_images: 每个检测框所属图片的下标
+        :param class_ids: 每个检测框的类别ID
+        :param x: 每个检测框左上角的x坐标
+        :param y: 每个检测框左上角的y坐标
+        :param w: 每个检测框的宽度
+        :param h: 每个检测框的高度
+        :param image_ids: 图片ID, 默认为图片的下标
+        """
+        self.classes = list(classes)
+        self.file_names = list(file_names)
+        self.widths = np.asarray(widths, dtype=np.int32)
+        self.heights = np.asarray(heights, dtype=np.int32)
+        self.depths = np.asarray(depths, dtype=np.int32)
+        self.image_ids = np.arange(len(self.file_names), dtype=np.int64) if image_ids is None else np.asarray(image_ids, dtype=np.int64)
+        box_images = np.asarray(box_images, dtype=np.int64)
+        order = np.argsort(box_images, kind="stable")
+        self.box_images = box_images[order]
+        self.class_ids = np.asarray(class_ids, dtype=np.int32)[order]
+        self.x = np.asarray(x, dtype=np.float32)[order]
+        self.y = np.asarray(y, dtype=np.float32)[order]
+        self.w = np.asarray(w, dtype=np.float32)[order]
+        self.h = np.asarray(h, dtype=np.float32)[order]
+        self.offsets = np.searchsorted(self.box_images, np.arange(len(self.file_names) + 1))
+
+    @classmethod
+    def from_columns(cls, classes: List[str], file_names: Sequence[str], widths: np.ndarray, heights: np.ndarray, depths: np.ndarray, image_ids: np.ndarray, offsets: np.ndarray, box_images: np.ndarray, class_ids: np.ndarray, x: np.ndarray, y: np.ndarray, w: np.ndarray, h: np.ndarray) -> "Dataset":
+        """
+        直接用已经按图片排序的列构造数据集, 不做类型转换、排序或复制, 用于读取二进制格式\n
+        :param classes: 类别名称
+        :param file_names: 图片文件名
+        :param widths: 图片宽度(int32)
+        :param heights: 图片高度(int32)
+        :param depths: 图片通道数(int32)
+        :param image_ids: 图片ID(int64)
+        :param offsets: 每张图片的检测框在检测框表中的起点, 共N+1个(int64)
+        :param box_images: 每个检测框所属图片的下标, 已排序(int64)
+        :param class_ids: 每个检测框的类别ID(int32)
+        :param x: 每个检测框左上角的x坐标(float32)
+        :param y: 每个检测框左上角的y坐标(float32)
+        :param w: 每个检测框的宽度(float32)
+        :param h: 每个检测框的高度(float32)
+        :return: 数据集
+        """
+        dataset = cls.__new__(cls)
+        dataset.classes = list(classes)
+        dataset.file_names = file_names
+        dataset.widths, dataset.heights, dataset.depths, dataset.image_ids = widths, heights, depths, image_ids
+        dataset.offsets, dataset.box_images, dataset.class_ids = offsets, box_images, class_ids
+        dataset.x, dataset.y, dataset.w, dataset.h = x, y, w, h
+        return dataset
+
+    def save(self, path: str) -> int:
+        """
+        保存为二进制格式, 之后可以用Dataset.load以内存映射的方式读取\n
+        :param path: 输出路径, 通常以.iads结尾
+        :return: 保存了几张图片
+        """
+        from image_annotations.binary import save
+        return save(self, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Dataset":
+        """
+        以内存映射的方式读取二进制格式的数据集, 不会解析任何标注文件\n
+        :param path: 文件路径
+        :return: 数据集, 其中的数组为只读的映射视图
+        """
+        from image_annotations.binary import load
+        return load(path)
+
+    def __len__(self) -> int:
+        return len(self.file_names)
+
+    @property
+    def num_boxes(self) -> int:
+        """
+        检测框总数\n
+        :return: 检测框总数
+        """
+        return len(self.box_images)
+
+    def __getitem__(self, index: int) -> ImageRecord:
+        """
+        获取一张图片及其检测框\n
+        :param index: 图片下标
+        :return: 图片记录
+        """
+        if index < 0:
+            index = index + len(self)
+        start, end = self.offsets[index], self.offsets[index + 1]
+        boxes = [
+            BoxRecord(class_id, self.classes[class_id], x, y, w, h)
+            for class_id, x, y, w, h in zip(self.class_ids[start:end].tolist(), self.x[start:end].tolist(), self.y[start:end].tolist(), self.w[start:end].tolist(), self.h[start:end].tolist())
+        ]
+        return ImageRecord(int(self.image_ids[index]), self.file_names[index], int(self.widths[index]), int(self.heights[index]), int(self.depths[index]), boxes)
+
+    def __iter__(self) -> Iterator[ImageRecord]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({len(self)} images, {self.num_boxes} boxes, {len(self.classes)} classes)"
+
+    def corners(self) -> np.ndarray:
+        """
+        检测框的角点坐标\n
+        :return: (N, 4)的[xmin, ymin, xmax, ymax]
+        """
+        return np.stack([self.x, self.y, self.x + self.w, self.y + self.h], axis=1)
+
+    def areas(self) -> np.ndarray:
+        """
+        检测框的面积\n
+        :return: 面积
+        """
+        return self.w * self.h
+
+    def select_images(self, mask: np.ndarray) -> "Dataset":
+        """
+        筛选图片, 被丢弃的图片的检测框一并丢弃\n
+        :param mask: 布尔数组或图片下标
+        :return: 新的数据集
+        """
+        keep = np.zeros(len(self), dtype=np.bool_)
+        keep[mask] = True
+        new_index = np.cumsum(keep) - 1
+        box_keep = keep[self.box_images]
+        return Dataset(
+            self.classes, [x for x, k in zip(self.file_names, keep.tolist()) if k],
+            self.widths[keep], self.heights[keep], self.depths[keep],
+            new_index[self.box_images[box_keep]], self.class_ids[box_keep],
+            self.x[box_keep], self.y[box_keep], self.w[box_keep], self.h[box_keep],
+            self.image_ids[keep]
+        )
+
+    def select_boxes(self, mask: np.ndarray) -> "Dataset":
+        """
+        筛选检测框, 图片全部保留\n
+        :param mask: 布尔数组或检测框下标
+        :return: 新的数据集
+        """
+        keep = np.zeros(self.num_boxes, dtype=np.bool_)
+        keep[mask] = True
+        return Dataset(
+            self.classes, self.file_names, self.widths, self.heights, self.depths,
+            self.box_images[keep], self.class_ids[keep], self.x[keep], self.y[keep], self.w[keep], self.h[keep],
+            self.image_ids
+        )
+
+    def remap_classes(self, classes: List[str]) -> "Dataset":
+        """
+        按类别名称重新编号, 不在新类别列表中的检测框会被丢弃\n
+        :param classes: 新的类别名称列表
+        :return: 新的数据集
+        """
+        index = {name: i for i, name in enumerate(classes)}
+        table = np.array([index.get(name, -1) for name in self.classes] or [-1], dtype=np.int32)
+        class_ids = table[self.class_ids]
+        keep = class_ids >= 0
+        return Dataset(
+            classes, self.file_names, self.widths, self.heights, self.depths,
+            self.box_images[keep], class_ids[keep], self.x[keep], self.y[keep], self.w[keep], self.h[keep],
+            self.image_ids
+        )
+
+    def validate(self, policy: Union[Policy, Validator] = True, min_area: float = 0.0) -> Tuple["Dataset", Dict[str, int]]:
+        """
+        用一次数组运算校验全部检测框, 并按策略裁剪或丢弃有问题的检测框及尺寸缺失的图片\n
+        :param policy: 校验策略或校验器, 见validation.Validator
+        :param min_area: 检测框的最小面积(像素), 0表示不检查, policy为校验器时忽略
+        :return: (新的数据集, 每类问题的个数)
+        """
+        checker = validator(policy if isinstance(policy, Validator) else Validator(policy, min_area), len(self.classes))
+        sized = (self.widths > 0) & (self.heights > 0)
+        counts = {}
+        if not sized.all():
+            counts["size"] = int(np.count_nonzero(~sized))
+            count("invalid_size", counts["size"])
+        original = self.corners()
+        keep, corners, box_counts = checker.check(self.class_ids, original, self.widths[self.box_images], self.heights[self.box_images], self.box_images)
+        counts.update(box_counts)
+        # 只换算被裁剪的检测框, 其余的保持原值, 避免浮点误差
+        x, y, w, h = self.x.copy(), self.y.copy(), self.w.copy(), self.h.copy()
+        changed = (corners != original).any(axis=1)
+        x[changed], y[changed] = corners[changed, 0], corners[changed, 1]
+        w[changed], h[changed] = corners[changed, 2] - corners[changed, 0], corners[changed, 3] - corners[changed, 1]
+        dataset = Dataset(
+            self.classes, self.file_names, self.widths, self.heights, self.depths,
+            self.box_images[keep], self.class_ids[keep], x[keep], y[keep], w[keep], h[keep],
+            self.image_ids
+        )
+        if checker.actions["size"] == "drop" and counts.get("size"):
+            dataset = dataset.select_images(sized)
+        return dataset, counts
+
+    @classmethod
+    def from_yolo(cls, images_dir: str, annotations_dir: str, classes: List[str], workers: Optional[int] = 1, chunksize: int = 64, image_cache: Union[None, bool, str] = None, recursive: bool = False) -> "Dataset":
+        """
+        读取YOLO格式的数据集\n
+        :param images_dir: 图片文件夹
+        :param annotations_dir: 标注文件夹
+        :param classes: 类的列表
+        :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+        :param chunksize: 每次分发给子进程的文件数
+        :param image_cache: 图片尺寸缓存, None或False表示不使用, True表示使用默认路径, 字符串表示缓存文件路径
+        :param recursive: 是否遍历子文件夹, 图片文件名记为相对images_dir的路径
+        :return: 数据集, 类别ID超出classes的范围时抛出BadFileException
+        """
+        file_names, shapes, labels = [], [], []
+        for file_name, shape, label in read_labels(images_dir, annotations_dir, workers, chunksize, image_cache, recursive, len(classes)):
+            file_names.append(file_name)
+            shapes.append(shape)
+            labels.append(label)
+        shapes = np.array(shapes, dtype=np.int64).reshape(-1, 3)
+        counts = np.array([len(x) for x in labels], dtype=np.int64)
+        labels = np.concatenate(labels) if labels else np.zeros((0, 5))
+        box_images = np.repeat(np.arange(len(file_names)), counts)
+        heights = shapes[box_images, 0]
+        widths = shapes[box_images, 1]
+        w = labels[:, 3] * widths
+        h = labels[:, 4] * heights
+        return cls(
+            classes, file_names, shapes[:, 1], shapes[:, 0], shapes[:, 2],
+            box_images, labels[:, 0], labels[:, 1] * widths - 0.5 * w, labels[:, 2] * heights - 0.5 * h, w, h
+        )
+
+    @classmethod
+    def from_voc(cls, annotations_dir: str, classes: List[str], workers: Optional[int] = 1, chunksize: int = 64, recursive: bool = False) -> "Dataset":
+        """
+        读取VOC格式的数据集, 每批chunksize个文件在子进程中解析成数组\n
+        :param annotations_dir: 标注文件夹, 也可以是tar或zip归档
+        :param classes: 类的列表
+        :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+        :param chunksize: 每批解析的文件数
+        :param recursive: 是否遍历子文件夹
+        :return: 数据集, 标注中缺少通道数时记为3
+        """
+        file_names, sizes, box_images, class_ids, boxes = [], [], [], [], []
+        for names, batch_sizes, offsets, batch_ids, batch_boxes in read_arrays(annotations_dir, classes, workers, chunksize, recursive):
+            box_images.append(np.repeat(np.arange(len(names)) + len(file_names), np.diff(offsets)))
+            file_names.extend(names)
+            sizes.append(batch_sizes)
+            class_ids.append(batch_ids)
+            boxes.append(batch_boxes)
+        sizes = np.concatenate(sizes) if sizes else np.zeros((0, 3), dtype=np.int64)
+        boxes = np.concatenate(boxes) if boxes else np.zeros((0, 4), dtype=np.float64)
+        return cls(
+            classes, file_names, sizes[:, 0], sizes[:, 1], np.where(sizes[:, 2] > 0, sizes[:, 2], 3),
+            np.concatenate(box_images) if box_images else [], np.concatenate(class_ids) if class_ids else [],
+            boxes[:, 0], boxes[:, 1], boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]
+        )
+
+    @classmethod
+    def from_coco(cls, annotation_path: str) -> "Dataset":
+        """
+        读取COCO格式的数据集, 类别按ID排序后重新从0编号\n
+        :param annotation_path: json文件路径
+        :return: 数据集
+        """
+        reader = CocoReader(annotation_path).load()
+        categories = sorted(reader.categories(), key=lambda x: x["id"])
+        category_ids = np.array([x["id"] for x in categories], dtype=np.int64)
+        starts, ends = reader.ranges()
+        counts = ends - starts
+        box_images = np.repeat(np.arange(len(reader.images)), counts)
+        # 每张图片对应reader中连续的一段标注, 拼接出这些段的下标
+        index = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        bboxes = reader.bboxes[index]
+        ids = reader.category_ids[index]
+        class_ids = np.searchsorted(category_ids, ids)
+        # searchsorted对不存在的ID也会返回一个位置, 需要确认该位置上的ID相同
+        found = class_ids < len(category_ids)
+        found[found] = category_ids[class_ids[found]] == ids[found]
+        if not found.all():
+            raise BadFileException(annotation_path, f"标注的类别ID不在categories中: {sorted(set(ids[~found].tolist()))}")
+        return cls(
+            [x["name"] for x in categories], [x["file_name"] for x in reader.images],
+            [x["width"] for x in reader.images], [x["height"] for x in reader.images], np.full(len(reader.images), 3),
+            box_images, class_ids,
+            bboxes[:, 0], bboxes[:, 1], bboxes[:, 2], bboxes[:, 3],
+            [x["id"] for x in reader.images]
+        )
+
+    def to_yolo(self, output_dir: str) -> int:
+        """
+        写出为YOLO格式\n
+        :param output_dir: 输出文件夹
+        :return: 写出了几张图片
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        widths = self.widths[self.box_images].astype(np.float64)
+        heights = self.heights[self.box_images].astype(np.float64)
+        x, y, w, h = (v.astype(np.float64) for v in (self.x, self.y, self.w, self.h))
+        labels = np.stack([(x + 0.5 * w) / widths, (y + 0.5 * h) / heights, w / widths, h / heights], axis=1).tolist()
+        class_ids = self.class_ids.tolist()
+        for i, file_name in enumerate(self.file_names):
+            start, end = self.offsets[i], self.offsets[i + 1]
+            lines = ["{} {:.4f} {:.4f} {:.4f} {:.4f}".format(class_ids[j], *labels[j]) for j in range(start, end)]
+            with open(output_path(output_dir, file_name, ".txt"), "w") as f:
+                f.write("\n".join(lines))
+        return len(self)
+
+    def to_voc(self, output_dir: str, images_dir: str) -> int:
+        """
+        写出为VOC格式, 坐标向零取整\n
+        :param output_dir: 输出文件夹
+        :param images_dir: 图片文件夹
+        :return: 写出了几张图片
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        corners = np.trunc(self.corners()).astype(np.int64).tolist()
+        class_ids = self.class_ids.tolist()
+        for i, file_name in enumerate(self.file_names):
+            start, end = self.offsets[i], self.offsets[i + 1]
+            objects = ((self.classes[class_ids[j]], *corners[j]) for j in range(start, end))
+            path = os.path.join(os.path.abspath(images_dir), file_name)
+            xml = voc_xml(image_folder(images_dir, file_name), os.path.basename(file_name), path, int(self.widths[i]), int(self.heights[i]), int(self.depths[i]), objects)
+            with open(output_path(output_dir, file_name, ".xml"), "w") as f:
+                f.write(xml)
+        return len(self)
+
+    def to_coco(self, output_path: str, indent: Optional[int] = 4) -> int:
+        """
+        写出为COCO格式, 图片ID和标注ID按顺序重新分配\n
+        :param output_path: 输出路径
+        :param indent: 输出json的缩进空格数, None表示不带空白的紧凑格式
+        :return: 写出了几张图片
+        """
+        bboxes = np.stack([self.x, self.y, self.w, self.h], axis=1).astype(np.float64).tolist()
+        class_ids = self.class_ids.tolist()
+        with CocoWriter(output_path, coco_categories(self.classes), indent) as writer:
+            for i, file_name in enumerate(self.file_names):
+                annotations = []
+                for j in range(self.offsets[i], self.offsets[i + 1]):
+                    bbox = [_number(v) for v in bboxes[j]]
+                    annotations.append({
+                        "category_id": class_ids[j],
+                        "segmentation": [],
+                        "area": _number(bboxes[j][2] * bboxes[j][3]),
+                        "bbox": bbox,
+                        "iscrowd": 0,
+                    })
+                writer.write({
+                    "width": int(self.widths[i]),
+                    "height": int(self.heights[i]),
+                    "file_name": file_name,
+                    "license": 0,
+                    "flickr_url": "https://github.com/ZongXR/image-annotations",
+                    "coco_url": "https://github.com/ZongXR/image-annotations",
+                    "date_captured": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+                }, annotations)
+        return len(self)
@@ -12,6 +12,7 @@ class BadFileException(Exception):
         :param filepath: 文件路径
         :param message: 消息
         """
+        super().__init__(filepath, message)
         self.filepath = filepath
         self.message = message
 
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+from functools import partial
+from typing import List, Optional, Callable, Iterable, Iterator, Any
+from image_annotations.utils import parallel_map
+from image_annotations.metrics import ConversionStats
+
+
+# 输出为文件夹时, 清单文件保存在输出文件夹中的文件名
+MANIFEST_NAME = ".image_annotations.manifest"
+
+
+def file_signature(paths: List[str]) -> str:
+    """
+    根据文件大小和修改时间生成签名\n
+    :param paths: 文件路径
+    :return: 签名, 任一文件不存在时抛出OSError
+    """
+    results = []
+    for path in paths:
+        stat = os.stat(path)
+        results.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(results)
+
+
+def file_digest(paths: List[str]) -> str:
+    """
+    根据文件内容生成摘要\n
+    :param paths: 文件路径
+    :return: 摘要
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class Manifest(object):
+    """
+    增量转换的清单, 记录每个输入的签名、对应的输出以及转换结果\n
+    签名与上次一致且输出仍存在的输入会直接复用上次的结果, 转换选项改变时全部输入都视为过期\n
+    """
+
+    def __init__(self, manifest_path: str, options: dict, checksum: bool = False, commit_every: int = 1000, commit_seconds: float = 30.0):
+        """
+        构造函数\n
+        :param manifest_path: 清单文件路径
+        :param options: 影响转换结果的选项, 与上次不同时全部重新转换
+        :param checksum: 文件大小或修改时间变化时, 是否再比较文件内容的摘要
+        :param commit_every: 每记录多少个结果提交一次
+        :param commit_seconds: 距上次提交超过这么多秒时也提交一次, 转换中断后最多丢失这段时间内的结果
+        """
+        self.manifest_path = manifest_path
+        self.checksum = checksum
+        self.commit_every = commit_every
+        self.commit_seconds = commit_seconds
+        self._pending = 0
+        self._committed = time.monotonic()
+        self._connection = sqlite3.connect(manifest_path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, signature TEXT, digest TEXT, output TEXT, payload BLOB, run INTEGER)")
+        options = json.dumps(options, sort_keys=True, ensure_ascii=False)
+        if self._meta("options") != options:
+            self._connection.execute("UPDATE entries SET signature = NULL, digest = NULL")
+            self._set_meta("options", options)
+        self.run = int(self._meta("run") or 0) + 1
+        self._set_meta("run", str(self.run))
+        self._connection.commit()
+
+    def _meta(self, key: str) -> Optional[str]:
+        """
+        读取元信息\n
+        :param key: 键
+        :return: 值
+        """
+        row = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, key: str, value: str):
+        """
+        写入元信息\n
+        :param key: 键
+        :param value: 值
+        """
+        self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _fresh(self, key: str, signature: str, digest: Optional[Callable[[], str]], output: Optional[str]) -> Optional[str]:
+        """
+        判断一个输入是否已是最新, 并标记为本次运行中出现过\n
+        :param key: 输入的键
+        :param signature: 输入的签名
+        :param digest: 计算输入内容摘要的函数
+        :param output: 输入对应的输出路径
+        :return: 已是最新时返回None, 否则返回内容摘要(未启用checksum时为空字符串)
+        """
+        row = self._connection.execute("SELECT signature, digest FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return digest() if self.checksum and digest is not None else ""
+        self._connection.execute("UPDATE entries SET run = ? WHERE key = ?", (self.run, key))
+        if output is not None and not os.path.exists(output):
+            return digest() if self.checksum and digest is not None else ""
+        if row[0] is not None and row[0] == signature:
+            if self.checksum and digest is not None and row[1] is None:
+                # 之前未启用checksum时没有记录摘要, 在此补上
+                self._connection.execute("UPDATE entries SET digest = ? WHERE key = ?", (digest(), key))
+            return None
+        if not self.checksum or digest is None:
+            return ""
+        value = digest()
+        if row[1] is not None and row[1] == value:
+            self._connection.execute("UPDATE entries SET signature = ? WHERE key = ?", (signature, key))
+            return None
+        return value
+
+    def _record(self, key: str, signature: str, digest: str, output: Optional[str], payload: Any):
+        """
+        记录一个输入的转换结果\n
+        :param key: 输入的键
+        :param signature: 输入的签名
+        :param digest: 输入内容的摘要
+        :param output: 输出路径
+        :param payload: 转换结果
+        """
+        self._connection.execute(
+            "INSERT OR REPLACE INTO entries (key, signature, digest, output, payload, run) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, signature, digest or None, output, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL), self.run)
+        )
+        self._pending = self._pending + 1
+        if self._pending >= self.commit_every or time.monotonic() - self._committed >= self.commit_seconds:
+            self.commit()
+
+    def _forget(self, key: str):
+        """
+        删除一个输入上次的记录及其输出文件, 用于重新转换后没有结果的输入\n
+        :param key: 输入的键
+        """
+        row = self._connection.execute("SELECT output FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return
+        if row[0] is not None and os.path.exists(row[0]):
+            os.remove(row[0])
+        self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._pending = self._pending + 1
+
+    def payload(self, key: str) -> Any:
+        """
+        读取上次记录的转换结果\n
+        :param key: 输入的键
+        :return: 转换结果
+        """
+        row = self._connection.execute("SELECT payload FROM entries WHERE key = ?", (key,)).fetchone()
+        return None if row is None or row[0] is None else pickle.loads(row[0])
+
+    def map(self, func: Callable[[Any], Any], items: Iterable, key: Callable[[Any], str], signature: Callable[[Any], str], output: Optional[Callable[[Any], str]] = None, digest: Optional[Callable[[Any], str]] = None, workers: Optional[int] = 1, chunksize: int = 64, stats: Optional[ConversionStats] = None, on_error: str = "raise", prefetch: Optional[Callable[[Iterable], Iterable]] = None) -> Iterator:
+        """
+        只对过期的输入调用func, 按items的顺序返回结果, 未过期的输入返回上次记录的结果\n
+        签名函数抛出OSError的输入(例如缺少标注文件)会被跳过, 返回值为假的结果(包括被跳过的损坏文件)不会被记录, 上次的记录及输出文件被删除, 下次仍会重新转换\n
+        :param func: 转换单个输入的函数
+        :param items: 输入
+        :param key: 获取输入的键的函数
+        :param signature: 获取输入签名的函数
+        :param output: 获取输入对应输出路径的函数
+        :param digest: 获取输入内容摘要的函数, 启用checksum时使用
+        :param workers: 并行的进程数
+        :param chunksize: 每次分发给子进程的输入数
+        :param stats: 统计, 复用上次结果的输入数记为reused
+        :param on_error: func抛出BadFileException时的处理方式, raise表示抛出, skip表示跳过
+        :param prefetch: 包装过期输入的迭代器的函数, 例如pipeline.read_ahead, 返回的元素与输入一一对应, 为None时不包装
+        :return: 结果的迭代器
+        """
+        plan = []
+        for item in items:
+            try:
+                sig = signature(item)
+            except OSError:
+                continue
+            name = key(item)
+            path = None if output is None else output(item)
+            value = self._fresh(name, sig, None if digest is None else partial(digest, item), path)
+            plan.append((item, name, sig, value, path))
+        stale = (x[0] for x in plan if x[3] is not None)
+        if prefetch is not None:
+            stale = prefetch(stale)
+        results = parallel_map(func, stale, workers, chunksize, stats, on_error)
+        for item, name, sig, value, path in plan:
+            if value is None:
+                if stats is not None:
+                    stats.count("reused")
+                yield self.payload(name)
+            else:
+                result = next(results)
+                if result:
+                    self._record(name, sig, value, path, result)
+                else:
+                    self._forget(name)
+                yield result
+
+    def prune(self) -> int:
+        """
+        删除本次运行中没有出现的输入的记录及其输出文件\n
+        :return: 删除的记录数
+        """
+        rows = self._connection.execute("SELECT key, output FROM entries WHERE run IS NULL OR run < ?", (self.run,)).fetchall()
+        for _, output in rows:
+            if output is not None and os.path.exists(output):
+                os.remove(output)
+        self._connection.execute("DELETE FROM entries WHERE run IS NULL OR run < ?", (self.run,))
+        self.commit()
+        return len(rows)
+
+    def commit(self):
+        """
+        提交已记录的结果\n
+        """
+        self._connection.commit()
+        self._pending = 0
+        self._committed = time.monotonic()
+
+    def close(self):
+        """
+        提交并关闭清单\n
+        """
+        self.commit()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Callable, Iterable, Iterator, Union, Any
+
+
+# 转换函数的progress参数: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一个输入调用一次progress(已完成数, 总数), 边遍历边转换时总数未知, 为None
+Progress = Union[None, bool, Callable[[int, int], None]]
+
+
+class ConversionStats(object):
+    """
+    一次转换调用的统计, 记录各阶段的累计耗时、各项计数、文字说明(例如图片与标注的配对情况)及跳过的损坏文件\n
+    阶段包括scan(列目录)、cache(查询图片尺寸缓存)、probe(读取图片尺寸)、parse(解析标注)、serialize(生成输出内容)、write(写文件)及total(整次调用)\n
+    多进程转换时子进程中的耗时会汇总到主进程, 因此各阶段耗时之和可能大于total\n
+    """
+
+    def __init__(self, converter: str = ""):
+        """
+        构造函数\n
+        :param converter: 转换函数名称, 由转换函数填写
+        """
+        self.converter = converter
+        self.stages: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.notes: Dict[str, str] = {}
+        self.errors: List[Dict[str, str]] = []
+
+    def add(self, stage: str, seconds: float):
+        """
+        累加一个阶段的耗时\n
+        :param stage: 阶段名
+        :param seconds: 耗时(秒)
+        """
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1):
+        """
+        累加一项计数\n
+        :param name: 计数名, 例如files、images、boxes
+        :param n: 增加的数量
+        """
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def error(self, path: str, message: str):
+        """
+        记录一个因损坏而跳过的文件\n
+        :param path: 文件路径
+        :param message: 错误信息
+        """
+        self.errors.append({"path": path, "message": message})
+        self.count("skipped")
+
+    def merge(self, other: "ConversionStats"):
+        """
+        合并另一份统计\n
+        :param other: 另一份统计
+        """
+        for key, value in other.stages.items():
+            self.add(key, value)
+        for key, value in other.counts.items():
+            self.count(key, value)
+        self.notes.update(other.notes)
+        self.errors.extend(other.errors)
+
+    def as_dict(self) -> dict:
+        """
+        转换为字典, 便于输出为json\n
+        :return: 字典
+        """
+        return {"converter": self.converter, "stages": dict(self.stages), "counts": dict(self.counts), "notes": dict(self.notes), "errors": list(self.errors)}
+
+    def __repr__(self):
+        stages = ", ".join(f"{k}={v:.3f}s" for k, v in self.stages.items())
+        counts = ", ".join(f"{k}={v}" for k, v in self.counts.items())
+        return f"ConversionStats({self.converter}: {stages}; {counts})"
+
+
+# 当前线程中正在为单个输入收集的统计, 由Measured设置; 预读线程与转换在同一进程中并发运行, 每个线程只记录到自己的统计
+_local = threading.local()
+
+
+def _current() -> Optional[ConversionStats]:
+    """
+    当前线程中正在收集的统计\n
+    :return: 统计, 没有在收集统计时为None
+    """
+    return getattr(_local, "stats", None)
+
+
+@contextmanager
+def stage(name: str, stats: Optional[ConversionStats] = None):
+    """
+    统计一个阶段的耗时, 没有在收集统计时不做任何事\n
+    :param name: 阶段名
+    :param stats: 记录到的统计, 默认为当前线程中正在收集的统计
+    """
+    stats = _current() if stats is None else stats
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(name, time.perf_counter() - start)
+
+
+@contextmanager
+def timed(stats: Optional[ConversionStats], converter: str):
+    """
+    统计整次转换调用的耗时, 记为total阶段\n
+    :param stats: 统计, 为None时不做任何事
+    :param converter: 转换函数名称
+    """
+    if stats is None:
+        yield
+        return
+    stats.converter = converter
+    with stage("total", stats):
+        yield
+
+
+def count(name: str, n: int = 1):
+    """
+    累加当前线程中正在收集的统计的计数, 没有在收集统计时不做任何事\n
+    :param name: 计数名
+    :param n: 增加的数量
+    """
+    stats = _current()
+    if stats is not None:
+        stats.count(name, n)
+
+
+class Measured(object):
+    """
+    包装处理单个输入的函数, 返回(结果, 本次调用的统计), 可被pickle发送到子进程\n
+    """
+
+    def __init__(self, func: Callable[[Any], Any]):
+        self.func = func
+
+    def __call__(self, item: Any):
+        previous = _current()
+        stats = _local.stats = ConversionStats()
+        try:
+            return self.func(item), stats
+        finally:
+            _local.stats = previous
+
+
+def track(results: Iterable, total: int, progress: Progress) -> Iterator:
+    """
+    按progress参数报告进度\n
+    :param results: 逐个输入的结果
+    :param total: 输入总数, 未知时为None
+    :param progress: True表示tqdm进度条, None或False表示不报告, 函数表示调用progress(已完成数, 总数)
+    :return: 原样返回结果的迭代器
+    """
+    if progress is True:
+        from tqdm import tqdm
+        yield from tqdm(results, total=total)
+    elif not progress:
+        yield from results
+    else:
+        for done, result in enumerate(results, 1):
+            yield result
+            progress(done, total)
+
+
+class LogProgress(object):
+    """
+    把进度定期写入日志的progress回调, 适合在没有终端的调度系统中使用\n
+    """
+
+    def __init__(self, interval: float = 10.0, logger: Optional["logging.Logger"] = None, stats: Optional[ConversionStats] = None):
+        """
+        构造函数\n
+        :param interval: 两次写日志之间至少间隔的秒数
+        :param logger: 日志记录器, 默认为image_annotations
+        :param stats: 同时输出的统计
+        """
+        import logging
+        self.interval = interval
+        self.logger = logging.getLogger("image_annotations") if logger is None else logger
+        self.stats = stats
+        self._last = None
+
+    def __call__(self, done: int, total: int):
+        now = time.monotonic()
+        if self._last is not None and now - self._last < self.interval and (total is None or done < total):
+            return
+        self._last = now
+        progress = f"{done}/{total}" if total is not None else str(done)
+        if self.stats is None:
+            self.logger.info("%s", progress)
+        else:
+            self.logger.info("%s %r", progress, self.stats)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import threading
+from queue import Queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Any, Optional, Union
+
+
+def read_ahead(load: Callable[[Any], Any], items: Iterable, threads: int, depth: Optional[int] = None) -> Iterator:
+    """
+    用线程池预读后续的输入, 处理当前输入时后面的输入已经在读取, 适合每次读取都要等待网络往返的NFS或对象存储\n
+    已读取或正在读取而还没有被取走的输入最多depth个, 消费变慢时停止预读, 内存占用有上限\n
+    :param load: 读取单个输入的函数, 在线程中执行
+    :param items: 输入
+    :param threads: 读取线程数
+    :param depth: 最多预读的输入数, 默认为线程数的4倍
+    :return: 与输入顺序一致的load结果的迭代器
+    """
+    depth = depth or threads * 4
+    pending = deque()
+    with ThreadPoolExecutor(threads, thread_name_prefix="read-ahead") as executor:
+        try:
+            for item in items:
+                pending.append(executor.submit(load, item))
+                if len(pending) >= depth:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # 提前结束时取消还没有开始的读取
+            for future in pending:
+                future.cancel()
+
+
+class WriteBehind(object):
+    """
+    在后台线程中写出转换结果, 包装ArchiveWriter或DirectoryWriter, 主进程把结果放入有界队列后立即返回\n
+    队列满时write阻塞, 写入跟不上时转换随之变慢, 内存占用有上限; 后台写入的异常在下一次write或close时抛出\n
+    """
+
+    def __init__(self, writer: Any, threads: int = 1, depth: Optional[int] = None):
+        """
+        构造函数\n
+        :param writer: 被包装的写入器, 有write(name, data)、close()及abort()方法, threads大于1时write必须是线程安全的
+        :param threads: 写入线程数, 归档只能是1
+        :param depth: 队列中最多等待写入的结果数, 默认为线程数的16倍
+        """
+        self.writer = writer
+        self._queue = Queue(depth or threads * 16)
+        self._error = None
+        self._raised = False
+        self._threads = [threading.Thread(target=self._run, name="write-behind", daemon=True) for _ in range(threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self):
+        """
+        后台线程, 依次写出队列中的结果, 出错后只取出不再写入, 避免主进程阻塞在满的队列上\n
+        """
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            if self._error is None:
+                try:
+                    self.writer.write(*task)
+                except BaseException as e:
+                    self._error = e
+
+    def _raise(self):
+        """
+        抛出后台写入的异常, 只抛出一次, 避免close时掩盖write时已经抛出的异常\n
+        """
+        if self._error is not None and not self._raised:
+            self._raised = True
+            raise self._error
+
+    def write(self, name: str, data: Union[str, bytes]):
+        """
+        把一个结果放入写入队列\n
+        :param name: 相对输出文件夹的路径或成员名, 以/分隔
+        :param data: 内容
+        """
+        self._raise()
+        self._queue.put((name, data))
+
+    def _join(self):
+        """
+        等待队列中的结果全部取出, 并结束后台线程\n
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def close(self):
+        """
+        等待队列中的结果全部写出后关闭被包装的写入器, 后台写入出错时放弃写入\n
+        """
+        self._join()
+        if self._error is not None:
+            self.writer.abort()
+            self._raise()
+            return
+        self.writer.close()
+
+    def abort(self):
+        """
+        转换出错时调用, 等待后台线程结束后放弃写入\n
+        """
+        self._join()
+        self.writer.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,572 @@
+# -*- coding: utf-8 -*-
+import io
+import re
+import json
+import warnings
+from array import array
+from numbers import Number
+import xml.etree.ElementTree as ET
+from typing import List, Iterator, Tuple, TextIO, BinaryIO, Any, Optional, Union, Dict, Sequence, Callable
+import numpy as np
+from image_annotations.exceptions import BadFileException
+
+
+_WHITESPACE = " \t\n\r"
+# 解析结果之后直到块末尾都是数字的字符时, 数字可能还没有结束
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*\Z')
+# 跳过json值时用正则表达式整体匹配括号之间的内容, 字符串整体匹配, 其中的括号不计入嵌套
+# 不超过两层的数组及含有这种数组的对象(例如COCO的图片和标注)也整体匹配, 只有更深的嵌套才逐个括号处理
+# 全部使用占有型量词, 匹配失败时不会回溯
+_STRING = r'"(?:[^"\\]++|\\.)*+"'
+_ATOM = r'[^"\[\]{}]++|' + _STRING
+_ARRAY = r'\[(?:' + _ATOM + r'|\[(?:' + _ATOM + r')*+\])*+\]'
+_OBJECT = r'\{(?:' + _ATOM + '|' + _ARRAY + r')*+\}'
+_PLAIN = re.compile(r'(?:' + _ATOM + '|' + _ARRAY + '|' + _OBJECT + r')*+')
+
+
+class _JsonStream(object):
+    """
+    分块读取json文件的简易流式解析器, 只在需要时解析单个值, 用于逐项遍历顶层对象及其中的数组\n
+    """
+
+    def __init__(self, f: TextIO, chunk_size: int = 1 << 20):
+        """
+        构造函数\n
+        :param f: 文本文件对象
+        :param chunk_size: 每次读取的字符数
+        """
+        self._file = f
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._offset = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """
+        读取下一块数据, 同时丢弃已经解析过的部分\n
+        :return: 是否读到了新数据
+        """
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._offset = self._offset + self._pos
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def tell(self) -> int:
+        """
+        当前解析位置相对文件开头的字符数, 以latin-1打开文件时即为字节数\n
+        :return: 位置
+        """
+        return self._offset + self._pos
+
+    def peek(self) -> str:
+        """
+        跳过空白并返回下一个字符\n
+        :return: 下一个字符, 文件结束时返回空字符串
+        """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos = self._pos + 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str):
+        """
+        读取一个指定的字符\n
+        :param char: 期望的字符
+        """
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self._buffer, self._pos)
+        self._pos = self._pos + 1
+
+    def value(self) -> Any:
+        """
+        解析下一个完整的json值\n
+        :return: 解析结果
+        """
+        self.peek()
+        while True:
+            try:
+                result, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # 数字可能恰好在块的边界处被截断(包括截断在小数点或指数之后), 需要读到后续字符才能确定它已经结束
+            if _NUMBER_TAIL.match(self._buffer, end) and self._fill():
+                continue
+            self._pos = end
+            return result
+
+    def items(self) -> Iterator[Any]:
+        """
+        逐个解析数组中的元素\n
+        :return: 元素的迭代器
+        """
+        self._expect("[")
+        if self.peek() == "]":
+            self._pos = self._pos + 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ",":
+                self._pos = self._pos + 1
+            else:
+                self._expect("]")
+                return
+
+    def keys(self) -> Iterator[str]:
+        """
+        逐个解析对象中的键, 调用方在取得键之后必须消费掉对应的值\n
+        :return: 键的迭代器
+        """
+        self._expect("{")
+        if self.peek() == "}":
+            self._pos = self._pos + 1
+            return
+        while True:
+            key = self.value()
+            self._expect(":")
+            yield key
+            if self.peek() == ",":
+                self._pos = self._pos + 1
+            else:
+                self._expect("}")
+                return
+
+    def skip(self):
+        """
+        跳过下一个值, 只追踪字符串及括号的嵌套, 不构造任何对象, 也不检查被跳过部分的语法\n
+        """
+        if self.peek() not in "[{":
+            # 字符串、数字、true、false、null直接解析
+            self.value()
+            return
+        # 先越过开头的括号, 之后的匹配不会越过它对应的结尾
+        self._pos = self._pos + 1
+        depth = 1
+        while True:
+            self._pos = _PLAIN.match(self._buffer, self._pos).end()
+            char = self._buffer[self._pos:self._pos + 1]
+            if char in ("", "\""):
+                # 字符串在块的末尾被截断, 读到下一块后从它的开头重新匹配
+                if not self._fill():
+                    raise json.JSONDecodeError("Unterminated value", self._buffer, self._pos)
+                continue
+            self._pos = self._pos + 1
+            depth = depth + 1 if char in "[{" else depth - 1
+            if depth == 0:
+                return
+
+
+class CocoReader(object):
+    """
+    轻量的流式COCO文件读取器\n
+    标注以按图片ID排序的NumPy数组保存, 每张图片对应数组中连续的一段, 读取类别时不会解析标注\n
+    """
+
+    def __init__(self, annotation_path: str, chunk_size: int = 1 << 20):
+        """
+        构造函数\n
+        :param annotation_path: json文件路径
+        :param chunk_size: 每次读取的字符数
+        """
+        self.annotation_path = annotation_path
+        self.chunk_size = chunk_size
+        self.images = None
+        self.category_list = None
+        self.image_ids = None
+        self.category_ids = None
+        self.bboxes = None
+        self.bbox_is_int = None
+        self._starts = None
+        self._ends = None
+
+    def _stream(self, key: str) -> Iterator:
+        """
+        流式遍历顶层的某个键的值, 数组逐项返回, 其余的值整体返回\n
+        :param key: 顶层键名
+        :return: 值的迭代器
+        """
+        with open(self.annotation_path, "r") as f:
+            stream = _JsonStream(f, self.chunk_size)
+            for name in stream.keys():
+                if name != key:
+                    stream.skip()
+                elif stream.peek() == "[":
+                    yield from stream.items()
+                    return
+                else:
+                    yield stream.value()
+                    return
+
+    def categories(self) -> List[dict]:
+        """
+        读取全部类别, 不会解析images和annotations中位于categories之后的部分\n
+        :return: 类别列表
+        """
+        if self.category_list is None:
+            self.category_list = list(self._stream("categories"))
+        return self.category_list
+
+    def field(self, key: str) -> Any:
+        """
+        整体读取一个顶层字段, 例如info、licenses, 遇到该字段后即停止解析\n
+        :param key: 字段名
+        :return: 字段的值, 字段不存在时返回None
+        """
+        with open(self.annotation_path, "r") as f:
+            stream = _JsonStream(f, self.chunk_size)
+            for name in stream.keys():
+                if name == key:
+                    return stream.value()
+                stream.skip()
+        return None
+
+    def iter_images(self) -> Iterator[dict]:
+        """
+        逐个读取图片\n
+        :return: 图片的迭代器
+        """
+        return self._stream("images")
+
+    def iter_annotations(self) -> Iterator[dict]:
+        """
+        逐个读取标注\n
+        :return: 标注的迭代器
+        """
+        return self._stream("annotations")
+
+    def load(self, keep_image: Optional[Callable[[dict], bool]] = None) -> "CocoReader":
+        """
+        一次遍历整个文件, 读取图片和类别, 并把标注压缩为按图片ID排序的数组索引\n
+        :param keep_image: 判断是否保留一张图片的函数, None表示全部保留; images位于annotations之前时, 不保留的图片的标注不会被存入数组
+        :return: 自身
+        """
+        images = []
+        categories = []
+        image_ids = array("q")
+        category_ids = array("q")
+        bboxes = array("d")
+        bbox_is_int = array("b")
+        kept = None
+        with open(self.annotation_path, "r") as f:
+            stream = _JsonStream(f, self.chunk_size)
+            for name in stream.keys():
+                if name == "images":
+                    images.extend(stream.items())
+                    if keep_image is not None:
+                        kept = {x["id"] for x in _unique_images(images) if keep_image(x)}
+                elif name == "categories":
+                    categories.extend(stream.items())
+                elif name == "annotations":
+                    for annotation in stream.items():
+                        if kept is not None and annotation["image_id"] not in kept:
+                            continue
+                        bbox = annotation["bbox"]
+                        image_ids.append(annotation["image_id"])
+                        category_ids.append(annotation["category_id"])
+                        bboxes.extend(bbox)
+                        bbox_is_int.extend(isinstance(x, int) for x in bbox)
+                else:
+                    stream.skip()
+        # 稳定排序保证同一张图片的标注保持文件中的顺序
+        image_ids = np.frombuffer(image_ids, dtype=np.int64) if image_ids else np.zeros(0, dtype=np.int64)
+        order = np.argsort(image_ids, kind="stable")
+        self.image_ids = image_ids[order]
+        self.category_ids = (np.frombuffer(category_ids, dtype=np.int64) if category_ids else np.zeros(0, dtype=np.int64))[order]
+        self.bboxes = (np.frombuffer(bboxes, dtype=np.float64) if bboxes else np.zeros(0)).reshape(-1, 4)[order]
+        self.bbox_is_int = (np.frombuffer(bbox_is_int, dtype=np.bool_) if bbox_is_int else np.zeros(0, dtype=np.bool_)).reshape(-1, 4)[order]
+        self.images = _unique_images(images)
+        if keep_image is not None:
+            self.images = [x for x in self.images if x["id"] in kept] if kept is not None else list(filter(keep_image, self.images))
+        self.category_list = categories
+        self._index()
+        return self
+
+    def _index(self):
+        """
+        计算每张图片的标注在数组中的范围\n
+        """
+        ids = np.array([x["id"] for x in self.images], dtype=np.int64)
+        self._starts = np.searchsorted(self.image_ids, ids, side="left")
+        self._ends = np.searchsorted(self.image_ids, ids, side="right")
+
+    def select(self, keep: np.ndarray, category_ids: Optional[np.ndarray] = None, drop_empty: bool = False) -> "CocoReader":
+        """
+        只保留一部分标注, 用于只转换数据集的子集, 之后遍历时只返回保留的标注\n
+        :param keep: 每个标注是否保留, 与category_ids、bboxes等数组一一对应
+        :param category_ids: 替换后的类别ID, 与keep等长, None表示不替换
+        :param drop_empty: 是否同时去掉没有保留任何标注的图片
+        :return: 自身
+        """
+        if self.images is None:
+            self.load()
+        category_ids = self.category_ids if category_ids is None else np.asarray(category_ids, dtype=np.int64)
+        self.image_ids = self.image_ids[keep]
+        self.category_ids = category_ids[keep]
+        self.bboxes = self.bboxes[keep]
+        self.bbox_is_int = self.bbox_is_int[keep]
+        self._index()
+        if drop_empty:
+            nonempty = self._ends > self._starts
+            self.images = [x for x, k in zip(self.images, nonempty.tolist()) if k]
+            self._starts, self._ends = self._starts[nonempty], self._ends[nonempty]
+        return self
+
+    def ranges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        每张图片的标注在category_ids、bboxes等数组中的范围\n
+        :return: (起始下标, 结束下标), 与images一一对应, 第i张图片的标注为[起始下标[i], 结束下标[i])
+        """
+        if self.images is None:
+            self.load()
+        return self._starts, self._ends
+
+    def annotations_of(self, index: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        获取第index张图片的标注\n
+        :param index: 图片在images中的下标
+        :return: (类别ID, [xmin, ymin, w, h]形式的框, 框的各个值在原文件中是否为整数)
+        """
+        if self.images is None:
+            self.load()
+        start, end = self._starts[index], self._ends[index]
+        return self.category_ids[start:end], self.bboxes[start:end], self.bbox_is_int[start:end]
+
+    def __len__(self) -> int:
+        if self.images is None:
+            self.load()
+        return len(self.images)
+
+    def __iter__(self) -> Iterator[Tuple[dict, np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        按文件顺序遍历图片及其标注\n
+        :return: (图片, 类别ID, 框, 框的各个值是否为整数)的迭代器
+        """
+        if self.images is None:
+            self.load()
+        for i, image in enumerate(self.images):
+            yield (image, *self.annotations_of(i))
+
+
+def _unique_images(images: List[dict]) -> List[dict]:
+    """
+    与pycocotools一致, 重复ID的图片只保留最后出现的一项, 但位置按首次出现\n
+    :param images: 图片列表
+    :return: 去重后的图片列表
+    """
+    unique = dict()
+    for image in images:
+        unique[image["id"]] = image
+    return list(unique.values())
+
+
+def number(value: float, is_int: bool) -> Any:
+    """
+    按原文件中的类型还原数值, 保证整数不会被格式化成浮点数\n
+    :param value: 数值
+    :param is_int: 原来是否为整数
+    :return: int或float
+    """
+    return int(value) if is_int else float(value)
+
+
+def _is_yolo_row(values: np.ndarray) -> np.ndarray:
+    """
+    检查YOLO标注的每一行是否合法: 类别ID为非负整数, 坐标为有限数; 坐标超出图片范围由Validator处理\n
+    :param values: (N, 5)的数组
+    :return: 每一行是否合法
+    """
+    with np.errstate(invalid="ignore"):
+        return np.isfinite(values).all(axis=1) & (values[:, 0] >= 0) & (values[:, 0] == np.floor(values[:, 0]))
+
+
+def _parse_yolo_lines(text: str, annotation_path: str) -> np.ndarray:
+    """
+    逐行解析YOLO标注, 用于一次性解析失败时找出第一个格式有误的行\n
+    :param text: 标注文件内容
+    :param annotation_path: 标注文件路径, 用于报错
+    :return: (N, 5)的数组, 每行为class_id x_center y_center w h
+    """
+    rows = []
+    for i, line in enumerate(text.splitlines()):
+        fields = line.split()
+        if not fields:
+            continue
+        try:
+            values = np.array(fields, dtype=np.float64).reshape(1, -1)
+        except ValueError:
+            values = None
+        if values is None or values.shape[1] != 5 or not _is_yolo_row(values)[0]:
+            raise BadFileException(annotation_path, f"文件第{i + 1}行格式有误: {line.strip()}")
+        rows.append(values)
+    return np.concatenate(rows) if rows else np.zeros((0, 5), dtype=np.float64)
+
+
+def parse_yolo(text: str, annotation_path: str = "") -> np.ndarray:
+    """
+    一次性把YOLO标注文本解析为数组, 空行会被忽略, 其他格式有误的行抛出BadFileException并给出行号\n
+    :param text: 标注文件内容, 换行符可以是\\n、\\r\\n或\\r
+    :param annotation_path: 标注文件路径, 用于报错
+    :return: (N, 5)的数组, 每行为class_id x_center y_center w h
+    """
+    if not text.strip():
+        return np.zeros((0, 5), dtype=np.float64)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            # newline=None把\r\n及\r统一为\n, 与splitlines的分行一致
+            labels = np.loadtxt(io.StringIO(text, newline=None), dtype=np.float64, comments=None, ndmin=2)
+        if labels.shape[1] == 5 and _is_yolo_row(labels).all():
+            return labels
+    except ValueError:
+        pass
+    # 逐行解析找出有误的行, 各行都合法时(例如含有splitlines认可的其他换行符)返回逐行解析的结果
+    return _parse_yolo_lines(text, annotation_path)
+
+
+def read_yolo(annotation_path: str) -> np.ndarray:
+    """
+    读取一个YOLO标注文件\n
+    :param annotation_path: 标注文件路径
+    :return: (N, 5)的数组, 每行为class_id x_center y_center w h
+    """
+    with open(annotation_path, "r") as f:
+        return parse_yolo(f.read(), annotation_path)
+
+
+def yolo_corners(labels: np.ndarray, width: int, height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把YOLO标注的中心点坐标换算为像素坐标的角点, 与int()一样向零取整\n
+    :param labels: (N, 5)的数组
+    :param width: 图片宽度
+    :param height: 图片高度
+    :return: (类别ID, (N, 4)的[xmin, ymin, xmax, ymax])
+    """
+    x_center = labels[:, 1] * width
+    y_center = labels[:, 2] * height
+    w_bbox = labels[:, 3] * width
+    h_bbox = labels[:, 4] * height
+    corners = np.stack([
+        x_center - 0.5 * w_bbox,
+        y_center - 0.5 * h_bbox,
+        x_center + 0.5 * w_bbox,
+        y_center + 0.5 * h_bbox
+    ], axis=1)
+    return labels[:, 0].astype(np.int64), np.trunc(corners).astype(np.int64)
+
+
+# VOC标注中size及bndbox的子元素在结果中的下标
+_VOC_SIZE = {"width": 1, "height": 2, "depth": 3}
+_VOC_BOX = {"xmin": 0, "ymin": 1, "xmax": 2, "ymax": 3}
+# 一个VOC标注: (图片文件名, 宽, 高, 通道数, 类别名称, [(xmin, ymin, xmax, ymax)]), 缺失的文件名及尺寸为None
+VocRecord = Tuple[Optional[str], Optional[int], Optional[int], Optional[int], List[str], List[Tuple[Number, Number, Number, Number]]]
+
+
+def _voc_number(text: str, annotation_path: str) -> Number:
+    """
+    把VOC标注中的数值文本转换为数值, 整数保持为int, 保证输出与原文件一致\n
+    :param text: 文本
+    :param annotation_path: 标注文件路径, 用于报错
+    :return: int或float
+    """
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        raise BadFileException(annotation_path, f"不是数值: {text!r}")
+
+
+def parse_voc(data: Union[bytes, BinaryIO], annotation_path: str = "") -> VocRecord:
+    """
+    解析VOC标注, 只遍历一次根节点的直接子元素取出图片尺寸及检测框, 不再按路径逐项查找\n
+    与findtext一样, 同一字段出现多次时取第一个, object中part等其他子元素被忽略; 坐标可以是小数\n
+    :param data: 文件内容, 或以二进制方式打开的文件对象
+    :param annotation_path: 标注文件路径, 用于报错
+    :return: (图片文件名, 宽, 高, 通道数, 类别名称, [(xmin, ymin, xmax, ymax)]), 缺失的文件名及尺寸为None
+    """
+    try:
+        root = ET.fromstring(data) if isinstance(data, bytes) else ET.parse(data).getroot()
+    except (ET.ParseError, ValueError) as e:
+        # ValueError为expat不支持的多字节编码, 例如gbk
+        raise BadFileException(annotation_path, f"xml格式错误, {e}")
+    image = [None, None, None, None]
+    names, boxes = [], []
+    for child in root:
+        tag = child.tag
+        if tag == "object":
+            name = None
+            box = [None, None, None, None]
+            for field in child:
+                if field.tag == "name":
+                    if name is None:
+                        name = field.text or ""
+                elif field.tag == "bndbox":
+                    for value in field:
+                        i = _VOC_BOX.get(value.tag)
+                        if i is not None and box[i] is None:
+                            box[i] = value.text or ""
+            if name is None or None in box:
+                raise BadFileException(annotation_path, "object缺少name或bndbox")
+            names.append(name)
+            boxes.append(tuple(_voc_number(x, annotation_path) for x in box))
+        elif tag == "size":
+            for value in child:
+                i = _VOC_SIZE.get(value.tag)
+                if i is not None and image[i] is None:
+                    image[i] = value.text or ""
+        elif tag == "filename" and image[0] is None:
+            image[0] = child.text or ""
+    sizes = [int(_voc_number(x, annotation_path)) if x is not None and x.strip() else None for x in image[1:]]
+    return (image[0], *sizes, names, boxes)
+
+
+def read_voc(annotation_path: str) -> VocRecord:
+    """
+    读取一个VOC标注文件\n
+    :param annotation_path: 标注文件路径
+    :return: (图片文件名, 宽, 高, 通道数, 类别名称, [(xmin, ymin, xmax, ymax)])
+    """
+    with open(annotation_path, "rb") as f:
+        return parse_voc(f, annotation_path)
+
+
+def class_index(classes: Sequence[str]) -> Dict[str, int]:
+    """
+    类别名称到类别ID的映射, 名称重复时取第一个, 与list.index一致\n
+    :param classes: 类别名称
+    :return: 字典
+    """
+    index = {}
+    for i, name in enumerate(classes):
+        index.setdefault(name, i)
+    return index
+
+
+def voc_arrays(records: Sequence[VocRecord], class_ids: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    把一批VOC标注转换为数组\n
+    :param records: parse_voc的结果
+    :param class_ids: 类别名称到类别ID的映射
+    :return: ((N, 3)的[宽, 高, 通道数], 缺失时为-1; 每个文件的检测框在数组中的起始下标, 长度为文件数+1; 类别ID, 未知的类别为-1; (M, 4)的[xmin, ymin, xmax, ymax])
+    """
+    sizes = np.array([[-1 if x is None else x for x in record[1:4]] for record in records], dtype=np.int64).reshape(-1, 3)
+    offsets = np.zeros(len(records) + 1, dtype=np.int64)
+    np.cumsum([len(record[4]) for record in records], out=offsets[1:])
+    ids = np.array([class_ids.get(name, -1) for record in records for name in record[4]], dtype=np.int64)
+    boxes = np.array([box for record in records for box in record[5]], dtype=np.float64).reshape(-1, 4)
+    return sizes, offsets, ids, boxes
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from typing import List, Optional, Iterator, Tuple, Callable
+from image_annotations.utils import is_image
+from image_annotations.metrics import ConversionStats
+
+
+def scan_dir(root: str, recursive: bool = False, stats: Optional[ConversionStats] = None) -> Iterator[str]:
+    """
+    用os.scandir遍历文件夹, 边遍历边返回, 不会对文件逐个stat\n
+    :param root: 文件夹
+    :param recursive: 是否遍历子文件夹
+    :param stats: 统计, 记录遍历耗时(不含调用方处理每个文件的时间)及文件数
+    :return: 文件相对root的路径, 以/分隔
+    """
+    pending = [""]
+    seconds = 0.0
+    files = 0
+    start = time.perf_counter()
+    try:
+        while pending:
+            relative = pending.pop()
+            subdirs = []
+            with os.scandir(os.path.join(root, relative) if relative else root) as entries:
+                for entry in entries:
+                    path = relative + "/" + entry.name if relative else entry.name
+                    if entry.is_dir():
+                        if recursive:
+                            subdirs.append(path)
+                    else:
+                        files = files + 1
+                        seconds = seconds + time.perf_counter() - start
+                        yield path
+                        start = time.perf_counter()
+            # 倒序入栈, 使子文件夹按遍历到的顺序展开
+            pending.extend(reversed(subdirs))
+        seconds = seconds + time.perf_counter() - start
+    finally:
+        if stats is not None:
+            stats.add("scan", seconds)
+            stats.count("files", files)
+
+
+def stem(path: str) -> str:
+    """
+    去掉相对路径中文件名的后缀, 保留所在的子文件夹\n
+    :param path: 以/分隔的相对路径
+    :return: 不含后缀的相对路径
+    """
+    folder, _, name = path.rpartition("/")
+    name = name.rpartition(".")[0]
+    return folder + "/" + name if folder else name
+
+
+def output_path(output_dir: str, path: str, suffix: str) -> str:
+    """
+    生成与输入相对路径对应的输出路径, 输入在子文件夹中时创建对应的输出子文件夹\n
+    :param output_dir: 输出文件夹
+    :param path: 输入相对路径, 以/分隔
+    :param suffix: 输出文件后缀, 例如.xml
+    :return: 输出路径
+    """
+    result = os.path.join(output_dir, stem(path) + suffix)
+    if "/" in path:
+        os.makedirs(os.path.dirname(result), exist_ok=True)
+    return result
+
+
+class Pairing(object):
+    """
+    按不含后缀的相对路径配对图片与标注文件\n
+    标注文件夹只遍历一次并建立哈希表, 图片文件夹边遍历边配对, 配对结果以生成器的形式返回\n
+    遍历结束后unpaired_images和unpaired_labels记录没有配对的图片和标注文件\n
+    """
+
+    def __init__(self, images_dir: str, annotations_dir: str, label_suffix: str = ".txt", recursive: bool = False, image_filter: Callable[[str], bool] = is_image):
+        """
+        构造函数\n
+        :param images_dir: 图片文件夹
+        :param annotations_dir: 标注文件夹
+        :param label_suffix: 标注文件后缀
+        :param recursive: 是否遍历子文件夹
+        :param image_filter: 判断文件是否为图片的函数
+        """
+        self.images_dir = images_dir
+        self.annotations_dir = annotations_dir
+        self.label_suffix = label_suffix
+        self.recursive = recursive
+        self.image_filter = image_filter
+        self.paired = 0
+        self.unpaired_images: List[str] = []
+        self.unpaired_labels: List[str] = []
+        self.seconds = 0.0
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        """
+        遍历配对结果\n
+        :return: (图片相对路径, 标注文件相对路径)的生成器
+        """
+        start = time.perf_counter()
+        labels = {}
+        for path in scan_dir(self.annotations_dir, self.recursive):
+            if path.endswith(self.label_suffix):
+                labels[path[:-len(self.label_suffix)]] = path
+        matched = set()
+        for path in scan_dir(self.images_dir, self.recursive):
+            if not self.image_filter(path):
+                continue
+            key = stem(path)
+            label = labels.get(key)
+            if label is None:
+                self.unpaired_images.append(path)
+                continue
+            matched.add(key)
+            self.paired = self.paired + 1
+            self.seconds = self.seconds + time.perf_counter() - start
+            yield path, label
+            start = time.perf_counter()
+        self.unpaired_labels = [v for k, v in labels.items() if k not in matched]
+        self.seconds = self.seconds + time.perf_counter() - start
+
+    def record(self, stats: Optional[ConversionStats]):
+        """
+        把遍历耗时、没有配对的文件数及配对情况的汇总记录到统计中, 在遍历结束后调用\n
+        :param stats: 统计
+        """
+        if stats is None:
+            return
+        stats.add("scan", self.seconds)
+        stats.count("unpaired_images", len(self.unpaired_images))
+        stats.count("unpaired_labels", len(self.unpaired_labels))
+        stats.notes["pairing"] = self.summary()
+
+    def summary(self) -> str:
+        """
+        配对情况的汇总\n
+        :return: 汇总文本
+        """
+        lines = [f"配对{self.paired}个, 没有标注的图片{len(self.unpaired_images)}个, 没有图片的标注{len(self.unpaired_labels)}个"]
+        for title, paths in (("没有标注的图片", self.unpaired_images), ("没有图片的标注", self.unpaired_labels)):
+            if paths:
+                lines.append(f"{title}: " + ", ".join(paths[:10]) + (" ..." if len(paths) > 10 else ""))
+        return "\n".join(lines)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+import hashlib
+from fnmatch import fnmatchcase
+from typing import Dict, List, Optional, Sequence, Union, Callable, Iterable, Iterator, Any
+import numpy as np
+from image_annotations.coco_ops import IdMap
+from image_annotations.metrics import ConversionStats
+
+
+# 图片名称中含有这些字符时按通配符匹配
+_WILDCARDS = "*?["
+
+
+def image_key(name: str) -> str:
+    """
+    图片在子集条件中使用的名称: 以/分隔、去掉后缀的相对路径, 同一张图片的图片文件、YOLO及VOC标注文件、COCO的file_name得到相同的名称\n
+    :param name: 图片或标注文件的相对路径
+    :return: 名称
+    """
+    name = name.replace("\\", "/")
+    folder, _, base = name.rpartition("/")
+    if "." in base:
+        base = base.rpartition(".")[0]
+    return folder + "/" + base if folder else base
+
+
+class Subset(object):
+    """
+    只转换数据集的一个子集: 按名称或通配符、按文件名哈希抽样的比例选择图片, 按类别及面积选择检测框\n
+    图片的条件在读取标注之前判断, YOLO的类别在读取图片尺寸之前判断, 不需要的输入不会被读取; 检测框的条件在校验之前判断\n
+    """
+
+    def __init__(self, classes: Optional[Sequence[Union[str, int]]] = None, min_area: float = 0.0, max_area: Optional[float] = None, images: Optional[Iterable[str]] = None, fraction: Optional[float] = None, seed: int = 0, remap: bool = True, keep_empty: bool = False):
+        """
+        构造函数\n
+        :param classes: 保留的类别名称或类别ID, None表示全部; 其他类别(包括未知的类别)的检测框在校验之前丢弃
+        :param min_area: 检测框的最小面积(像素), 0表示不限制
+        :param max_area: 检测框的最大面积(像素), None表示不限制
+        :param images: 保留的图片, 与去掉后缀的相对路径比较, 可以含有通配符, 例如train/0001或train/*, None表示全部
+        :param fraction: 按文件名的哈希值抽取的图片比例, 同一文件名在不同次运行及不同格式中的结果相同, None表示全部
+        :param seed: 抽样的随机种子
+        :param remap: 是否把保留的类别按classes中的顺序重新编号为0, 1, 2...; 为False时保持原来的类别ID及类别列表
+        :param keep_empty: 按类别或面积过滤后没有检测框的图片是否仍然输出
+        """
+        if fraction is not None and not 0.0 <= fraction <= 1.0:
+            raise ValueError(f"抽样比例必须在[0, 1]内: {fraction}")
+        if max_area is not None and max_area < min_area:
+            raise ValueError(f"最大面积小于最小面积: {max_area} < {min_area}")
+        self.classes = None if classes is None else list(dict.fromkeys(classes))
+        self.min_area = min_area
+        self.max_area = max_area
+        self.images = None if images is None else sorted(set(images))
+        self.fraction = fraction
+        self.seed = seed
+        self.remap = remap
+        self.keep_empty = keep_empty
+        self._names = None if self.images is None else {image_key(x) for x in self.images if not any(c in x for c in _WILDCARDS)}
+        self._patterns = None if self.images is None else [x for x in self.images if any(c in x for c in _WILDCARDS)]
+        self._map = None
+        self.categories: Optional[Dict[int, str]] = None
+
+    @property
+    def filters_images(self) -> bool:
+        """
+        是否按图片选择\n
+        :return: 是否有图片名称或抽样比例的条件
+        """
+        return self.images is not None or self.fraction is not None
+
+    @property
+    def filters_boxes(self) -> bool:
+        """
+        是否按检测框选择\n
+        :return: 是否有类别或面积的条件
+        """
+        return self.classes is not None or self.min_area > 0 or self.max_area is not None
+
+    @property
+    def names(self) -> List[str]:
+        """
+        输出的类别列表, 下标即输出的类别ID, 须先绑定类别\n
+        :return: 类别名称组成的列表
+        """
+        return [self.categories[i] for i in sorted(self.categories)]
+
+    def options(self) -> dict:
+        """
+        影响转换结果的选项, 用于增量转换的清单\n
+        :return: 字典
+        """
+        return {
+            "classes": self.classes, "min_area": self.min_area, "max_area": self.max_area, "images": self.images,
+            "fraction": self.fraction, "seed": self.seed, "remap": self.remap, "keep_empty": self.keep_empty
+        }
+
+    def keep_image(self, name: str) -> bool:
+        """
+        判断是否保留一张图片, 只根据名称, 不读取任何文件\n
+        :param name: 图片或标注文件的相对路径, 或COCO的file_name
+        :return: 是否保留
+        """
+        key = image_key(name)
+        if self.images is not None and key not in self._names and not any(fnmatchcase(key, x) for x in self._patterns):
+            return False
+        if self.fraction is not None:
+            digest = hashlib.blake2b(f"{self.seed}:{key}".encode("utf-8"), digest_size=8).digest()
+            return int.from_bytes(digest, "little") / float(1 << 64) < self.fraction
+        return True
+
+    def select(self, items: Iterable, name: Callable[[Any], str], stats: Optional[ConversionStats] = None) -> Iterator:
+        """
+        按名称过滤输入, 在读取之前跳过不需要的图片\n
+        :param items: 输入
+        :param name: 获取输入的相对路径的函数
+        :param stats: 统计, 跳过的图片数记为filtered
+        :return: 保留的输入的生成器
+        """
+        if not self.filters_images:
+            yield from items
+            return
+        skipped = 0
+        for item in items:
+            if self.keep_image(name(item)):
+                yield item
+            else:
+                skipped = skipped + 1
+        if stats is not None and skipped:
+            stats.count("filtered", skipped)
+
+    def bind(self, names: Sequence[str], ids: Optional[Sequence[int]] = None) -> "Subset":
+        """
+        按输入数据集的类别确定保留的类别及其输出的类别ID\n
+        :param names: 输入的类别名称
+        :param ids: 对应的类别ID, None表示names中的下标
+        :return: 绑定了类别的副本, 可被pickle发送到子进程
+        """
+        ids = list(range(len(names))) if ids is None else [int(x) for x in ids]
+        result = Subset(self.classes, self.min_area, self.max_area, self.images, self.fraction, self.seed, self.remap, self.keep_empty)
+        result.categories = dict(zip(ids, names))
+        if self.classes is None:
+            return result
+        old_ids, new_ids, retained = [], [], {}
+        for i, cls in enumerate(self.classes):
+            # 名称相同的多个类别合并为一个
+            matched = [x for x, name in zip(ids, names) if (name == cls if isinstance(cls, str) else x == cls)]
+            if not matched:
+                raise ValueError(f"未知的类别: {cls}")
+            old_ids.extend(matched)
+            new_ids.extend([i] * len(matched) if self.remap else matched)
+            retained[i] = result.categories[matched[0]]
+        result._map = IdMap(old_ids, new_ids)
+        if self.remap:
+            result.categories = retained
+        return result
+
+    def keep_classes(self, class_ids: Sequence[int]) -> np.ndarray:
+        """
+        按类别选择检测框\n
+        :param class_ids: 输入的类别ID
+        :return: 每个检测框是否保留
+        """
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        if self._map is None:
+            return np.ones(len(class_ids), dtype=np.bool_)
+        return self._map(class_ids) >= 0
+
+    def keep_boxes(self, class_ids: Sequence[int], corners: np.ndarray) -> np.ndarray:
+        """
+        按类别及面积选择一批检测框\n
+        :param class_ids: 输入的类别ID
+        :param corners: (N, 4)的[xmin, ymin, xmax, ymax]
+        :return: 每个检测框是否保留
+        """
+        keep = self.keep_classes(class_ids)
+        if self.min_area > 0 or self.max_area is not None:
+            values = np.asarray(corners, dtype=np.float64).reshape(-1, 4)
+            areas = (values[:, 2] - values[:, 0]) * (values[:, 3] - values[:, 1])
+            keep &= areas >= self.min_area
+            if self.max_area is not None:
+                keep &= areas <= self.max_area
+        return keep
+
+    def class_ids(self, class_ids: Sequence[int]) -> np.ndarray:
+        """
+        把输入的类别ID换算成输出的类别ID\n
+        :param class_ids: 输入的类别ID
+        :return: 输出的类别ID, 不保留的类别为-1
+        """
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        return class_ids if self._map is None else self._map(class_ids)
+
+    def drops(self, boxes: int) -> bool:
+        """
+        按检测框过滤后是否丢弃整张图片\n
+        :param boxes: 保留的检测框数
+        :return: 是否丢弃
+        """
+        return boxes == 0 and self.filters_boxes and not self.keep_empty
+
+
+def selection(subset: Optional[Subset], names: Sequence[str], ids: Optional[Sequence[int]] = None) -> Optional[Subset]:
+    """
+    把转换函数的subset参数绑定到输入数据集的类别\n
+    :param subset: 子集条件, None表示全部转换
+    :param names: 输入的类别名称
+    :param ids: 对应的类别ID, None表示names中的下标
+    :return: 绑定了类别的子集条件, 全部转换时为None
+    """
+    return None if subset is None else subset.bind(names, ids)
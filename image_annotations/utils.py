@@ -1,9 +1,17 @@
 # -*- coding: utf-8 -*-
+import io
 import os
-from typing import Union, Dict
+import struct
+import warnings
+from typing import Union, Dict, Tuple, Optional, BinaryIO, Callable, Iterable, Iterator, Any
 from numbers import Number
-from xml.sax.saxutils import escape
 from xml.etree.ElementTree import Element, tostring, ElementTree
+from image_annotations.exceptions import BadFileException
+from image_annotations.metrics import ConversionStats, Measured, stage
+
+
+# 转换函数的on_error参数: raise表示遇到损坏的文件时抛出BadFileException, skip表示跳过该文件并记录下来
+ON_ERROR = ("raise", "skip")
 
 
 def dict2element(tag_name: str, elements: Union[Dict, Number]) -> Element:
@@ -13,6 +21,8 @@ def dict2element(tag_name: str, elements: Union[Dict, Number]) -> Element:
     :param elements: 元素
     :return: 组装好的元素
     """
+    # saxutils会连带导入urllib, 只在用到时导入
+    from xml.sax.saxutils import escape
     result = Element(tag_name)
     if isinstance(elements, dict):
         for key, value in elements.items():
@@ -46,8 +56,7 @@ def prefix_name(filename: str) -> str:
     :param filename: 原文件名
     :return: 前缀名
     """
-    result = os.path.basename(filename).rsplit(".")
-    return ".".join(result[0:-1])
+    return os.path.basename(filename).rpartition(".")[0]
 
 
 def suffix_name(filename: str) -> str:
@@ -56,7 +65,7 @@ def suffix_name(filename: str) -> str:
     :param filename: 文件名
     :return: 后缀名
     """
-    return filename.rsplit(".")[-1]
+    return filename.rpartition(".")[2]
 
 
 def is_image(filename: str) -> bool:
@@ -68,6 +77,268 @@ def is_image(filename: str) -> bool:
     return suffix_name(filename).lower() in ("jpg", "bmp", "png")
 
 
+# JPEG中携带尺寸信息的SOF标记, 排除了DHT(0xC4)、JPG(0xC8)、DAC(0xCC)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# JPEG中没有长度字段的独立标记
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7}
+
+
+def _probe_jpeg(f: BinaryIO) -> Optional[Tuple[int, int, int]]:
+    """
+    逐段跳读JPEG文件头, 找到SOF段读取尺寸\n
+    :param f: 已跳过SOI标记的二进制文件对象
+    :return: (高, 宽, 通道数), 无法解析时返回None
+    """
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):
+            return None
+        data = f.read(2)
+        if len(data) < 2:
+            return None
+        length = struct.unpack(">H", data)[0]
+        if marker in _JPEG_SOF_MARKERS:
+            data = f.read(6)
+            if len(data) < 6:
+                return None
+            _, height, width, components = struct.unpack(">BHHB", data)
+            if height == 0 or width == 0:
+                return None
+            # cv2会把CMYK(4通道)的JPEG转换为3通道
+            return height, width, 1 if components == 1 else 3
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _probe_png(f: BinaryIO) -> Optional[Tuple[int, int, int]]:
+    """
+    读取PNG文件的IHDR块获取尺寸\n
+    :param f: 已跳过文件签名的二进制文件对象
+    :return: (高, 宽, 通道数), 无法解析时返回None
+    """
+    data = f.read(25)
+    if len(data) < 25 or data[4:8] != b"IHDR":
+        return None
+    width, height, _, color_type = struct.unpack(">IIBB", data[8:18])
+    if color_type == 0:
+        return height, width, 1
+    if color_type == 2:
+        return height, width, 3
+    if color_type in (4, 6):
+        return height, width, 4
+    if color_type == 3:
+        # 调色板图像在带有tRNS块时会被解码为4通道, tRNS一定位于IDAT之前
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            length, chunk_type = struct.unpack(">I4s", header)
+            if chunk_type == b"tRNS":
+                return height, width, 4
+            if chunk_type in (b"IDAT", b"IEND"):
+                return height, width, 3
+            f.seek(length + 4, os.SEEK_CUR)
+    return None
+
+
+def _probe_bmp(f: BinaryIO) -> Optional[Tuple[int, int, int]]:
+    """
+    读取BMP文件的DIB头获取尺寸\n
+    :param f: 已跳过文件签名的二进制文件对象
+    :return: (高, 宽, 通道数), 无法解析时返回None
+    """
+    data = f.read(16)
+    if len(data) < 16:
+        return None
+    dib_size = struct.unpack("<I", data[12:16])[0]
+    if dib_size == 12:
+        data = f.read(8)
+        if len(data) < 8:
+            return None
+        width, height, _, bit_count = struct.unpack("<HHHH", data)
+        compression = 0
+    elif dib_size >= 40:
+        data = f.read(16)
+        if len(data) < 16:
+            return None
+        width, height, _, bit_count, compression = struct.unpack("<iiHHI", data)
+    else:
+        return None
+    height = abs(height)
+    if width <= 0 or height == 0:
+        return None
+    if bit_count == 32:
+        # 仅带位域掩码的32位BMP会被cv2解码为4通道
+        return height, width, 4 if compression in (3, 6) else 3
+    if bit_count in (16, 24):
+        return height, width, 3
+    if bit_count in (1, 4, 8) and dib_size >= 40:
+        # 调色板全为灰度时cv2解码为单通道, 调色板紧跟在DIB头之后
+        data = f.read(16)
+        if len(data) < 16:
+            return None
+        colors = struct.unpack("<I", data[12:16])[0] or (1 << bit_count)
+        f.seek(dib_size - 36, os.SEEK_CUR)
+        palette = f.read(4 * colors)
+        if len(palette) < 4 * colors:
+            return None
+        for i in range(0, len(palette), 4):
+            if not palette[i] == palette[i + 1] == palette[i + 2]:
+                return height, width, 3
+        return height, width, 1
+    return None
+
+
+def probe_shape(f: BinaryIO) -> Optional[Tuple[int, int, int]]:
+    """
+    根据文件头探测图片尺寸\n
+    :param f: 二进制文件对象
+    :return: (高, 宽, 通道数), 无法解析时返回None
+    """
+    signature = f.read(8)
+    if signature[0:2] == b"\xff\xd8":
+        f.seek(2 - len(signature), os.SEEK_CUR)
+        return _probe_jpeg(f)
+    if signature == b"\x89PNG\r\n\x1a\n":
+        return _probe_png(f)
+    if signature[0:2] == b"BM":
+        f.seek(2 - len(signature), os.SEEK_CUR)
+        return _probe_bmp(f)
+    return None
+
+
+def image_shape(image_path: str) -> Tuple[int, int, int]:
+    """
+    获取图片尺寸, 优先只读取文件头, 无法解析时才完整解码图片\n
+    :param image_path: 图片路径
+    :return: (高, 宽, 通道数), 与cv2解码后的shape一致
+    """
+    with stage("probe"):
+        try:
+            with open(image_path, "rb") as f:
+                shape = probe_shape(f)
+        except (OSError, struct.error):
+            shape = None
+        if shape is not None:
+            return shape
+        import numpy as np
+        try:
+            buffer = np.fromfile(image_path, dtype=np.uint8)
+        except OSError as e:
+            # 图片在遍历之后被删除或没有读取权限时, 与损坏的图片一样处理
+            raise BadFileException(image_path, f"无法读取图片: {e.strerror or e}")
+        return _decode_shape(buffer, image_path)
+
+
+def bytes_shape(data: bytes, name: str) -> Tuple[int, int, int]:
+    """
+    获取内存中图片的尺寸, 优先只解析文件头, 无法解析时才完整解码图片\n
+    :param data: 图片文件的内容
+    :param name: 图片的路径, 用于报错
+    :return: (高, 宽, 通道数), 与cv2解码后的shape一致
+    """
+    with stage("probe"):
+        try:
+            shape = probe_shape(io.BytesIO(data))
+        except struct.error:
+            shape = None
+        if shape is not None:
+            return shape
+        import numpy as np
+        return _decode_shape(np.frombuffer(data, dtype=np.uint8), name)
+
+
+def _decode_shape(buffer, name: str) -> Tuple[int, int, int]:
+    """
+    完整解码图片获得尺寸\n
+    :param buffer: 图片文件内容组成的uint8数组
+    :param name: 图片的路径, 用于报错
+    :return: (高, 宽, 通道数)
+    """
+    import cv2
+    image = cv2.imdecode(buffer, -1)
+    if image is None:
+        raise BadFileException(name, "无法解码图片")
+    shape = image.shape
+    return (shape[0], shape[1], 1) if len(shape) == 2 else shape
+
+
+class _Failure(object):
+    """
+    被跳过的输入的处理结果, 在子进程中捕获异常后返回给主进程\n
+    """
+
+    def __init__(self, exception: BadFileException):
+        self.exception = exception
+
+    def __bool__(self) -> bool:
+        return False
+
+
+class Skipping(object):
+    """
+    包装处理单个输入的函数, 遇到损坏的文件时返回_Failure而不是抛出异常, 可被pickle发送到子进程\n
+    """
+
+    def __init__(self, func: Callable[[Any], Any]):
+        self.func = func
+
+    def __call__(self, item: Any):
+        try:
+            return self.func(item)
+        except BadFileException as e:
+            return _Failure(e)
+
+
+def parallel_map(func: Callable[[Any], Any], iterable: Iterable, workers: Optional[int] = 1, chunksize: int = 64, stats: Optional[ConversionStats] = None, on_error: str = "raise") -> Iterator:
+    """
+    按顺序返回结果的并行map, 用于把逐文件的转换分发到进程池\n
+    :param func: 处理单个元素的函数, 多进程时必须能被pickle
+    :param iterable: 待处理的元素
+    :param workers: 进程数, 1表示在当前进程中串行执行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的元素个数
+    :param stats: 汇总func中各阶段耗时及计数的统计, 为None时不收集
+    :param on_error: func抛出BadFileException时的处理方式, raise表示抛出, skip表示该元素的结果为None, 损坏的文件记录到stats的errors中, 没有stats时发出警告
+    :return: 与输入顺序一致的结果迭代器
+    """
+    if on_error not in ON_ERROR:
+        raise ValueError(f"on_error只能是{ON_ERROR}之一: {on_error}")
+    if on_error == "skip":
+        for result in parallel_map(Skipping(func), iterable, workers, chunksize, stats):
+            if isinstance(result, _Failure):
+                if stats is not None:
+                    stats.error(result.exception.filepath, result.exception.message)
+                else:
+                    warnings.warn(f"跳过{result.exception}")
+                result = None
+            yield result
+        return
+    if stats is not None:
+        for result, part in parallel_map(Measured(func), iterable, workers, chunksize):
+            stats.merge(part)
+            yield result
+        return
+    if not workers:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        yield from map(func, iterable)
+        return
+    from multiprocessing import Pool
+    with Pool(workers) as pool:
+        yield from pool.imap(func, iterable, chunksize)
+
+
 if __name__ == '__main__':
     d = {"filename": "aaa", "folder": "bbb", "size": {"width": 3, "height": 2, "depth": 3}, "object": [{"name": "aaa", "xmin": "bbb"}, {"name": "ccc", "xmin": "ddd"}, [3, 2]]}
     print(tostring(dict2element("annotation", d)))
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, Optional, Union, Tuple, Sequence, Any
+import numpy as np
+from image_annotations.metrics import count
+
+
+# 可以检查的问题: 图片尺寸缺失、类别ID超出范围或类别名称未知、检测框超出图片、退化(宽或高不为正、坐标不是有限值)、面积过小、重复
+ISSUES = ("size", "class", "bounds", "degenerate", "area", "duplicate")
+# 处理方式: report只计数, drop丢弃检测框(size为丢弃整张图片), clip把超出图片的检测框裁剪到图片内, 只适用于bounds
+ACTIONS = ("report", "drop", "clip")
+DEFAULT_POLICY = {"size": "drop", "class": "drop", "bounds": "clip", "degenerate": "drop", "area": "drop", "duplicate": "drop"}
+# 转换函数的validate参数: None或False表示不校验, True表示默认策略, report或drop表示对所有问题都采用该处理方式, 字典表示覆盖默认策略中的部分问题
+Policy = Union[None, bool, str, Dict[str, str]]
+
+
+class Validator(object):
+    """
+    检测框校验器, 一次用数组运算检查一批检测框, 并按策略裁剪或丢弃有问题的检测框\n
+    每类问题的个数记为统计中的invalid_<问题>计数, 可被pickle发送到子进程, 与转换在同一次遍历中完成\n
+    """
+
+    def __init__(self, policy: Policy = True, min_area: float = 0.0, num_classes: Optional[int] = None):
+        """
+        构造函数\n
+        :param policy: 校验策略, True表示默认策略, report或drop表示对所有问题都采用该处理方式, 字典表示覆盖默认策略中的部分问题
+        :param min_area: 检测框的最小面积(像素), 小于它的检测框记为area问题, 0表示不检查
+        :param num_classes: 类别数, 类别ID不在[0, num_classes)内时记为class问题, None表示不检查
+        """
+        if policy is None or policy is True:
+            actions = dict(DEFAULT_POLICY)
+        elif isinstance(policy, str):
+            if policy not in ("report", "drop"):
+                raise ValueError(f"校验策略只能是report、drop或字典: {policy}")
+            actions = {k: policy for k in ISSUES}
+        else:
+            unknown = set(policy) - set(ISSUES)
+            if unknown:
+                raise ValueError(f"未知的校验项: {sorted(unknown)}, 可选{ISSUES}")
+            actions = {**DEFAULT_POLICY, **policy}
+        for issue, action in actions.items():
+            if action not in ACTIONS or (action == "clip" and issue != "bounds"):
+                raise ValueError(f"{issue}不支持的处理方式: {action}")
+        self.actions = actions
+        self.min_area = min_area
+        self.num_classes = num_classes
+
+    def options(self) -> dict:
+        """
+        影响转换结果的选项, 用于增量转换的清单\n
+        :return: 字典
+        """
+        return {"actions": self.actions, "min_area": self.min_area, "num_classes": self.num_classes}
+
+    def check_size(self, width: Any, height: Any) -> bool:
+        """
+        检查一张图片的尺寸\n
+        :param width: 图片宽度, 缺失时为None
+        :param height: 图片高度, 缺失时为None
+        :return: 是否保留这张图片
+        """
+        if width is not None and height is not None and width > 0 and height > 0:
+            return True
+        count("invalid_size")
+        return self.actions["size"] != "drop"
+
+    def check(self, class_ids: Sequence[int], corners: np.ndarray, widths: Union[float, np.ndarray], heights: Union[float, np.ndarray], box_images: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, Dict[str, int]]:
+        """
+        检查一批检测框\n
+        :param class_ids: 每个检测框的类别ID, 未知的类别为-1
+        :param corners: (N, 4)的[xmin, ymin, xmax, ymax]
+        :param widths: 所属图片的宽度, 单张图片时为标量
+        :param heights: 所属图片的高度, 单张图片时为标量
+        :param box_images: 每个检测框所属图片的下标, 用于判断重复, None表示都属于同一张图片
+        :return: (保留的检测框的布尔数组, 裁剪后的角点(与输入的dtype相同), 每类问题的个数)
+        """
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        corners = np.array(corners).reshape(-1, 4)
+        n = len(corners)
+        values = corners.astype(np.float64)
+        widths = np.broadcast_to(np.asarray(widths, dtype=np.float64), (n,))
+        heights = np.broadcast_to(np.asarray(heights, dtype=np.float64), (n,))
+        keep = np.ones(n, dtype=np.bool_)
+        counts = {}
+
+        def flag(issue: str, mask: np.ndarray):
+            found = int(np.count_nonzero(mask))
+            if found:
+                counts[issue] = found
+                count(f"invalid_{issue}", found)
+                if self.actions[issue] == "drop":
+                    keep[mask] = False
+
+        if self.num_classes is not None:
+            flag("class", (class_ids < 0) | (class_ids >= self.num_classes))
+        finite = np.isfinite(values).all(axis=1)
+        # 尺寸未知的图片无法判断是否越界
+        sized = (widths > 0) & (heights > 0)
+        upper = np.stack([widths, heights, widths, heights], axis=1)
+        outside = sized & finite & ((values < 0).any(axis=1) | (values > upper).any(axis=1))
+        flag("bounds", outside)
+        if self.actions["bounds"] == "clip" and counts.get("bounds"):
+            values[outside] = np.clip(values[outside], 0, upper[outside])
+            corners[outside] = values[outside].astype(corners.dtype)
+        # 裁剪后完全落在图片外的检测框会退化
+        degenerate = ~finite | (values[:, 2] <= values[:, 0]) | (values[:, 3] <= values[:, 1])
+        flag("degenerate", degenerate)
+        if self.min_area > 0:
+            flag("area", ~degenerate & ((values[:, 2] - values[:, 0]) * (values[:, 3] - values[:, 1]) < self.min_area))
+        candidates = np.flatnonzero(keep & finite)
+        if len(candidates) > 1:
+            images = np.zeros(n, dtype=np.float64) if box_images is None else np.asarray(box_images, dtype=np.float64)
+            rows = np.column_stack([images, class_ids, values])[candidates]
+            _, first = np.unique(rows, axis=0, return_index=True)
+            duplicate = np.ones(len(candidates), dtype=np.bool_)
+            duplicate[first] = False
+            mask = np.zeros(n, dtype=np.bool_)
+            mask[candidates[duplicate]] = True
+            flag("duplicate", mask)
+        return keep, corners, counts
+
+
+def validator(validate: Union[Policy, Validator], num_classes: Optional[int] = None) -> Optional[Validator]:
+    """
+    把转换函数的validate参数转换为校验器\n
+    :param validate: None或False表示不校验, 校验器或校验策略
+    :param num_classes: 类别数
+    :return: 校验器, 不校验时为None
+    """
+    if validate is None or validate is False:
+        return None
+    if isinstance(validate, Validator):
+        return validate if validate.num_classes is not None or num_classes is None else Validator(validate.actions, validate.min_area, num_classes)
+    return Validator(validate, num_classes=num_classes)
@@ -1,162 +1,548 @@
 # -*- coding: utf-8 -*-
 import os
 import re
-from typing import List
-import xml.etree.ElementTree as ET
-import json
-import traceback
+from typing import List, Optional, Tuple, Union, Iterator, Iterable, Dict, Sequence, Callable
+from numbers import Number
+from functools import partial
+from itertools import islice
+from contextlib import ExitStack
 from datetime import datetime
-import getpass
-from tqdm import tqdm
-import image_annotations
+import numpy as np
 from image_annotations.exceptions import BadFileException
-from image_annotations.utils import prefix_name
+from image_annotations.writers import CocoWriter, coco_categories
+from image_annotations.utils import parallel_map
+from image_annotations.scan import scan_dir, stem, output_path
+from image_annotations.archives import check_recursive, is_archive, iter_members, iter_texts, open_output, write_result, write_results
+from image_annotations.manifest import Manifest, MANIFEST_NAME, file_signature, file_digest
+from image_annotations.metrics import ConversionStats, Progress, stage, timed, count, track
+from image_annotations.class_stats import ClassStats, PIXEL_BINS, scan
+from image_annotations.validation import Policy, Validator, validator
+from image_annotations.readers import VocRecord, parse_voc, read_voc, class_index, voc_arrays
+from image_annotations.pipeline import read_ahead
+from image_annotations.subset import Subset, selection
 
 
-def to_yolo(annotations_dir: str, classes: List[str], output_dir: str) -> int:
+def _is_xml(file: str) -> bool:
     """
-    转换成YOLO格式
+    根据文件名判断是否是xml文件\n
+    :param file: 文件名
+    :return: 是否是xml文件
+    """
+    return file.lower().endswith(".xml")
+
+
+def _files(annotations_dir: str, recursive: bool = False, stats: Optional[ConversionStats] = None, subset: Optional[Subset] = None) -> Iterator[Union[str, Tuple[str, bytes]]]:
+    """
+    边遍历边返回全部VOC标注文件\n
+    :param annotations_dir: 标注文件目录或归档
+    :param recursive: 是否遍历子文件夹, 归档中子文件夹里的成员总是会被读取, 归档输入时不能为True
+    :param stats: 统计
+    :param subset: 子集条件, 按名称不在子集中的标注文件不会被读取, None表示全部
+    :return: 标注文件相对路径的生成器, 归档中的标注文件返回(成员名, 文件内容), 转换时不再需要访问归档
+    """
+    check_recursive(recursive, annotations_dir)
+    if not is_archive(annotations_dir):
+        files = filter(_is_xml, scan_dir(annotations_dir, recursive, stats))
+        yield from files if subset is None else subset.select(files, str, stats)
+        return
+    is_selected = _is_xml if subset is None or not subset.filters_images else lambda x: _is_xml(x) and subset.keep_image(x)
+    for name, f in iter_members(annotations_dir, is_selected):
+        yield name, f.read()
+        if stats is not None:
+            stats.count("files")
+
+
+def _prefetch(annotations_dir: str, file: Union[str, Tuple[str, bytes]]) -> Union[str, Tuple[str, bytes]]:
+    """
+    在线程中预先读取一个标注文件的内容, 转换时不再访问文件系统\n
+    读取失败时原样返回, 由转换函数按原来的方式读取并报错\n
     :param annotations_dir: 标注文件目录
+    :param file: 标注文件相对路径, 或(成员名, 文件内容)
+    :return: (标注文件相对路径, 文件内容)
+    """
+    if not isinstance(file, str):
+        return file
+    try:
+        with open(os.path.join(annotations_dir, file), "rb") as f:
+            return file, f.read()
+    except OSError:
+        return file
+
+
+def _read_ahead(annotations_dir: str, io_threads: int) -> Optional[Callable[[Iterable], Iterator]]:
+    """
+    预读输入的函数\n
+    :param annotations_dir: 标注文件目录
+    :param io_threads: 预读线程数
+    :return: 把输入的迭代器包装为预读后的迭代器的函数, io_threads为0时返回None
+    """
+    if io_threads <= 0:
+        return None
+    return partial(read_ahead, partial(_prefetch, annotations_dir), threads=io_threads)
+
+
+def _read(annotations_dir: str, file: Union[str, Tuple[str, bytes]]) -> Tuple[str, Optional[VocRecord]]:
+    """
+    解析一个VOC标注文件\n
+    :param annotations_dir: 标注文件目录或归档
+    :param file: 标注文件相对路径, 或(成员名, 文件内容)
+    :return: (标注文件相对路径, parse_voc的结果), 不是xml文件时结果为None
+    """
+    name = file if isinstance(file, str) else file[0]
+    if not _is_xml(name):
+        return name, None
+    path = os.path.join(annotations_dir, name)
+    with stage("parse"):
+        record = read_voc(path) if isinstance(file, str) else parse_voc(file[1], path)
+    return name, record
+
+
+def _objects(annotations_dir: str, file: str, record: VocRecord, class_ids: Dict[str, int], checker: Optional[Validator] = None, subset: Optional[Subset] = None) -> Optional[Tuple[int, int, str, List[Tuple[int, Number, Number, Number, Number]]]]:
+    """
+    从VOC标注中取出图片尺寸及全部检测框\n
+    :param annotations_dir: 标注文件目录或归档
+    :param file: 标注文件相对路径, 用于报错
+    :param record: parse_voc的结果
+    :param class_ids: 类别名称到类别ID的映射
+    :param checker: 检测框校验器, 不为None时缺失的图片尺寸及未知的类别先交给校验器处理
+    :param subset: 已绑定类别的子集条件, 在校验之前按类别及面积过滤检测框, None表示全部转换
+    :return: (宽, 高, 图片文件名, [(类别ID, xmin, ymin, xmax, ymax)]), 坐标为整数时保持int, 校验或按子集过滤时丢弃了这张图片则返回None
+    """
+    filename, width, height, _, names, boxes = record
+    objects = [(class_ids.get(name, -1), *box) for name, box in zip(names, boxes)]
+    if subset is not None:
+        if objects:
+            ids = [x[0] for x in objects]
+            keep = subset.keep_boxes(ids, np.array(boxes, dtype=np.float64))
+            objects = [(new, *x[1:]) for x, new, k in zip(objects, subset.class_ids(ids).tolist(), keep.tolist()) if k]
+        if subset.drops(len(objects)):
+            count("filtered")
+            return None
+    if checker is not None:
+        with stage("validate"):
+            if not checker.check_size(width, height):
+                return None
+            if objects:
+                keep, corners, _ = checker.check([x[0] for x in objects], np.array([x[1:] for x in objects]), width or 0, height or 0)
+                # 没有被裁剪的检测框保持原值, 避免整数坐标被写成小数
+                objects = [x if corner == list(x[1:]) else (x[0], *corner) for x, corner, k in zip(objects, corners.tolist(), keep.tolist()) if k]
+    # 不校验或只报告不丢弃时, 缺失的尺寸及未知的类别无法写出
+    if width is None or height is None:
+        raise BadFileException(os.path.join(annotations_dir, file), "缺少图片尺寸")
+    if any(x[0] < 0 for x in objects):
+        raise BadFileException(os.path.join(annotations_dir, file), f"未知的类别: {sorted(set(names) - set(class_ids))}")
+    count("boxes", len(objects))
+    return width, height, filename, objects
+
+
+def _write_yolo(output_dir: Optional[str], file: str, width: int, height: int, objects: List[Tuple[int, int, int, int, int]]) -> Union[int, Tuple[str, str]]:
+    """
+    生成一个YOLO标注文件并写入输出目录\n
+    :param output_dir: 输出目录, 为None时不写文件, 返回输出内容
+    :param file: 标注文件相对路径
+    :param width: 图片宽度
+    :param height: 图片高度
+    :param objects: [(类别ID, xmin, ymin, xmax, ymax)]
+    :return: 转换的标注文件数, output_dir为None时返回(输出文件相对路径, 文件内容)
+    """
+    results = ""
+    with stage("serialize"):
+        for class_id, xmin, ymin, xmax, ymax in objects:
+            result = "{} {:.4f} {:.4f} {:.4f} {:.4f}\n".format(
+                class_id,
+                (xmin + xmax) / 2 / width,
+                (ymin + ymax) / 2 / height,
+                (xmax - xmin) / width,
+                (ymax - ymin) / height
+            )
+            results = results + result
+    if output_dir is None:
+        return stem(file) + ".txt", results.strip()
+    with stage("write"):
+        with open(output_path(output_dir, file, ".txt"), "w") as f:
+            f.write(results.strip())
+    return 1
+
+
+def _to_yolo(annotations_dir: str, class_ids: Dict[str, int], output_dir: Optional[str], checker: Optional[Validator], subset: Optional[Subset], file: Union[str, Tuple[str, bytes]]) -> Union[int, Tuple[str, str]]:
+    """
+    把一个VOC标注文件转换成YOLO格式\n
+    :param annotations_dir: 标注文件目录或归档
+    :param class_ids: 类别名称到类别ID的映射
+    :param output_dir: 输出目录, 为None时不写文件, 返回输出内容
+    :param checker: 检测框校验器, None表示不校验
+    :param subset: 已绑定类别的子集条件, None表示全部转换
+    :param file: 标注文件相对annotations_dir的路径, 或(成员名, 文件内容)
+    :return: 转换的标注文件数, output_dir为None时返回(输出文件相对路径, 文件内容)
+    """
+    file, record = _read(annotations_dir, file)
+    if record is None:
+        return 0
+    result = _objects(annotations_dir, file, record, class_ids, checker, subset)
+    if result is None:
+        return 0
+    width, height, _, objects = result
+    return _write_yolo(output_dir, file, width, height, objects)
+
+
+def to_yolo(annotations_dir: str, classes: List[str], output_dir: str, *, workers: Optional[int] = 1, chunksize: int = 64, incremental: bool = False, checksum: bool = False, progress: Progress = True, stats: Optional[ConversionStats] = None, recursive: bool = False, on_error: str = "raise", validate: Union[Policy, Validator] = None, io_threads: int = 0, subset: Optional[Subset] = None) -> int:
+    """
+    转换成YOLO格式
+    :param annotations_dir: 标注文件目录, 也可以是tar或zip归档
     :param classes: 所有的类组成的列表
-    :param output_dir: 输出目录
+    :param output_dir: 输出目录, 以归档后缀结尾时写入归档
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param incremental: 是否增量转换, 只重新转换有变化的文件, 并删除输入已不存在的输出
+    :param checksum: 增量转换时, 文件大小或修改时间变化后是否再比较文件内容
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一个文件调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹, 输出保持与输入相同的子文件夹结构
+    :param on_error: 遇到损坏的文件时的处理方式, raise表示抛出BadFileException, skip表示跳过该文件并记录到stats的errors中
+    :param validate: 转换时在同一次遍历中校验检测框, None或False表示不校验, True表示默认策略, 也可以是report、drop、{问题: 处理方式}或Validator, 各类问题的个数记为stats中的invalid_<问题>
+    :param io_threads: 大于0时用这么多个线程预读后续的标注文件, 并在后台写出结果, 适合NFS、对象存储等每次读写都要等待往返延迟的文件系统, 0表示不启用; 增量转换时只预读
+    :param subset: 只转换数据集的一个子集, 按名称或抽样比例不保留的标注文件不会被读取, 保留的类别默认重新编号, None表示全部转换
     :return: 转换的标注文件数
     """
-    count = 0
-    os.makedirs(output_dir, exist_ok=True)
-    for file in tqdm(os.listdir(annotations_dir)):
-        if file.lower().endswith(".xml"):
-            results = ""
-            tree = ET.parse(os.path.join(annotations_dir, file))
-            root = tree.getroot()
-            try:
-                width = int(root.findtext("size/width"))
-                height = int(root.findtext("size/height"))
-                for obj in root.findall("object"):
-                    name = obj.findtext("name")
-                    class_id = classes.index(name)
-                    xmin = int(obj.findtext("bndbox/xmin"))
-                    xmax = int(obj.findtext("bndbox/xmax"))
-                    ymin = int(obj.findtext("bndbox/ymin"))
-                    ymax = int(obj.findtext("bndbox/ymax"))
-                    result = "{} {:.4f} {:.4f} {:.4f} {:.4f}\n".format(
-                        class_id,
-                        (xmin + xmax) / 2 / width,
-                        (ymin + ymax) / 2 / height,
-                        (xmax - xmin) / width,
-                        (ymax - ymin) / height
-                    )
-                    results = results + result
-            except AttributeError as e:
-                if getattr(e, "obj") is None:
-                    raise BadFileException(os.path.join(annotations_dir, file), f"代码第{e.__traceback__.tb_lineno}行报错, {traceback.extract_tb(e.__traceback__)[-1].line}")
-                else:
-                    raise
-            except TypeError as e:
-                if "NoneType" in str(e):
-                    raise BadFileException(os.path.join(annotations_dir, file), f"代码第{e.__traceback__.tb_lineno}行报错, {traceback.extract_tb(e.__traceback__)[-1].line}")
-                else:
-                    raise
-            with open(os.path.join(output_dir, prefix_name(file) + ".txt"), "w") as f:
-                f.write(results.strip())
-            count = count + 1
-    return count
-
-
-def to_coco(annotations_dir: str, classes: List[str], output_path: str) -> int:
+    with timed(stats, "voc.to_yolo"), ExitStack() as stack:
+        sink = open_output(stack, output_dir, incremental, io_threads)
+        subset = selection(subset, classes)
+        files = _files(annotations_dir, recursive, stats, subset)
+        prefetch = _read_ahead(annotations_dir, io_threads)
+        checker = validator(validate, len(classes if subset is None else subset.names))
+        func = partial(_to_yolo, annotations_dir, class_index(classes), None if sink is not None else output_dir, checker, subset)
+        if not incremental:
+            files = files if prefetch is None else prefetch(files)
+            converted = write_results(track(parallel_map(func, files, workers, chunksize, stats, on_error), None, progress), sink, stats)
+        else:
+            _check_incremental(annotations_dir)
+            options = {"converter": "voc.to_yolo", "classes": classes}
+            if checker is not None:
+                options["validate"] = checker.options()
+            if subset is not None:
+                options["subset"] = subset.options()
+            with Manifest(os.path.join(output_dir, MANIFEST_NAME), options, checksum) as manifest:
+                results = manifest.map(
+                    func, files,
+                    key=str,
+                    signature=lambda x: file_signature([os.path.join(annotations_dir, x)]),
+                    output=lambda x: os.path.join(output_dir, stem(x) + ".txt"),
+                    digest=lambda x: file_digest([os.path.join(annotations_dir, x)]),
+                    workers=workers, chunksize=chunksize, stats=stats, on_error=on_error, prefetch=prefetch
+                )
+                converted = write_results(track(results, None, progress), None)
+                manifest.prune()
+        if stats is not None:
+            stats.count("images", converted)
+    return converted
+
+
+def _coco_entry(width: int, height: int, filename: str, objects: List[Tuple[int, int, int, int, int]]) -> Tuple[dict, List[dict]]:
+    """
+    生成一张图片不含ID的COCO图片及标注\n
+    :param width: 图片宽度
+    :param height: 图片高度
+    :param filename: 图片文件名
+    :param objects: [(类别ID, xmin, ymin, xmax, ymax)]
+    :return: (图片, 标注列表)
     """
-    转换成COCO格式\n
+    image = {
+        "width": width,
+        "height": height,
+        "file_name": filename,
+        "license": 0,
+        "flickr_url": "https://github.com/ZongXR/image-annotations",
+        "coco_url": "https://github.com/ZongXR/image-annotations",
+        "date_captured": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+    }
+    annotations = []
+    for class_id, xmin, ymin, xmax, ymax in objects:
+        annotations.append({
+            "category_id": class_id,  # 对应类别ID，与categories中的ID对应
+            "segmentation": [],  # 实例分割，对象的边界点坐标[x1,y1,x2,y2,....,xn,yn]
+            "area": (xmax - xmin) * (ymax - ymin),  # 对象区域面积
+            "bbox": [xmin, ymin, xmax - xmin, ymax - ymin],  # 目标检测，对象定位边框[x,y,w,h]
+            "iscrowd": 0,  # 表示是否是人群
+        })
+    return image, annotations
+
+
+def _load_coco(annotations_dir: str, class_ids: Dict[str, int], checker: Optional[Validator], subset: Optional[Subset], file: Union[str, Tuple[str, bytes]]) -> Optional[Tuple[dict, List[dict]]]:
+    """
+    读取一个VOC标注文件, 生成不含ID的COCO图片及标注\n
+    :param annotations_dir: 标注文件目录或归档
+    :param class_ids: 类别名称到类别ID的映射
+    :param checker: 检测框校验器, None表示不校验
+    :param subset: 已绑定类别的子集条件, None表示全部转换
+    :param file: 标注文件相对annotations_dir的路径, 或(成员名, 文件内容)
+    :return: (图片, 标注列表), 不是xml文件、校验或按子集过滤时丢弃了这张图片则返回None
+    """
+    file, record = _read(annotations_dir, file)
+    if record is None:
+        return None
+    result = _objects(annotations_dir, file, record, class_ids, checker, subset)
+    return None if result is None else _coco_entry(*result)
+
+
+def _load_arrays(annotations_dir: str, class_ids: Dict[str, int], files: List[Union[str, Tuple[str, bytes]]]) -> Tuple[List[Optional[str]], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    解析一批VOC标注文件, 直接生成数组, 用于读取整个数据集\n
+    :param annotations_dir: 标注文件目录或归档
+    :param class_ids: 类别名称到类别ID的映射
+    :param files: 标注文件相对路径, 或(成员名, 文件内容)
+    :return: (图片文件名, (N, 3)的[宽, 高, 通道数], 每张图片的检测框的起始下标, 类别ID, (M, 4)的[xmin, ymin, xmax, ymax])
+    """
+    names, records = [], []
+    for file in files:
+        file, record = _read(annotations_dir, file)
+        if record is None:
+            continue
+        if record[1] is None or record[2] is None:
+            raise BadFileException(os.path.join(annotations_dir, file), "缺少图片尺寸")
+        names.append(file)
+        records.append(record)
+    with stage("parse"):
+        sizes, offsets, ids, boxes = voc_arrays(records, class_ids)
+    unknown = np.flatnonzero(ids < 0)
+    if len(unknown):
+        i = int(np.searchsorted(offsets, unknown[0], side="right")) - 1
+        raise BadFileException(os.path.join(annotations_dir, names[i]), f"未知的类别: {sorted(set(records[i][4]) - set(class_ids))}")
+    count("boxes", len(ids))
+    return [x[0] for x in records], sizes, offsets, ids, boxes
+
+
+def read_arrays(annotations_dir: str, classes: List[str], workers: Optional[int] = 1, chunksize: int = 64, recursive: bool = False) -> Iterator[Tuple[List[Optional[str]], np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    每批chunksize个文件在子进程中把VOC标注解析成数组, 用于把整个数据集读入内存\n
+    :param annotations_dir: 标注文件目录或归档
+    :param classes: 类的列表
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每批解析的文件数
+    :param recursive: 是否遍历子文件夹
+    :return: 逐批的(图片文件名, (N, 3)的[宽, 高, 通道数], 每张图片的检测框的起始下标, 类别ID, (M, 4)的[xmin, ymin, xmax, ymax])的生成器
+    """
+    files = _files(annotations_dir, recursive)
+    batches = iter(lambda: list(islice(files, chunksize)), [])
+    yield from parallel_map(partial(_load_arrays, annotations_dir, class_index(classes)), batches, workers, 1)
+
+
+def _check_incremental(annotations_dir: str):
+    """
+    增量转换依赖输入文件的大小和修改时间, 不支持归档中的输入\n
     :param annotations_dir: 标注文件目录
+    """
+    if is_archive(annotations_dir):
+        raise ValueError(f"归档输入不支持增量转换: {annotations_dir}")
+
+
+def to_coco(annotations_dir: str, classes: List[str], output_path: str, *, workers: Optional[int] = 1, chunksize: int = 64, indent: Optional[int] = 4, incremental: bool = False, checksum: bool = False, progress: Progress = True, stats: Optional[ConversionStats] = None, recursive: bool = False, on_error: str = "raise", validate: Union[Policy, Validator] = None, io_threads: int = 0, subset: Optional[Subset] = None) -> int:
+    """
+    转换成COCO格式\n
+    :param annotations_dir: 标注文件目录, 也可以是tar或zip归档
     :param classes: 所有的类组成的列表
     :param output_path: 输出路径
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param indent: 输出json的缩进空格数, None表示不带空白的紧凑格式
+    :param incremental: 是否增量转换, 只重新解析有变化的文件, 其余文件复用上次的解析结果
+    :param checksum: 增量转换时, 文件大小或修改时间变化后是否再比较文件内容
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一个文件调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹
+    :param on_error: 遇到损坏的文件时的处理方式, raise表示抛出BadFileException, skip表示跳过该文件并记录到stats的errors中
+    :param validate: 转换时在同一次遍历中校验检测框, None或False表示不校验, True表示默认策略, 也可以是report、drop、{问题: 处理方式}或Validator, 各类问题的个数记为stats中的invalid_<问题>
+    :param io_threads: 大于0时用这么多个线程预读后续的标注文件, 适合NFS、对象存储等每次读取都要等待往返延迟的文件系统, 0表示不启用
+    :param subset: 只转换数据集的一个子集, 按名称或抽样比例不保留的标注文件不会被读取, 保留的类别默认重新编号, None表示全部转换
     :return: 标注文件个数
     """
-    info = {
-        "year": datetime.now().year,
-        "version": image_annotations.__version__,
-        "description": "converted by image-annotations",
-        "contributor": getpass.getuser(),
-        "url": "https://github.com/ZongXR/image-annotations",
-        "date_created": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-    }
-    licenses = [{
-        "id": 0,
-        "name": "GNU General Public License v3 (GPLv3)",
-        "url": "https://github.com/ZongXR/image-annotations/blob/main/LICENSE"
-    }]
-    categories = list(map(lambda x: {"id": x[0], "name": x[1], "supercategory": ""}, enumerate(classes)))
-    images = []
-    annotations = []
-    i = 0
-    j = 0
-    for file in tqdm(os.listdir(annotations_dir)):
-        if file.lower().endswith(".xml"):
-            tree = ET.parse(os.path.join(annotations_dir, file))
-            root = tree.getroot()
-            try:
-                width = int(root.findtext("size/width"))
-                height = int(root.findtext("size/height"))
-                image = {
-                    "id": i,
-                    "width": width,
-                    "height": height,
-                    "file_name": root.findtext("filename"),
-                    "license": 0,
-                    "flickr_url": "https://github.com/ZongXR/image-annotations",
-                    "coco_url": "https://github.com/ZongXR/image-annotations",
-                    "date_captured": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-                }
-                images.append(image)
-                for obj in root.findall("object"):
-                    name = obj.findtext("name")
-                    xmin = int(obj.findtext("bndbox/xmin"))
-                    xmax = int(obj.findtext("bndbox/xmax"))
-                    ymin = int(obj.findtext("bndbox/ymin"))
-                    ymax = int(obj.findtext("bndbox/ymax"))
-                    annotation = {
-                        "id": j,  # 目标对象ID（每个对象ID唯一），每张图片可能有多个目标
-                        "image_id": i,  # 对应图片ID
-                        "category_id": classes.index(name),  # 对应类别ID，与categories中的ID对应
-                        "segmentation": [],  # 实例分割，对象的边界点坐标[x1,y1,x2,y2,....,xn,yn]
-                        "area": (xmax - xmin) * (ymax - ymin),  # 对象区域面积
-                        "bbox": [xmin, ymin, xmax - xmin, ymax - ymin],  # 目标检测，对象定位边框[x,y,w,h]
-                        "iscrowd": 0,  # 表示是否是人群
-                    }
-                    annotations.append(annotation)
-                    j = j + 1
-                i = i + 1
-            except AttributeError as e:
-                if getattr(e, "obj") is None:
-                    raise BadFileException(os.path.join(annotations_dir, file), f"代码第{e.__traceback__.tb_lineno}行报错, {traceback.extract_tb(e.__traceback__)[-1].line}")
-                else:
-                    raise
-            except TypeError as e:
-                if "NoneType" in str(e):
-                    raise BadFileException(os.path.join(annotations_dir, file), f"代码第{e.__traceback__.tb_lineno}行报错, {traceback.extract_tb(e.__traceback__)[-1].line}")
-                else:
-                    raise
-    with open(output_path, "w") as f:
-        json.dump({
-            "info": info,
-            "licenses": licenses,
-            "categories": categories,
-            "images": images,
-            "annotations": annotations
-        }, f, indent=4, ensure_ascii=False)
-    return i
-
-
-def get_all_classes(annotations_dir: str) -> List[str]:
+    with timed(stats, "voc.to_coco"), ExitStack() as stack:
+        subset = selection(subset, classes)
+        names = classes if subset is None else subset.names
+        files = _files(annotations_dir, recursive, stats, subset)
+        prefetch = _read_ahead(annotations_dir, io_threads)
+        checker = validator(validate, len(names))
+        func = partial(_load_coco, annotations_dir, class_index(classes), checker, subset)
+        writer = stack.enter_context(CocoWriter(output_path, coco_categories(names), indent))
+        if incremental:
+            _check_incremental(annotations_dir)
+            options = {"converter": "voc.to_coco", "classes": classes}
+            if checker is not None:
+                options["validate"] = checker.options()
+            if subset is not None:
+                options["subset"] = subset.options()
+            manifest = stack.enter_context(Manifest(output_path + ".manifest", options, checksum))
+            results = manifest.map(
+                func, files,
+                key=str,
+                signature=lambda x: file_signature([os.path.join(annotations_dir, x)]),
+                digest=lambda x: file_digest([os.path.join(annotations_dir, x)]),
+                workers=workers, chunksize=chunksize, stats=stats, on_error=on_error, prefetch=prefetch
+            )
+        else:
+            manifest = None
+            results = parallel_map(func, files if prefetch is None else prefetch(files), workers, chunksize, stats, on_error)
+        # ID在主进程中按文件顺序分配, 保证结果与进程数无关
+        for result in track(results, None, progress):
+            if result is not None:
+                with stage("write", stats):
+                    writer.write(*result)
+        with stage("write", stats):
+            writer.close()
+        if manifest is not None:
+            manifest.prune()
+        if stats is not None:
+            stats.count("images", writer.images)
+    return writer.images
+
+
+def to_binary(annotations_dir: str, classes: List[str], output_path: str, workers: Optional[int] = 1, chunksize: int = 64, stats: Optional[ConversionStats] = None, recursive: bool = False) -> int:
+    """
+    转换成二进制格式, 之后可以用Dataset.load以内存映射的方式读取, 或用binary模块转换成其他格式而不再解析标注文件\n
+    :param annotations_dir: 标注文件目录
+    :param classes: 所有的类组成的列表
+    :param output_path: 输出路径, 通常以.iads结尾
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹
+    :return: 标注文件个数
+    """
+    from image_annotations.dataset import Dataset
+    with timed(stats, "voc.to_binary"):
+        with stage("parse", stats):
+            dataset = Dataset.from_voc(annotations_dir, classes, workers, chunksize, recursive)
+        with stage("write", stats):
+            dataset.save(output_path)
+        if stats is not None:
+            stats.count("images", len(dataset))
+            stats.count("boxes", dataset.num_boxes)
+    return len(dataset)
+
+
+def _to_targets(annotations_dir: str, class_ids: Dict[str, int], yolo: bool, yolo_dir: Optional[str], coco: bool, checker: Optional[Validator], subset: Optional[Subset], file: Union[str, Tuple[str, bytes]]) -> Tuple[Union[None, int, Tuple[str, str]], Optional[Tuple[dict, List[dict]]]]:
+    """
+    只解析一次VOC标注文件, 同时生成YOLO及COCO格式的结果\n
+    :param annotations_dir: 标注文件目录或归档
+    :param class_ids: 类别名称到类别ID的映射
+    :param yolo: 是否生成YOLO格式
+    :param yolo_dir: YOLO输出目录, 为None时返回输出内容
+    :param coco: 是否生成COCO格式
+    :param checker: 检测框校验器, None表示不校验
+    :param subset: 已绑定类别的子集条件, None表示全部转换
+    :param file: 标注文件相对annotations_dir的路径, 或(成员名, 文件内容)
+    :return: (YOLO结果, COCO的图片及标注), 不需要的格式、不是xml文件、校验或按子集过滤时丢弃了这张图片时为None
+    """
+    file, record = _read(annotations_dir, file)
+    if record is None:
+        return None, None
+    result = _objects(annotations_dir, file, record, class_ids, checker, subset)
+    if result is None:
+        return None, None
+    width, height, filename, objects = result
+    yolo_result = _write_yolo(yolo_dir, file, width, height, objects) if yolo else None
+    coco_result = _coco_entry(width, height, filename, objects) if coco else None
+    return yolo_result, coco_result
+
+
+def convert(annotations_dir: str, classes: List[str], targets: Dict[str, str], workers: Optional[int] = 1, chunksize: int = 64, indent: Optional[int] = 4, progress: Progress = True, stats: Optional[ConversionStats] = None, recursive: bool = False, on_error: str = "raise", validate: Union[Policy, Validator] = None, io_threads: int = 0, subset: Optional[Subset] = None) -> int:
+    """
+    一次遍历同时转换成多种格式, 每个标注文件只读取、解析一次\n
+    :param annotations_dir: 标注文件目录, 也可以是tar或zip归档
+    :param classes: 所有的类组成的列表
+    :param targets: 目标格式到输出路径的映射, 支持yolo(输出目录, 以归档后缀结尾时写入归档)和coco(json文件路径)
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param indent: 输出json的缩进空格数, None表示不带空白的紧凑格式
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一个文件调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹, 输出保持与输入相同的子文件夹结构
+    :param on_error: 遇到损坏的文件时的处理方式, raise表示抛出BadFileException, skip表示跳过该文件并记录到stats的errors中
+    :param validate: 转换时在同一次遍历中校验检测框, None或False表示不校验, True表示默认策略, 也可以是report、drop、{问题: 处理方式}或Validator, 各类问题的个数记为stats中的invalid_<问题>
+    :param io_threads: 大于0时用这么多个线程预读后续的标注文件, 并在后台写出YOLO结果, 适合NFS、对象存储等每次读写都要等待往返延迟的文件系统, 0表示不启用
+    :param subset: 只转换数据集的一个子集, 按名称或抽样比例不保留的标注文件不会被读取, 保留的类别默认重新编号, None表示全部转换
+    :return: 转换的标注文件数
+    """
+    unknown = set(targets) - {"yolo", "coco"}
+    if unknown or not targets:
+        raise ValueError(f"不支持的目标格式: {sorted(unknown)}, VOC格式可以转换成yolo、coco")
+    with timed(stats, "voc.convert"), ExitStack() as stack:
+        subset = selection(subset, classes)
+        names = classes if subset is None else subset.names
+        sink = None if "yolo" not in targets else open_output(stack, targets["yolo"], io_threads=io_threads)
+        writer = None if "coco" not in targets else stack.enter_context(CocoWriter(targets["coco"], coco_categories(names), indent))
+        files = _files(annotations_dir, recursive, stats, subset)
+        prefetch = _read_ahead(annotations_dir, io_threads)
+        files = files if prefetch is None else prefetch(files)
+        func = partial(_to_targets, annotations_dir, class_index(classes), "yolo" in targets, None if sink is not None else targets.get("yolo"), writer is not None, validator(validate, len(names)), subset)
+        converted = 0
+        # COCO的ID在主进程中按文件顺序分配, 保证结果与进程数无关
+        for result in track(parallel_map(func, files, workers, chunksize, stats, on_error), None, progress):
+            if result is None:
+                continue
+            yolo_result, coco_result = result
+            if yolo_result is None and coco_result is None:
+                continue
+            converted = converted + 1
+            if yolo_result is not None:
+                write_result(yolo_result, sink, stats)
+            if coco_result is not None:
+                with stage("write", stats):
+                    writer.write(*coco_result)
+        if writer is not None:
+            with stage("write", stats):
+                writer.close()
+        if stats is not None:
+            stats.count("images", converted)
+    return converted
+
+
+def _class_sizes(annotations_dir: str, file: Union[str, Tuple[str, bytes]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    读取一个VOC标注文件中每个检测框的类别名称及尺寸, 坐标可以是小数\n
+    :param annotations_dir: 标注文件目录或归档
+    :param file: 标注文件相对路径, 或(成员名, 文件内容)
+    :return: (类别名称, 面积的平方根)
+    """
+    file, record = _read(annotations_dir, file)
+    if record is None:
+        return np.array([], dtype=str), np.array([])
+    names, boxes = record[4], np.array(record[5], dtype=np.float64).reshape(-1, 4)
+    sizes = np.maximum(boxes[:, 2] - boxes[:, 0], 0.0) * np.maximum(boxes[:, 3] - boxes[:, 1], 0.0)
+    return np.array(names, dtype=str), np.sqrt(sizes)
+
+
+def class_stats(annotations_dir: str, bins: Sequence[float] = PIXEL_BINS, workers: Optional[int] = 1, chunksize: int = 64, sample: Optional[int] = None, stable_after: Optional[int] = None, progress: Progress = True, stats: Optional[ConversionStats] = None, recursive: bool = False) -> ClassStats:
+    """
+    一次遍历统计各类别的检测框数、图片数及检测框尺寸的直方图, 可用于生成classes参数\n
+    :param annotations_dir: 标注文件所在文件夹, 也可以是tar或zip归档
+    :param bins: 尺寸(像素面积的平方根)直方图的分箱边界
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param sample: 最多统计多少个标注文件, None表示全部
+    :param stable_after: 连续这么多个文件没有出现新类别时提前结束, None表示不提前结束
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一个文件调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹
+    :return: 类别统计, 提前结束时complete为False
+    """
+    with timed(stats, "voc.class_stats"):
+        return scan(partial(_class_sizes, annotations_dir), _files(annotations_dir, recursive, stats), bins, workers, chunksize, sample, stable_after, progress, stats)
+
+
+def get_all_classes(annotations_dir: str, *, progress: Progress = True, stats: Optional[ConversionStats] = None, recursive: bool = False) -> List[str]:
     """
     获取全部类别名称\n
-    :param annotations_dir: 标注文件所在文件夹
+    :param annotations_dir: 标注文件所在文件夹, 也可以是tar或zip归档
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一个文件调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹
     :return: 全部类别名称组成的列表
     """
     results = set()
-    for file in tqdm(os.listdir(annotations_dir)):
-        if file.lower().endswith(".xml"):
-            fullpath = os.path.join(annotations_dir, file)
-            with open(fullpath, "r") as f:
-                results.update(set(re.findall(r"<object>.*?<name>(.*?)</name>.*?</object>", f.read(), re.DOTALL)))
+    with timed(stats, "voc.get_all_classes"):
+        for file, text in track(iter_texts(annotations_dir, _is_xml, recursive, stats), None, progress):
+            with stage("parse", stats):
+                results.update(set(re.findall(r"<object>.*?<name>(.*?)</name>.*?</object>", text, re.DOTALL)))
     return list(results)
 
 
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import shutil
+import getpass
+import tempfile
+import uuid
+from typing import List, Optional, Iterable, Tuple, Any
+from datetime import datetime
+import image_annotations
+
+
+def coco_info() -> dict:
+    """
+    生成COCO文件的info字段\n
+    :return: info字典
+    """
+    return {
+        "year": datetime.now().year,
+        "version": image_annotations.__version__,
+        "description": "converted by image-annotations",
+        "contributor": getpass.getuser(),
+        "url": "https://github.com/ZongXR/image-annotations",
+        "date_created": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+    }
+
+
+def coco_licenses() -> List[dict]:
+    """
+    生成COCO文件的licenses字段\n
+    :return: licenses列表
+    """
+    return [{
+        "id": 0,
+        "name": "GNU General Public License v3 (GPLv3)",
+        "url": "https://github.com/ZongXR/image-annotations/blob/main/LICENSE"
+    }]
+
+
+def coco_categories(classes: List[str]) -> List[dict]:
+    """
+    根据类别名称生成COCO文件的categories字段\n
+    :param classes: 类的列表
+    :return: categories列表
+    """
+    return list(map(lambda x: {"id": x[0], "name": x[1], "supercategory": ""}, enumerate(classes)))
+
+
+def _escape(value: Any) -> str:
+    """
+    转义xml文本, 与minidom的toprettyxml保持一致\n
+    :param value: 文本
+    :return: 转义后的文本
+    """
+    return str(value).replace("&", "&amp;").replace("<", "&lt;").replace("\"", "&quot;").replace(">", "&gt;")
+
+
+def _element(tag: str, value: Any, indent: str) -> str:
+    """
+    生成只含文本的单行xml元素\n
+    :param tag: 标签名
+    :param value: 文本
+    :param indent: 缩进
+    :return: 带换行的xml字符串
+    """
+    text = _escape(value)
+    if not text:
+        return f"{indent}<{tag}/>\n"
+    return f"{indent}<{tag}>{text}</{tag}>\n"
+
+
+def voc_xml(folder: str, filename: str, path: str, width: Any, height: Any, depth: Any, objects: Iterable[Tuple[str, Any, Any, Any, Any]]) -> str:
+    """
+    直接按模板生成VOC标注文件的内容, 格式与toprettyxml(indent="\\t")的输出一致\n
+    :param folder: 图片所在文件夹名
+    :param filename: 图片文件名
+    :param path: 图片路径
+    :param width: 图片宽度
+    :param height: 图片高度
+    :param depth: 图片通道数
+    :param objects: (类别名称, xmin, ymin, xmax, ymax)组成的可迭代对象
+    :return: xml字符串
+    """
+    parts = [
+        '<?xml version="1.0" ?>\n<annotation>\n',
+        _element("folder", folder, "\t"),
+        _element("filename", filename, "\t"),
+        _element("path", path, "\t"),
+        "\t<source>\n\t\t<database>Unknown</database>\n\t</source>\n\t<size>\n",
+        _element("width", width, "\t\t"),
+        _element("height", height, "\t\t"),
+        _element("depth", depth, "\t\t"),
+        "\t</size>\n\t<segmented>0</segmented>\n"
+    ]
+    for name, xmin, ymin, xmax, ymax in objects:
+        parts.append("\t<object>\n")
+        parts.append(_element("name", name, "\t\t"))
+        parts.append("\t\t<pose>Unspecified</pose>\n\t\t<truncated>0</truncated>\n\t\t<difficult>0</difficult>\n\t\t<bndbox>\n")
+        parts.append(_element("xmin", xmin, "\t\t\t"))
+        parts.append(_element("ymin", ymin, "\t\t\t"))
+        parts.append(_element("xmax", xmax, "\t\t\t"))
+        parts.append(_element("ymax", ymax, "\t\t\t"))
+        parts.append("\t\t</bndbox>\n\t</object>\n")
+    parts.append("</annotation>\n")
+    return "".join(parts)
+
+
+class CocoFormat(object):
+    """
+    COCO文件的序列化格式, indent为4时与json.dump(..., indent=4)完全一致, indent为None时为不带空白的紧凑格式\n
+    """
+
+    def __init__(self, indent: Optional[int] = 4):
+        """
+        构造函数\n
+        :param indent: 缩进空格数, None表示紧凑格式
+        """
+        self.indent = indent
+        if indent is None:
+            self._separators = (",", ":")
+            self.item_sep = ","
+            self.close_sep = ""
+        else:
+            self._separators = None
+            self.item_sep = ",\n" + " " * (2 * indent)
+            self.close_sep = "\n" + " " * indent
+
+    def dumps(self, obj, level: int) -> str:
+        """
+        按当前格式序列化一个对象\n
+        :param obj: 对象
+        :param level: 对象所处的缩进层数
+        :return: json字符串
+        """
+        text = json.dumps(obj, indent=self.indent, separators=self._separators, ensure_ascii=False)
+        if self.indent is not None and level > 0:
+            text = text.replace("\n", "\n" + " " * (self.indent * level))
+        return text
+
+    def key_prefix(self, key: str) -> str:
+        """
+        顶层键名及数组的开头\n
+        :param key: 键名
+        :return: 字符串
+        """
+        if self.indent is None:
+            return f',"{key}":['
+        return f',\n{" " * self.indent}"{key}": ['
+
+    def item(self, obj: dict, index: int) -> str:
+        """
+        顶层数组中的一个元素及其前面的分隔符\n
+        :param obj: 元素
+        :param index: 元素在数组中的下标
+        :return: 字符串
+        """
+        if index > 0:
+            return self.item_sep + self.dumps(obj, 2)
+        if self.indent is not None:
+            return "\n" + " " * (2 * self.indent) + self.dumps(obj, 2)
+        return self.dumps(obj, 2)
+
+    def close_array(self, count: int) -> str:
+        """
+        顶层数组的结尾\n
+        :param count: 数组的元素个数
+        :return: 字符串
+        """
+        return (self.close_sep if count > 0 else "") + "]"
+
+
+class CocoWriter(object):
+    """
+    流式COCO文件写入器, 图片边处理边写入, 标注先暂存到临时文件, 关闭时再拼接到文件末尾\n
+    内容先写入同一文件夹中的临时文件, 正常关闭后才替换输出文件; 在with语句中抛出异常时删除临时文件, 输出文件保持原样\n
+    indent为4时输出与json.dump(..., indent=4)完全一致, indent为None时输出不带空白的紧凑格式\n
+    """
+
+    def __init__(self, output_path: str, categories: List[dict], indent: Optional[int] = 4, info: Optional[dict] = None, licenses: Optional[List[dict]] = None):
+        """
+        构造函数\n
+        :param output_path: 输出路径
+        :param categories: COCO的categories字段
+        :param indent: 缩进空格数, None表示紧凑格式
+        :param info: COCO的info字段, 默认自动生成
+        :param licenses: COCO的licenses字段, 默认自动生成
+        """
+        self.output_path = output_path
+        self.indent = indent
+        self.images = 0
+        self.annotations = 0
+        self._format = CocoFormat(indent)
+        head = {
+            "info": coco_info() if info is None else info,
+            "licenses": coco_licenses() if licenses is None else licenses,
+            "categories": categories
+        }
+        folder, name = os.path.split(os.path.abspath(output_path))
+        self._temp_path = os.path.join(folder, f".{name}.{uuid.uuid4().hex}.tmp")
+        self._file = open(self._temp_path, "w")
+        self._spool = tempfile.TemporaryFile("w+", dir=folder)
+        # 去掉结尾的"}", 后面接着写images数组
+        self._file.write(self._format.dumps(head, 0)[:-1].rstrip())
+        self._file.write(self._format.key_prefix("images"))
+
+    def write(self, image: dict, annotations: Iterable[dict] = ()) -> int:
+        """
+        写入一张图片及其标注, 图片ID与标注ID按写入顺序自动分配\n
+        :param image: 不含id的COCO图片
+        :param annotations: 不含id和image_id的COCO标注
+        :return: 分配的图片ID
+        """
+        image_id = self.images
+        self._file.write(self._format.item({"id": image_id, **image}, image_id))
+        for annotation in annotations:
+            self.write_annotation({
+                "image_id": image_id,  # 对应图片ID
+                **annotation
+            })
+        self.images = self.images + 1
+        return image_id
+
+    def write_annotation(self, annotation: dict) -> int:
+        """
+        单独写入一个标注, 标注ID按写入顺序自动分配\n
+        :param annotation: 不含id、已含image_id的COCO标注
+        :return: 分配的标注ID
+        """
+        annotation_id = self.annotations
+        # 目标对象ID（每个对象ID唯一），每张图片可能有多个目标
+        self._spool.write(self._format.item({"id": annotation_id, **annotation}, annotation_id))
+        self.annotations = self.annotations + 1
+        return annotation_id
+
+    def close(self):
+        """
+        把暂存的标注拼接到文件末尾, 关闭文件后替换输出文件\n
+        """
+        if self._file.closed:
+            return
+        try:
+            self._file.write(self._format.close_array(self.images))
+            self._file.write(self._format.key_prefix("annotations"))
+            self._spool.seek(0)
+            shutil.copyfileobj(self._spool, self._file)
+            self._file.write(self._format.close_array(self.annotations))
+            self._file.write("}" if self.indent is None else "\n}")
+        except BaseException:
+            self.abort()
+            raise
+        self._spool.close()
+        self._file.close()
+        os.replace(self._temp_path, self.output_path)
+
+    def abort(self):
+        """
+        放弃写入, 关闭并删除临时文件, 输出文件保持原样\n
+        """
+        self._spool.close()
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
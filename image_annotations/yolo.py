@@ -1,181 +1,603 @@
 # -*- coding: utf-8 -*-
 import os
-import re
-import json
-from typing import List
+from typing import List, Optional, Tuple, Union, Iterator, Iterable, Dict, Sequence, Callable
+from itertools import islice
+from functools import partial
+from contextlib import ExitStack
 from datetime import datetime
-import getpass
-from xml.etree.ElementTree import tostring
-from xml.dom.minidom import parseString
 import numpy as np
-import cv2
-from tqdm import tqdm
-import image_annotations
+from image_annotations.writers import CocoWriter, coco_categories, voc_xml
+from image_annotations.readers import read_yolo, parse_yolo, yolo_corners
+from image_annotations.utils import image_shape, bytes_shape, parallel_map
+from image_annotations.manifest import Manifest, MANIFEST_NAME, file_signature, file_digest
+from image_annotations.cache import open_cache
+from image_annotations.scan import Pairing, scan_dir, stem, output_path
+from image_annotations.archives import ArchivePairing, archive_name, is_archive, iter_texts, open_output, write_result, write_results
+from image_annotations.metrics import ConversionStats, Progress, stage, timed, count, track
+from image_annotations.class_stats import ClassStats, RELATIVE_BINS, scan
+from image_annotations.validation import Policy, Validator, validator
+from image_annotations.pipeline import read_ahead
+from image_annotations.subset import Subset, selection
 from image_annotations.exceptions import BadFileException
-from image_annotations.utils import dict2element
-from image_annotations.utils import prefix_name, suffix_name, is_image
 
 
-def to_voc(images_dir: str, annotations_dir: str, classes: List[str], output_dir: str) -> int:
+def _inputs(images_dir: str, annotations_dir: str, item: Tuple[str, str, Optional[Tuple[int, int, int]]]) -> List[str]:
     """
-    转换成voc格式\n
+    一张图片对应的全部输入文件\n
+    :param images_dir: 图像文件夹
+    :param annotations_dir: 标注文件夹
+    :param item: (图片相对路径, 标注文件相对路径, 图片尺寸)
+    :return: [图片路径, 标注文件路径]
+    """
+    return [os.path.join(images_dir, item[0]), os.path.join(annotations_dir, item[1])]
+
+
+def _shape(image_path: str, shape: Union[None, Tuple[int, int, int], bytes]) -> Tuple[int, int, int]:
+    """
+    确定一张图片的尺寸, 在转换函数中调用, 损坏的图片按on_error处理\n
+    :param image_path: 图片路径
+    :param shape: 已知的尺寸, None表示读取图片获得, 字节表示归档中文件头无法解析的图片内容
+    :return: (高, 宽, 通道数)
+    """
+    if shape is None:
+        return image_shape(image_path)
+    if isinstance(shape, bytes):
+        return bytes_shape(shape, image_path)
+    return shape
+
+
+def _read(images_dir: str, annotations_dir: str, item: tuple) -> Tuple[str, Tuple[int, int, int], np.ndarray]:
+    """
+    读取一张图片的尺寸及其YOLO标注\n
+    :param images_dir: 图像文件夹或归档
+    :param annotations_dir: 标注文件夹或归档
+    :param item: (图片相对路径, 标注文件相对路径, 图片尺寸[, 标注文件内容]), 尺寸为None时读取图片获得, 为字节时解码, 来自归档的输入带有标注文件内容
+    :return: (图片路径, (高, 宽, 通道数), (N, 5)的标注数组)
+    """
+    image_path, annotation_path = _inputs(images_dir, annotations_dir, item)
+    shape = _shape(image_path, item[2])
+    with stage("parse"):
+        labels = read_yolo(annotation_path) if len(item) < 4 else parse_yolo(item[3], annotation_path)
+    return image_path, shape, labels
+
+
+def _prefetch(images_dir: str, annotations_dir: str, subset: Optional[Subset], item: tuple) -> tuple:
+    """
+    在线程中预先读取一张图片的尺寸及其标注文件内容, 转换时不再访问文件系统\n
+    读取失败时原样返回, 由转换函数按原来的方式读取并报错; 按类别过滤后会被丢弃的图片不读取尺寸\n
+    :param images_dir: 图像文件夹
+    :param annotations_dir: 标注文件夹
+    :param subset: 子集条件, None表示全部转换
+    :param item: (图片相对路径, 标注文件相对路径, 图片尺寸[, 标注文件内容])
+    :return: (图片相对路径, 标注文件相对路径, 图片尺寸, 标注文件内容)
+    """
+    if len(item) >= 4:
+        return item
+    image_path, annotation_path = _inputs(images_dir, annotations_dir, item)
+    try:
+        with open(annotation_path, "r") as f:
+            text = f.read()
+        if subset is not None and subset.drops(int(subset.keep_classes(parse_yolo(text, annotation_path)[:, 0]).sum())):
+            return item[0], item[1], item[2], text
+        shape = image_shape(image_path) if item[2] is None else item[2]
+    except (OSError, BadFileException):
+        return item
+    return item[0], item[1], shape, text
+
+
+def _read_ahead(images_dir: str, annotations_dir: str, io_threads: int, subset: Optional[Subset] = None) -> Optional[Callable[[Iterable], Iterator]]:
+    """
+    预读输入的函数\n
+    :param images_dir: 图像文件夹
+    :param annotations_dir: 标注文件夹
+    :param io_threads: 预读线程数
+    :param subset: 子集条件, None表示全部转换
+    :return: 把输入的迭代器包装为预读后的迭代器的函数, io_threads为0时返回None
+    """
+    if io_threads <= 0:
+        return None
+    return partial(read_ahead, partial(_prefetch, images_dir, annotations_dir, subset), threads=io_threads)
+
+
+def _items(images_dir: str, annotations_dir: str, image_cache: Union[None, bool, str], workers: Optional[int], chunksize: int, stats: Optional[ConversionStats] = None, recursive: bool = False, batch_size: int = 10000, subset: Optional[Subset] = None, on_error: str = "raise") -> Iterator[Tuple[str, str, Optional[Tuple[int, int, int]]]]:
+    """
+    边遍历边配对图片与标注文件, 生成逐图片转换的输入, 启用缓存时按批从缓存中取得图片尺寸, 只有缓存未命中的图片会被读取\n
+    按名称不在子集中的图片在查询缓存或读取归档中的文件头之前跳过, 不会被读取\n
     :param images_dir: 图像文件夹
     :param annotations_dir: 标注文件夹
+    :param image_cache: 图片尺寸缓存, None或False表示不使用, True表示默认路径, 字符串表示缓存文件路径
+    :param workers: 读取图片时并行的进程数
+    :param chunksize: 每次分发给子进程的图片数
+    :param stats: 统计, 遍历结束后记录遍历耗时及没有配对的图片和标注文件数
+    :param recursive: 是否遍历子文件夹
+    :param batch_size: 启用缓存时每批查询的图片数
+    :param subset: 子集条件, None表示全部转换
+    :param on_error: 读取缓存未命中的图片时遇到损坏的图片的处理方式, skip表示该图片的尺寸为None, 由转换时重新读取并记录错误
+    :return: (图片相对路径, 标注文件相对路径, 图片尺寸)的生成器, 尺寸未知时为None; 输入在归档中时追加标注文件内容, 不使用缓存
+    """
+    if is_archive(images_dir) or is_archive(annotations_dir):
+        # 归档中的图片在读取文件头之前按名称过滤
+        keep = None if subset is None or not subset.filters_images else subset.keep_image
+        pairs = ArchivePairing(images_dir, annotations_dir, ".txt", recursive, keep=keep)
+        yield from pairs
+    else:
+        pairs = Pairing(images_dir, annotations_dir, ".txt", recursive)
+        cache = open_cache(image_cache)
+        selected = pairs if subset is None else subset.select(pairs, lambda x: x[0], stats)
+        if cache is None:
+            for image, label in selected:
+                yield image, label, None
+        else:
+            with cache:
+                iterator = iter(selected)
+                for batch in iter(lambda: list(islice(iterator, batch_size)), []):
+                    shapes = cache.shapes([os.path.join(images_dir, x[0]) for x in batch], workers, chunksize, stats, on_error)
+                    for (image, label), shape in zip(batch, shapes):
+                        yield image, label, shape
+    pairs.record(stats)
+    if stats is not None:
+        stats.count("files", pairs.paired)
+
+
+def _check_incremental(images_dir: str, annotations_dir: str):
+    """
+    增量转换依赖输入文件的大小和修改时间, 不支持归档中的输入\n
+    :param images_dir: 图像文件夹
+    :param annotations_dir: 标注文件夹
+    """
+    for path in (images_dir, annotations_dir):
+        if is_archive(path):
+            raise ValueError(f"归档输入不支持增量转换: {path}")
+
+
+def image_folder(images_dir: str, image: str) -> str:
+    """
+    VOC标注中图片所在文件夹的名称\n
+    :param images_dir: 图像文件夹或归档
+    :param image: 图片相对路径
+    :return: 文件夹名称, 归档中的图片为归档的名称
+    """
+    folder = image.rpartition("/")[0]
+    if folder:
+        return os.path.basename(folder)
+    return archive_name(images_dir) if is_archive(images_dir) else os.path.basename(images_dir)
+
+
+def _boxes(images_dir: str, annotations_dir: str, item: tuple, checker: Optional[Validator] = None, subset: Optional[Subset] = None) -> Optional[Tuple[str, Tuple[int, int, int], np.ndarray, np.ndarray]]:
+    """
+    读取一张图片的尺寸及其YOLO标注, 换算成像素坐标系下的角点\n
+    :param images_dir: 图像文件夹或归档
+    :param annotations_dir: 标注文件夹或归档
+    :param item: (图片相对路径, 标注文件相对路径, 图片尺寸[, 标注文件内容]), 尺寸为None时读取图片获得, 为字节时解码
+    :param checker: 检测框校验器, None表示不校验
+    :param subset: 已绑定类别的子集条件, None表示全部转换
+    :return: (图片路径, (高, 宽, 通道数), 类别ID, (N, 4)的角点坐标), 校验或按子集过滤时丢弃了这张图片则返回None
+    """
+    if subset is None:
+        image_path, shape, labels = _read(images_dir, annotations_dir, item)
+    else:
+        image_path, annotation_path = _inputs(images_dir, annotations_dir, item)
+        with stage("parse"):
+            labels = read_yolo(annotation_path) if len(item) < 4 else parse_yolo(item[3], annotation_path)
+        # 在读取图片尺寸之前按类别过滤, 没有需要的检测框的图片不再读取
+        labels = labels[subset.keep_classes(labels[:, 0])]
+        if subset.drops(len(labels)):
+            count("filtered")
+            return None
+        shape = _shape(image_path, item[2])
+    with stage("parse"):
+        class_ids, corners = yolo_corners(labels, shape[1], shape[0])
+    if subset is not None:
+        keep = subset.keep_boxes(class_ids, corners)
+        class_ids, corners = subset.class_ids(class_ids[keep]), corners[keep]
+        if subset.drops(len(class_ids)):
+            count("filtered")
+            return None
+    if checker is not None:
+        with stage("validate"):
+            if not checker.check_size(shape[1], shape[0]):
+                return None
+            keep, corners, _ = checker.check(class_ids, corners, shape[1], shape[0])
+            class_ids, corners = class_ids[keep], corners[keep]
+    count("boxes", len(class_ids))
+    return image_path, shape, class_ids, corners
+
+
+def _write_voc(images_dir: str, classes: List[str], output_dir: Optional[str], image: str, image_path: str, shape: Tuple[int, int, int], class_ids: np.ndarray, corners: np.ndarray) -> Union[int, Tuple[str, str]]:
+    """
+    生成一张图片的VOC标注并写入输出文件夹\n
+    :param images_dir: 图像文件夹或归档
     :param classes: 类的列表
-    :param output_dir: 输出文件夹
+    :param output_dir: 输出文件夹, 为None时不写文件, 返回输出内容
+    :param image: 图片相对路径
+    :param image_path: 图片路径
+    :param shape: (高, 宽, 通道数)
+    :param class_ids: 类别ID
+    :param corners: (N, 4)的角点坐标
+    :return: 转换了几个文件, output_dir为None时返回(输出文件相对路径, xml字符串)
+    """
+    height, width, depth = shape
+    with stage("serialize"):
+        objects = ((classes[class_id], *corner) for class_id, corner in zip(class_ids.tolist(), corners.tolist()))
+        xml = voc_xml(image_folder(images_dir, image), os.path.basename(image), image_path, width, height, depth, objects)
+    if output_dir is None:
+        return stem(image) + ".xml", xml
+    with stage("write"):
+        with open(output_path(output_dir, image, ".xml"), "w") as f:
+            f.write(xml)
+    return 1
+
+
+def _to_voc(images_dir: str, annotations_dir: str, classes: List[str], output_dir: Optional[str], checker: Optional[Validator], subset: Optional[Subset], item: tuple) -> Union[None, int, Tuple[str, str]]:
+    """
+    把一张图片的YOLO标注转换成voc格式\n
+    :param images_dir: 图像文件夹或归档
+    :param annotations_dir: 标注文件夹或归档
+    :param classes: 输出的类的列表
+    :param output_dir: 输出文件夹, 为None时不写文件, 返回输出内容
+    :param checker: 检测框校验器, None表示不校验
+    :param subset: 已绑定类别的子集条件, None表示全部转换
+    :param item: (图片相对路径, 标注文件相对路径, 图片尺寸[, 标注文件内容]), 尺寸为None时读取图片获得
+    :return: 转换了几个文件, output_dir为None时返回(输出文件相对路径, xml字符串), 校验或按子集过滤时丢弃了这张图片则返回None
+    """
+    boxes = _boxes(images_dir, annotations_dir, item, checker, subset)
+    if boxes is None:
+        return None
+    return _write_voc(images_dir, classes, output_dir, item[0], *boxes)
+
+
+def to_voc(images_dir: str, annotations_dir: str, classes: List[str], output_dir: str, *, workers: Optional[int] = 1, chunksize: int = 64, incremental: bool = False, checksum: bool = False, image_cache: Union[None, bool, str] = None, progress: Progress = True, stats: Optional[ConversionStats] = None, recursive: bool = False, on_error: str = "raise", validate: Union[Policy, Validator] = None, io_threads: int = 0, subset: Optional[Subset] = None) -> int:
+    """
+    转换成voc格式\n
+    :param images_dir: 图像文件夹, 也可以是tar或zip归档
+    :param annotations_dir: 标注文件夹, 也可以是tar或zip归档, 与images_dir相同时表示图片和标注在同一个归档中
+    :param classes: 类的列表
+    :param output_dir: 输出文件夹, 以归档后缀结尾时写入tar或zip归档
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param incremental: 是否增量转换, 只重新转换有变化的文件, 并删除输入已不存在的输出
+    :param checksum: 增量转换时, 文件大小或修改时间变化后是否再比较文件内容
+    :param image_cache: 图片尺寸缓存, None或False表示不使用, True表示使用默认路径, 字符串表示缓存文件路径, 输入为归档时不使用
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一张图片调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹, 输出保持与输入相同的子文件夹结构
+    :param on_error: 遇到损坏的文件时的处理方式, raise表示抛出BadFileException, skip表示跳过该文件并记录到stats的errors中
+    :param validate: 转换时在同一次遍历中校验检测框, None或False表示不校验, True表示默认策略, 也可以是report、drop、{问题: 处理方式}或Validator, 各类问题的个数记为stats中的invalid_<问题>
+    :param io_threads: 大于0时用这么多个线程预读后续的图片尺寸及标注文件, 并在后台写出结果, 适合NFS、对象存储等每次读写都要等待往返延迟的文件系统, 0表示不启用; 增量转换时只预读
+    :param subset: 只转换数据集的一个子集, 按名称或抽样比例不保留的图片不会被读取, 按类别过滤后会被丢弃的图片不读取尺寸, 保留的类别默认重新编号, None表示全部转换
     :return: 转换多少个文件
     """
-    count = 0
-    os.makedirs(output_dir, exist_ok=True)
-    for image in tqdm(os.listdir(images_dir)):
-        if is_image(image):
-            image_path = os.path.join(images_dir, image)
-            annotation_path = os.path.join(annotations_dir, prefix_name(image) + ".txt")
-            if os.path.exists(annotation_path):
-                annotation = dict()
-                annotation["folder"] = os.path.basename(images_dir)
-                annotation["filename"] = image
-                annotation["path"] = image_path
-                annotation["source"] = {"database": "Unknown"}
-                height, width, depth = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), -1).shape
-                annotation["size"] = {"width": str(width), "height": str(height), "depth": str(depth)}
-                annotation["segmented"] = "0"
-                annotation["object"] = list()
-                with open(annotation_path, "r") as f:
-                    for i, line in enumerate(f.readlines()):
-                        search_result = re.search(r"^(\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)$", line.strip())
-                        if search_result:
-                            try:
-                                class_id = int(search_result[1])
-                                x_center = float(search_result[2]) * width
-                                y_center = float(search_result[3]) * height
-                                w_bbox = float(search_result[4]) * width
-                                h_bbox = float(search_result[5]) * height
-                            except IndexError as e:
-                                raise BadFileException(annotation_path, f"文件第{i+1}行格式有误: {line.strip()}")
-                            name = classes[class_id]
-                            xmin = int(x_center - 0.5 * w_bbox)
-                            xmax = int(x_center + 0.5 * w_bbox)
-                            ymin = int(y_center - 0.5 * h_bbox)
-                            ymax = int(y_center + 0.5 * h_bbox)
-                            annotation["object"].append({
-                                "name": name,
-                                "pose": "Unspecified",
-                                "truncated": "0",
-                                "difficult": "0",
-                                "bndbox": {"xmin": str(xmin), "ymin": str(ymin), "xmax": str(xmax), "ymax": str(ymax)}
-                            })
-                xml = parseString(tostring(dict2element("annotation", annotation))).toprettyxml(indent="\t")
-                with open(os.path.join(output_dir, f"{prefix_name(image)}.xml"), "w") as f:
-                    f.write(xml)
-                count = count + 1
-    return count
-
-
-def to_coco(images_dir: str, annotations_dir: str, classes: List[str], output_path: str) -> int:
+    with timed(stats, "yolo.to_voc"), ExitStack() as stack:
+        sink = open_output(stack, output_dir, incremental, io_threads)
+        subset = selection(subset, classes)
+        names = classes if subset is None else subset.names
+        items = _items(images_dir, annotations_dir, image_cache, workers, chunksize, stats, recursive, subset=subset, on_error=on_error)
+        prefetch = _read_ahead(images_dir, annotations_dir, io_threads, subset)
+        checker = validator(validate, len(names))
+        func = partial(_to_voc, images_dir, annotations_dir, names, None if sink is not None else output_dir, checker, subset)
+        if not incremental:
+            items = items if prefetch is None else prefetch(items)
+            converted = write_results(track(parallel_map(func, items, workers, chunksize, stats, on_error), None, progress), sink, stats)
+        else:
+            _check_incremental(images_dir, annotations_dir)
+            options = {"converter": "yolo.to_voc", "images_dir": os.path.abspath(images_dir), "classes": classes}
+            if checker is not None:
+                options["validate"] = checker.options()
+            if subset is not None:
+                options["subset"] = subset.options()
+            inputs = partial(_inputs, images_dir, annotations_dir)
+            with Manifest(os.path.join(output_dir, MANIFEST_NAME), options, checksum) as manifest:
+                results = manifest.map(
+                    func, items,
+                    key=lambda x: x[0],
+                    signature=lambda x: file_signature(inputs(x)),
+                    output=lambda x: os.path.join(output_dir, stem(x[0]) + ".xml"),
+                    digest=lambda x: file_digest(inputs(x)),
+                    workers=workers, chunksize=chunksize, stats=stats, on_error=on_error, prefetch=prefetch
+                )
+                converted = write_results(track(results, None, progress), None)
+                manifest.prune()
+        if stats is not None:
+            stats.count("images", converted)
+    return converted
+
+
+def _load_labels(images_dir: str, annotations_dir: str, num_classes: Optional[int], item: tuple) -> Tuple[str, Tuple[int, int, int], np.ndarray]:
+    """
+    读取一张图片的尺寸及其YOLO标注的原始数组\n
+    :param images_dir: 图片文件夹或归档
+    :param annotations_dir: 标注文件夹或归档
+    :param num_classes: 类别数, 类别ID不小于它时抛出BadFileException, None表示不检查
+    :param item: (图片相对路径, 标注文件相对路径, 图片尺寸[, 标注文件内容]), 尺寸为None时读取图片获得
+    :return: (图片相对路径, (高, 宽, 通道数), (N, 5)的标注数组)
+    """
+    _, shape, labels = _read(images_dir, annotations_dir, item)
+    if num_classes is not None and len(labels) and labels[:, 0].max() >= num_classes:
+        unknown = sorted(set(int(x) for x in labels[labels[:, 0] >= num_classes, 0]))
+        raise BadFileException(_inputs(images_dir, annotations_dir, item)[1], f"类别ID超出类别列表的范围[0, {num_classes}): {unknown}")
+    return item[0], shape, labels
+
+
+def read_labels(images_dir: str, annotations_dir: str, workers: Optional[int] = 1, chunksize: int = 64, image_cache: Union[None, bool, str] = None, recursive: bool = False, num_classes: Optional[int] = None) -> Iterator[Tuple[str, Tuple[int, int, int], np.ndarray]]:
+    """
+    逐图片读取YOLO数据集的图片尺寸及原始标注数组, 用于把整个数据集读入内存\n
+    :param images_dir: 图片文件夹或归档
+    :param annotations_dir: 标注文件夹或归档
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param image_cache: 图片尺寸缓存, None或False表示不使用, True表示使用默认路径, 字符串表示缓存文件路径
+    :param recursive: 是否遍历子文件夹
+    :param num_classes: 类别数, 类别ID不小于它时抛出BadFileException, None表示不检查
+    :return: (图片相对路径, (高, 宽, 通道数), (N, 5)的标注数组)的生成器
+    """
+    func = partial(_load_labels, images_dir, annotations_dir, num_classes)
+    yield from parallel_map(func, _items(images_dir, annotations_dir, image_cache, workers, chunksize, recursive=recursive), workers, chunksize)
+
+
+def _coco_entry(imagename: str, shape: Tuple[int, int, int], class_ids: np.ndarray, corners: np.ndarray) -> Tuple[dict, List[dict]]:
+    """
+    生成一张图片不含ID的COCO图片及标注\n
+    :param imagename: 图片相对路径
+    :param shape: (高, 宽, 通道数)
+    :param class_ids: 类别ID
+    :param corners: (N, 4)的角点坐标
+    :return: (图片, 标注列表)
+    """
+    height, width, _ = shape
+    image = {
+        "width": width,
+        "height": height,
+        "file_name": imagename,
+        "license": 0,
+        "flickr_url": "https://github.com/ZongXR/image-annotations",
+        "coco_url": "https://github.com/ZongXR/image-annotations",
+        "date_captured": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+    }
+    annotations = []
+    for class_id, (xmin, ymin, xmax, ymax) in zip(class_ids.tolist(), corners.tolist()):
+        annotations.append({
+            "category_id": class_id,  # 对应类别ID，与categories中的ID对应
+            "segmentation": [],  # 实例分割，对象的边界点坐标[x1,y1,x2,y2,....,xn,yn]
+            "area": (xmax - xmin) * (ymax - ymin),  # 对象区域面积
+            "bbox": [xmin, ymin, xmax - xmin, ymax - ymin],  # 目标检测，对象定位边框[x,y,w,h]
+            "iscrowd": 0,  # 表示是否是人群
+        })
+    return image, annotations
+
+
+def _load_coco(images_dir: str, annotations_dir: str, checker: Optional[Validator], subset: Optional[Subset], item: tuple) -> Optional[Tuple[dict, List[dict]]]:
+    """
+    读取一张图片及其YOLO标注, 生成不含ID的COCO图片及标注\n
+    :param images_dir: 图片文件夹或归档
+    :param annotations_dir: 标注文件夹或归档
+    :param checker: 检测框校验器, None表示不校验
+    :param subset: 已绑定类别的子集条件, None表示全部转换
+    :param item: (图片相对路径, 标注文件相对路径, 图片尺寸[, 标注文件内容]), 尺寸为None时读取图片获得
+    :return: (图片, 标注列表), 校验或按子集过滤时丢弃了这张图片则返回None
+    """
+    boxes = _boxes(images_dir, annotations_dir, item, checker, subset)
+    if boxes is None:
+        return None
+    _, shape, class_ids, corners = boxes
+    return _coco_entry(item[0], shape, class_ids, corners)
+
+
+def to_coco(images_dir: str, annotations_dir: str, classes: List[str], output_path: str, *, workers: Optional[int] = 1, chunksize: int = 64, indent: Optional[int] = 4, incremental: bool = False, checksum: bool = False, image_cache: Union[None, bool, str] = None, progress: Progress = True, stats: Optional[ConversionStats] = None, recursive: bool = False, on_error: str = "raise", validate: Union[Policy, Validator] = None, io_threads: int = 0, subset: Optional[Subset] = None) -> int:
     """
     转成COCO格式\n
-    :param images_dir: 图片文件夹
-    :param annotations_dir: 标注文件夹
+    :param images_dir: 图片文件夹, 也可以是tar或zip归档
+    :param annotations_dir: 标注文件夹, 也可以是tar或zip归档, 与images_dir相同时表示图片和标注在同一个归档中
     :param classes: 类的列表
     :param output_path: 输出的路径
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param indent: 输出json的缩进空格数, None表示不带空白的紧凑格式
+    :param incremental: 是否增量转换, 只重新解析有变化的文件, 其余文件复用上次的解析结果
+    :param checksum: 增量转换时, 文件大小或修改时间变化后是否再比较文件内容
+    :param image_cache: 图片尺寸缓存, None或False表示不使用, True表示使用默认路径, 字符串表示缓存文件路径, 输入为归档时不使用
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一张图片调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹, 输出保持与输入相同的子文件夹结构
+    :param on_error: 遇到损坏的文件时的处理方式, raise表示抛出BadFileException, skip表示跳过该文件并记录到stats的errors中
+    :param validate: 转换时在同一次遍历中校验检测框, None或False表示不校验, True表示默认策略, 也可以是report、drop、{问题: 处理方式}或Validator, 各类问题的个数记为stats中的invalid_<问题>
+    :param io_threads: 大于0时用这么多个线程预读后续的图片尺寸及标注文件, 适合NFS、对象存储等每次读取都要等待往返延迟的文件系统, 0表示不启用
+    :param subset: 只转换数据集的一个子集, 按名称或抽样比例不保留的图片不会被读取, 按类别过滤后会被丢弃的图片不读取尺寸, 保留的类别默认重新编号, None表示全部转换
     :return: 转换多少个文件
     """
-    info = {
-        "year": datetime.now().year,
-        "version": image_annotations.__version__,
-        "description": "converted by image-annotations",
-        "contributor": getpass.getuser(),
-        "url": "https://github.com/ZongXR/image-annotations",
-        "date_created": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-    }
-    licenses = [{
-        "id": 0,
-        "name": "GNU General Public License v3 (GPLv3)",
-        "url": "https://github.com/ZongXR/image-annotations/blob/main/LICENSE"
-    }]
-    categories = list(map(lambda x: {"id": x[0], "name": x[1], "supercategory": ""}, enumerate(classes)))
-    images = []
-    annotations = []
-    i = 0
-    j = 0
-    for imagename in tqdm(os.listdir(images_dir)):
-        if is_image(imagename):
-            image_path = os.path.join(images_dir, imagename)
-            annotation_path = os.path.join(annotations_dir, prefix_name(imagename) + ".txt")
-            if os.path.exists(annotation_path):
-                height, width, _ = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), -1).shape
-                image = {
-                    "id": i,
-                    "width": width,
-                    "height": height,
-                    "file_name": imagename,
-                    "license": 0,
-                    "flickr_url": "https://github.com/ZongXR/image-annotations",
-                    "coco_url": "https://github.com/ZongXR/image-annotations",
-                    "date_captured": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-                }
-                images.append(image)
-                with open(annotation_path, "r") as f:
-                    for line in f.readlines():
-                        search_result = re.search(r"^(\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)$", line.strip())
-                        if search_result:
-                            try:
-                                class_id = int(search_result[1])
-                                x_center = float(search_result[2]) * width
-                                y_center = float(search_result[3]) * height
-                                w_bbox = float(search_result[4]) * width
-                                h_bbox = float(search_result[5]) * height
-                            except IndexError as e:
-                                raise BadFileException(annotation_path, f"文件第{i}行格式有误: {line.strip()}")
-                            xmin = int(x_center - 0.5 * w_bbox)
-                            xmax = int(x_center + 0.5 * w_bbox)
-                            ymin = int(y_center - 0.5 * h_bbox)
-                            ymax = int(y_center + 0.5 * h_bbox)
-                            annotation = {
-                                "id": j,  # 目标对象ID（每个对象ID唯一），每张图片可能有多个目标
-                                "image_id": i,  # 对应图片ID
-                                "category_id": class_id,  # 对应类别ID，与categories中的ID对应
-                                "segmentation": [],  # 实例分割，对象的边界点坐标[x1,y1,x2,y2,....,xn,yn]
-                                "area": (xmax - xmin) * (ymax - ymin),  # 对象区域面积
-                                "bbox": [xmin, ymin, xmax - xmin, ymax - ymin],  # 目标检测，对象定位边框[x,y,w,h]
-                                "iscrowd": 0,  # 表示是否是人群
-                            }
-                            annotations.append(annotation)
-                            j = j + 1
-                i = i + 1
-    with open(output_path, "w") as f:
-        json.dump({
-            "info": info,
-            "licenses": licenses,
-            "categories": categories,
-            "images": images,
-            "annotations": annotations
-        }, f, indent=4, ensure_ascii=False)
-    return i
-
-
-def get_all_classes_ids(annotations_dir: str) -> List[int]:
+    with timed(stats, "yolo.to_coco"), ExitStack() as stack:
+        subset = selection(subset, classes)
+        names = classes if subset is None else subset.names
+        items = _items(images_dir, annotations_dir, image_cache, workers, chunksize, stats, recursive, subset=subset, on_error=on_error)
+        prefetch = _read_ahead(images_dir, annotations_dir, io_threads, subset)
+        checker = validator(validate, len(names))
+        func = partial(_load_coco, images_dir, annotations_dir, checker, subset)
+        writer = stack.enter_context(CocoWriter(output_path, coco_categories(names), indent))
+        if incremental:
+            _check_incremental(images_dir, annotations_dir)
+            inputs = partial(_inputs, images_dir, annotations_dir)
+            options = {"converter": "yolo.to_coco", "images_dir": os.path.abspath(images_dir), "classes": classes}
+            if checker is not None:
+                options["validate"] = checker.options()
+            if subset is not None:
+                options["subset"] = subset.options()
+            manifest = stack.enter_context(Manifest(output_path + ".manifest", options, checksum))
+            results = manifest.map(
+                func, items,
+                key=lambda x: x[0],
+                signature=lambda x: file_signature(inputs(x)),
+                digest=lambda x: file_digest(inputs(x)),
+                workers=workers, chunksize=chunksize, stats=stats, on_error=on_error, prefetch=prefetch
+            )
+        else:
+            manifest = None
+            results = parallel_map(func, items if prefetch is None else prefetch(items), workers, chunksize, stats, on_error)
+        # ID在主进程中按文件顺序分配, 保证结果与进程数无关
+        for result in track(results, None, progress):
+            if result is not None:
+                with stage("write", stats):
+                    writer.write(*result)
+        with stage("write", stats):
+            writer.close()
+        if manifest is not None:
+            manifest.prune()
+        if stats is not None:
+            stats.count("images", writer.images)
+    return writer.images
+
+
+def to_binary(images_dir: str, annotations_dir: str, classes: List[str], output_path: str, workers: Optional[int] = 1, chunksize: int = 64, image_cache: Union[None, bool, str] = None, stats: Optional[ConversionStats] = None, recursive: bool = False) -> int:
+    """
+    转换成二进制格式, 之后可以用Dataset.load以内存映射的方式读取, 或用binary模块转换成其他格式而不再解析标注文件\n
+    :param images_dir: 图片文件夹, 也可以是tar或zip归档
+    :param annotations_dir: 标注文件夹, 也可以是tar或zip归档
+    :param classes: 类的列表
+    :param output_path: 输出路径, 通常以.iads结尾
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param image_cache: 图片尺寸缓存, None或False表示不使用, True表示使用默认路径, 字符串表示缓存文件路径
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹
+    :return: 转换多少张图片
+    """
+    from image_annotations.dataset import Dataset
+    with timed(stats, "yolo.to_binary"):
+        with stage("parse", stats):
+            dataset = Dataset.from_yolo(images_dir, annotations_dir, classes, workers, chunksize, image_cache, recursive)
+        with stage("write", stats):
+            dataset.save(output_path)
+        if stats is not None:
+            stats.count("images", len(dataset))
+            stats.count("boxes", dataset.num_boxes)
+    return len(dataset)
+
+
+def _to_targets(images_dir: str, annotations_dir: str, classes: List[str], voc: bool, voc_dir: Optional[str], coco: bool, checker: Optional[Validator], subset: Optional[Subset], item: tuple) -> Optional[Tuple[Union[None, int, Tuple[str, str]], Optional[Tuple[dict, List[dict]]]]]:
+    """
+    只读取一次图片和标注, 同时生成VOC及COCO格式的结果\n
+    :param images_dir: 图像文件夹或归档
+    :param annotations_dir: 标注文件夹或归档
+    :param classes: 输出的类的列表
+    :param voc: 是否生成VOC格式
+    :param voc_dir: VOC输出文件夹, 为None时返回输出内容
+    :param coco: 是否生成COCO格式
+    :param checker: 检测框校验器, None表示不校验
+    :param subset: 已绑定类别的子集条件, None表示全部转换
+    :param item: (图片相对路径, 标注文件相对路径, 图片尺寸[, 标注文件内容]), 尺寸为None时读取图片获得
+    :return: (VOC结果, COCO的图片及标注), 不需要的格式为None, 校验或按子集过滤时丢弃了这张图片则返回None
+    """
+    boxes = _boxes(images_dir, annotations_dir, item, checker, subset)
+    if boxes is None:
+        return None
+    image_path, shape, class_ids, corners = boxes
+    voc_result = _write_voc(images_dir, classes, voc_dir, item[0], image_path, shape, class_ids, corners) if voc else None
+    coco_result = _coco_entry(item[0], shape, class_ids, corners) if coco else None
+    return voc_result, coco_result
+
+
+def convert(images_dir: str, annotations_dir: str, classes: List[str], targets: Dict[str, str], workers: Optional[int] = 1, chunksize: int = 64, indent: Optional[int] = 4, image_cache: Union[None, bool, str] = None, progress: Progress = True, stats: Optional[ConversionStats] = None, recursive: bool = False, on_error: str = "raise", validate: Union[Policy, Validator] = None, io_threads: int = 0, subset: Optional[Subset] = None) -> int:
+    """
+    一次遍历同时转换成多种格式, 每张图片的尺寸和标注只读取、解析一次\n
+    :param images_dir: 图片文件夹, 也可以是tar或zip归档
+    :param annotations_dir: 标注文件夹, 也可以是tar或zip归档
+    :param classes: 类的列表
+    :param targets: 目标格式到输出路径的映射, 支持voc(输出文件夹, 以归档后缀结尾时写入归档)和coco(json文件路径)
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param indent: 输出json的缩进空格数, None表示不带空白的紧凑格式
+    :param image_cache: 图片尺寸缓存, None或False表示不使用, True表示使用默认路径, 字符串表示缓存文件路径
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一张图片调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹, 输出保持与输入相同的子文件夹结构
+    :param on_error: 遇到损坏的文件时的处理方式, raise表示抛出BadFileException, skip表示跳过该文件并记录到stats的errors中
+    :param validate: 转换时在同一次遍历中校验检测框, None或False表示不校验, True表示默认策略, 也可以是report、drop、{问题: 处理方式}或Validator, 各类问题的个数记为stats中的invalid_<问题>
+    :param io_threads: 大于0时用这么多个线程预读后续的图片尺寸及标注文件, 并在后台写出VOC结果, 适合NFS、对象存储等每次读写都要等待往返延迟的文件系统, 0表示不启用
+    :param subset: 只转换数据集的一个子集, 按名称或抽样比例不保留的图片不会被读取, 按类别过滤后会被丢弃的图片不读取尺寸, 保留的类别默认重新编号, None表示全部转换
+    :return: 转换多少张图片
+    """
+    unknown = set(targets) - {"voc", "coco"}
+    if unknown or not targets:
+        raise ValueError(f"不支持的目标格式: {sorted(unknown)}, YOLO格式可以转换成voc、coco")
+    with timed(stats, "yolo.convert"), ExitStack() as stack:
+        subset = selection(subset, classes)
+        names = classes if subset is None else subset.names
+        sink = None if "voc" not in targets else open_output(stack, targets["voc"], io_threads=io_threads)
+        writer = None if "coco" not in targets else stack.enter_context(CocoWriter(targets["coco"], coco_categories(names), indent))
+        items = _items(images_dir, annotations_dir, image_cache, workers, chunksize, stats, recursive, subset=subset, on_error=on_error)
+        prefetch = _read_ahead(images_dir, annotations_dir, io_threads, subset)
+        items = items if prefetch is None else prefetch(items)
+        func = partial(_to_targets, images_dir, annotations_dir, names, "voc" in targets, None if sink is not None else targets.get("voc"), writer is not None, validator(validate, len(names)), subset)
+        converted = 0
+        # COCO的ID在主进程中按文件顺序分配, 保证结果与进程数无关
+        for result in track(parallel_map(func, items, workers, chunksize, stats, on_error), None, progress):
+            if result is None:
+                continue
+            voc_result, coco_result = result
+            converted = converted + 1
+            if voc_result is not None:
+                write_result(voc_result, sink, stats)
+            if coco_result is not None:
+                with stage("write", stats):
+                    writer.write(*coco_result)
+        if writer is not None:
+            with stage("write", stats):
+                writer.close()
+        if stats is not None:
+            stats.count("images", converted)
+    return converted
+
+
+def _class_sizes(annotations_dir: str, item: Union[str, Tuple[str, str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    读取一个YOLO标注文件中每个检测框的类别ID及尺寸\n
+    :param annotations_dir: 标注文件夹
+    :param item: 标注文件相对路径, 或归档中的(成员名, 文件内容)
+    :return: (类别ID, 归一化后面积的平方根)
+    """
+    with stage("parse"):
+        labels = read_yolo(os.path.join(annotations_dir, item)) if isinstance(item, str) else parse_yolo(item[1], item[0])
+    return labels[:, 0].astype(np.int64), np.sqrt(labels[:, 3] * labels[:, 4])
+
+
+def class_stats(annotations_dir: str, bins: Sequence[float] = RELATIVE_BINS, workers: Optional[int] = 1, chunksize: int = 64, sample: Optional[int] = None, stable_after: Optional[int] = None, progress: Progress = True, stats: Optional[ConversionStats] = None, recursive: bool = False) -> ClassStats:
+    """
+    一次遍历统计各类别ID的检测框数、图片数及检测框尺寸的直方图\n
+    :param annotations_dir: 标注文件所在文件夹, 也可以是tar或zip归档
+    :param bins: 尺寸(归一化后面积的平方根)直方图的分箱边界
+    :param workers: 并行的进程数, 1表示串行, None或0表示使用全部CPU
+    :param chunksize: 每次分发给子进程的文件数
+    :param sample: 最多统计多少个标注文件, None表示全部
+    :param stable_after: 连续这么多个文件没有出现新类别时提前结束, None表示不提前结束
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一个文件调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹
+    :return: 类别统计, 提前结束时complete为False
+    """
+    is_label = lambda x: x.lower().endswith(".txt")
+    if is_archive(annotations_dir):
+        items = iter_texts(annotations_dir, is_label, recursive, stats)
+    else:
+        items = filter(is_label, scan_dir(annotations_dir, recursive, stats))
+    with timed(stats, "yolo.class_stats"):
+        return scan(partial(_class_sizes, annotations_dir), items, bins, workers, chunksize, sample, stable_after, progress, stats)
+
+
+def get_all_classes_ids(annotations_dir: str, *, progress: Progress = True, stats: Optional[ConversionStats] = None, recursive: bool = False) -> List[int]:
     """
     获取全部类ID\n
-    :param annotations_dir: 标注文件所在文件夹
+    :param annotations_dir: 标注文件所在文件夹, 也可以是tar或zip归档
+    :param progress: True表示显示tqdm进度条, None或False表示不显示, 函数表示每处理完一个文件调用一次progress(已完成数, 总数)
+    :param stats: 记录各阶段耗时及计数的统计
+    :param recursive: 是否遍历子文件夹
     :return: 类ID组成的列表
     """
     results = set()
-    for file in tqdm(os.listdir(annotations_dir)):
-        if file.lower().endswith(".txt"):
-            fullpath = os.path.join(annotations_dir, file)
-            with open(fullpath, "r") as f:
-                for line in f.readlines():
-                    search_result = re.search(r"^(\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\d+\.\d+)$", line.strip())
-                    if search_result:
-                        class_id = int(search_result[1])
-                        results.add(class_id)
+    with timed(stats, "yolo.get_all_classes_ids"):
+        for file, text in track(iter_texts(annotations_dir, lambda x: x.lower().endswith(".txt"), recursive, stats), None, progress):
+            with stage("parse", stats):
+                results.update(np.unique(parse_yolo(text, file)[:, 0]).astype(int).tolist())
     return sorted(list(results))
 
 
 if __name__ == '__main__':
     # to_voc(r"C:\Users\DrZon\Downloads\images", r"C:\Users\DrZon\Downloads\labels", ["Pedestrian", "Cyclist", "Car", "Truck", "Tram", "Tricycle"], r"C:\Users\DrZon\Downloads\output")
     to_coco(r"C:\Users\DrZon\Downloads\images", r"C:\Users\DrZon\Downloads\labels", ["Pedestrian", "Cyclist", "Car", "Truck", "Tram", "Tricycle"], r"C:\Users\DrZon\Downloads\result.json")
-
-
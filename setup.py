@@ -31,5 +31,8 @@ setuptools.setup(
         "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
     ],
     python_requires='>=3.7,<3.11',
-    install_requires=requires_list
+    install_requires=requires_list,
+    entry_points={
+        "console_scripts": ["image-annotations=image_annotations.cli:main"]
+    }
 )
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 测试数据集的类别
+CLASSES = ["cat", "dog", "bird"]
+# 测试数据集中每张图片的(宽, 高)
+SIZES = [(64, 48), (80, 60), (32, 32), (50, 70)]
+
+
+def write_image(path: str, width: int, height: int, channels: int = 3):
+    """
+    写出一张纯色图片, 格式由后缀决定\n
+    :param path: 图片路径
+    :param width: 宽度
+    :param height: 高度
+    :param channels: 通道数
+    """
+    import cv2
+    import numpy as np
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    assert cv2.imwrite(path, np.full(shape, 127, dtype=np.uint8))
+
+
+@pytest.fixture
+def yolo_dataset(tmp_path):
+    """
+    生成一个小的YOLO数据集\n
+    :return: (图片文件夹, 标注文件夹)
+    """
+    images, labels = tmp_path / "images", tmp_path / "labels"
+    images.mkdir()
+    labels.mkdir()
+    for i, (width, height) in enumerate(SIZES):
+        write_image(str(images / f"{i}.jpg"), width, height)
+        (labels / f"{i}.txt").write_text(f"{i % len(CLASSES)} 0.5 0.5 0.25 0.5\n1 0.25 0.25 0.1 0.1\n")
+    return str(images), str(labels)
+
+
+def read_coco(path: str) -> dict:
+    """
+    读取COCO文件, 去掉与运行时间有关的字段, 便于比较\n
+    :param path: json文件路径
+    :return: COCO字典
+    """
+    import json
+    with open(path, "r") as f:
+        data = json.load(f)
+    data["info"].pop("date_created", None)
+    data["info"].pop("contributor", None)
+    for image in data["images"]:
+        image.pop("date_captured", None)
+    return data
+
+
+def read_dir(path: str) -> dict:
+    """
+    读取文件夹中全部文件的内容\n
+    :param path: 文件夹
+    :return: 相对路径到内容的字典
+    """
+    results = {}
+    for root, _, files in os.walk(path):
+        for name in files:
+            full = os.path.join(root, name)
+            with open(full, "rb") as f:
+                results[os.path.relpath(full, path).replace(os.sep, "/")] = f.read()
+    return results
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import tarfile
+import zipfile
+import pytest
+from image_annotations import yolo, voc, coco
+from image_annotations.archives import iter_members, is_archive, archive_name
+from image_annotations.exceptions import BadFileException
+from conftest import CLASSES, read_dir, write_image
+
+
+def _pack(archive_path: str, *dirs: str):
+    """
+    把若干文件夹中的文件按文件名顺序打包到同一层\n
+    :param archive_path: 归档文件路径
+    :param dirs: 文件夹
+    """
+    files = [(os.path.join(d, x), x) for d in dirs for x in sorted(os.listdir(d))]
+    if archive_path.endswith(".zip"):
+        with zipfile.ZipFile(archive_path, "w") as z:
+            for path, name in files:
+                z.write(path, name)
+    else:
+        with tarfile.open(archive_path, "w:" + archive_path.rpartition(".")[2].replace("tar", "")) as t:
+            for path, name in files:
+                t.add(path, name)
+
+
+def _members(archive_path: str) -> dict:
+    return {name: f.read() for name, f in iter_members(archive_path)}
+
+
+def _without_path(files: dict) -> dict:
+    """
+    去掉VOC标注中依赖图片所在位置的folder和path
+    """
+    return {k: re.sub(rb"<(folder|path)>.*?</\1>", b"", v) for k, v in files.items()}
+
+
+def test_names(tmp_path):
+    assert is_archive("a.tar.gz") and is_archive("a.ZIP") and not is_archive("a.json")
+    assert archive_name("/x/images.tar.gz") == "images"
+    os.makedirs(str(tmp_path / "out.tar"))
+    assert not is_archive(str(tmp_path / "out.tar"))
+
+
+@pytest.mark.parametrize("layout", ["shard", "separate", "labels_only"])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_yolo_inputs(yolo_dataset, tmp_path, layout, workers):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "expected"), progress=False)
+    if layout == "shard":
+        _pack(str(tmp_path / "shard.tar"), images, labels)
+        images = labels = str(tmp_path / "shard.tar")
+    elif layout == "separate":
+        _pack(str(tmp_path / "images.tar.gz"), images)
+        _pack(str(tmp_path / "labels.zip"), labels)
+        images, labels = str(tmp_path / "images.tar.gz"), str(tmp_path / "labels.zip")
+    else:
+        _pack(str(tmp_path / "labels.zip"), labels)
+        labels = str(tmp_path / "labels.zip")
+    assert yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), workers=workers, progress=False) == 4
+    assert _without_path(read_dir(str(tmp_path / "voc"))) == _without_path(read_dir(str(tmp_path / "expected")))
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "coco.json"), progress=False)
+    assert yolo.get_all_classes_ids(labels, progress=False) == [0, 1, 2]
+
+
+def test_archive_outputs(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    assert yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc.zip"), progress=False) == 4
+    assert _members(str(tmp_path / "voc.zip")) == read_dir(str(tmp_path / "voc"))
+    voc.to_yolo(str(tmp_path / "voc"), CLASSES, str(tmp_path / "yolo"), progress=False)
+    _pack(str(tmp_path / "voc.tar.xz"), str(tmp_path / "voc"))
+    assert voc.to_yolo(str(tmp_path / "voc.tar.xz"), CLASSES, str(tmp_path / "yolo.tar"), progress=False) == 4
+    assert _members(str(tmp_path / "yolo.tar")) == read_dir(str(tmp_path / "yolo"))
+    assert sorted(voc.get_all_classes(str(tmp_path / "voc.tar.xz"), progress=False)) == sorted(CLASSES)
+    voc.to_coco(str(tmp_path / "voc"), CLASSES, str(tmp_path / "coco.json"), progress=False)
+    coco.to_yolo(str(tmp_path / "coco.json"), str(tmp_path / "coco_yolo"))
+    assert coco.to_yolo(str(tmp_path / "coco.json"), str(tmp_path / "coco_yolo.tgz"), workers=2) == 4
+    assert _members(str(tmp_path / "coco_yolo.tgz")) == read_dir(str(tmp_path / "coco_yolo"))
+
+
+def test_incremental_archive_output_is_rejected(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    with pytest.raises(ValueError):
+        yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc.zip"), incremental=True, progress=False)
+
+
+@pytest.mark.parametrize("io_threads", [0, 1])
+@pytest.mark.parametrize("output", ["voc.zip", "voc.tar.gz"])
+def test_failed_conversion_keeps_archive(yolo_dataset, tmp_path, output, io_threads):
+    images, labels = yolo_dataset
+    path = str(tmp_path / output)
+    yolo.to_voc(images, labels, CLASSES, path, progress=False)
+    with open(path, "rb") as f:
+        before = f.read()
+    with open(os.path.join(labels, "2.txt"), "w") as f:
+        f.write("0 0.5 0.5 0.2\n")
+    with pytest.raises(BadFileException):
+        yolo.to_voc(images, labels, CLASSES, path, io_threads=io_threads, progress=False)
+    with open(path, "rb") as f:
+        assert f.read() == before
+    assert sorted(os.listdir(str(tmp_path))) == sorted(["images", "labels", output])
+
+
+def test_recursive_archive_inputs(tmp_path):
+    os.makedirs(str(tmp_path / "images" / "sub"))
+    os.makedirs(str(tmp_path / "labels" / "sub"))
+    write_image(str(tmp_path / "images" / "sub" / "0.jpg"), 40, 30)
+    (tmp_path / "labels" / "sub" / "0.txt").write_text("1 0.5 0.5 0.5 0.5")
+    with tarfile.open(str(tmp_path / "shard.tar"), "w") as t:
+        t.add(str(tmp_path / "images" / "sub" / "0.jpg"), "sub/0.jpg")
+        t.add(str(tmp_path / "labels" / "sub" / "0.txt"), "sub/0.txt")
+    shard = str(tmp_path / "shard.tar")
+    # 归档中子文件夹里的成员总是会被读取
+    assert yolo.to_voc(shard, shard, CLASSES, str(tmp_path / "voc"), progress=False) == 1
+    assert os.path.exists(str(tmp_path / "voc" / "sub" / "0.xml"))
+    with pytest.raises(ValueError):
+        yolo.to_voc(shard, shard, CLASSES, str(tmp_path / "voc2"), recursive=True, progress=False)
+    with pytest.raises(ValueError):
+        yolo.get_all_classes_ids(shard, recursive=True, progress=False)
+    _pack(str(tmp_path / "voc.zip"), str(tmp_path / "voc"))
+    with pytest.raises(ValueError):
+        voc.to_yolo(str(tmp_path / "voc.zip"), CLASSES, str(tmp_path / "yolo"), recursive=True, progress=False)
+    # 图片在归档中、标注在文件夹中时, recursive作用于标注文件夹
+    assert yolo.to_voc(shard, str(tmp_path / "labels"), CLASSES, str(tmp_path / "voc3"), recursive=True, progress=False) == 1
+
+
+@pytest.mark.parametrize("newline", [b"\r\n", b"\r"])
+def test_member_line_endings(yolo_dataset, tmp_path, newline):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "expected"), progress=False)
+    for name in os.listdir(labels):
+        path = os.path.join(labels, name)
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(data.replace(b"\n", newline))
+    _pack(str(tmp_path / "shard.zip"), images, labels)
+    yolo.to_voc(str(tmp_path / "shard.zip"), str(tmp_path / "shard.zip"), CLASSES, str(tmp_path / "out"), progress=False)
+    assert _without_path(read_dir(str(tmp_path / "out"))) == _without_path(read_dir(str(tmp_path / "expected")))
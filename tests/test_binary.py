@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from image_annotations import yolo, voc, coco, binary
+from image_annotations.binary import StringTable
+from image_annotations.dataset import Dataset
+from image_annotations.exceptions import BadFileException
+from conftest import CLASSES, read_dir, read_coco
+
+
+def _assert_same(a: Dataset, b: Dataset):
+    assert a.classes == b.classes
+    assert list(a.file_names) == list(b.file_names)
+    for name in ("widths", "heights", "depths", "image_ids", "box_images", "class_ids", "x", "y", "w", "h"):
+        np.testing.assert_array_equal(getattr(a, name), getattr(b, name))
+
+
+def test_string_table():
+    table = StringTable.encode(["a.jpg", "", "图片.png"])
+    assert len(table) == 3
+    assert list(table) == ["a.jpg", "", "图片.png"]
+    assert table[-1] == "图片.png"
+    assert table[1:] == ["", "图片.png"]
+
+
+def test_save_load(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    dataset = Dataset.from_yolo(images, labels, CLASSES)
+    assert dataset.save(str(tmp_path / "a.iads")) == 4
+    loaded = Dataset.load(str(tmp_path / "a.iads"))
+    _assert_same(loaded, dataset)
+    assert not loaded.x.flags.writeable
+    assert binary.read_classes(str(tmp_path / "a.iads")) == CLASSES
+    # 从映射视图再保存得到相同的文件
+    loaded.save(str(tmp_path / "b.iads"))
+    assert (tmp_path / "a.iads").read_bytes() == (tmp_path / "b.iads").read_bytes()
+
+
+def test_empty_dataset(tmp_path):
+    dataset = Dataset(CLASSES, [], [], [], [], [], [], [], [], [], [])
+    dataset.save(str(tmp_path / "empty.iads"))
+    assert (len(Dataset.load(str(tmp_path / "empty.iads"))), Dataset.load(str(tmp_path / "empty.iads")).num_boxes) == (0, 0)
+
+
+def test_converters(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    assert yolo.to_binary(images, labels, CLASSES, str(tmp_path / "yolo.iads")) == 4
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "coco.json"), progress=False)
+    voc.to_binary(str(tmp_path / "voc"), CLASSES, str(tmp_path / "voc.iads"))
+    coco.to_binary(str(tmp_path / "coco.json"), str(tmp_path / "coco.iads"))
+    assert Dataset.load(str(tmp_path / "voc.iads")).num_boxes == 8
+    _assert_same(Dataset.load(str(tmp_path / "coco.iads")), Dataset.from_coco(str(tmp_path / "coco.json")))
+    # 从二进制格式转换的结果与直接转换一致
+    assert binary.to_voc(str(tmp_path / "yolo.iads"), images, str(tmp_path / "binary_voc")) == 4
+    assert read_dir(str(tmp_path / "binary_voc")) == read_dir(str(tmp_path / "voc"))
+    binary.to_coco(str(tmp_path / "yolo.iads"), str(tmp_path / "binary.json"))
+    Dataset.from_yolo(images, labels, CLASSES).to_coco(str(tmp_path / "dataset.json"))
+    assert read_coco(str(tmp_path / "binary.json")) == read_coco(str(tmp_path / "dataset.json"))
+    binary.to_yolo(str(tmp_path / "coco.iads"), str(tmp_path / "binary_yolo"))
+    coco.to_yolo(str(tmp_path / "coco.json"), str(tmp_path / "coco_yolo"))
+    assert read_dir(str(tmp_path / "binary_yolo")) == read_dir(str(tmp_path / "coco_yolo"))
+
+
+def test_bad_files(yolo_dataset, tmp_path):
+    (tmp_path / "bad.iads").write_bytes(b"not a dataset")
+    with pytest.raises(BadFileException):
+        Dataset.load(str(tmp_path / "bad.iads"))
+    images, labels = yolo_dataset
+    Dataset.from_yolo(images, labels, CLASSES).save(str(tmp_path / "a.iads"))
+    data = (tmp_path / "a.iads").read_bytes()
+    (tmp_path / "truncated.iads").write_bytes(data[:len(data) // 2])
+    with pytest.raises(BadFileException):
+        Dataset.load(str(tmp_path / "truncated.iads"))
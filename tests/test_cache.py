@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import pytest
+from image_annotations import yolo, cache
+from image_annotations.cache import ImageCache
+from image_annotations.exceptions import BadFileException
+from conftest import CLASSES, SIZES, read_dir, write_image
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """
+    记录缓存未命中时读取的图片\n
+    :return: 被读取的图片路径列表
+    """
+    paths = []
+    probe = cache.image_shape
+    monkeypatch.setattr(cache, "image_shape", lambda x: paths.append(x) or probe(x))
+    return paths
+
+
+def test_hits_skip_reading_images(yolo_dataset, tmp_path, probes):
+    images, _ = yolo_dataset
+    paths = [os.path.join(images, f"{i}.jpg") for i in range(len(SIZES))]
+    with ImageCache(str(tmp_path / "shapes.db")) as shapes:
+        assert shapes.shapes(paths) == [(h, w, 3) for w, h in SIZES]
+    assert probes == paths
+    probes.clear()
+    with ImageCache(str(tmp_path / "shapes.db")) as shapes:
+        assert shapes.shapes(paths) == [(h, w, 3) for w, h in SIZES]
+    assert probes == []
+
+
+def test_changed_image_is_read_again(yolo_dataset, tmp_path, probes):
+    images, _ = yolo_dataset
+    path = os.path.join(images, "0.jpg")
+    with ImageCache(str(tmp_path / "shapes.db")) as shapes:
+        shapes.shapes([path])
+        time.sleep(0.01)
+        write_image(path, 9, 7)
+        assert shapes.get(path) is None
+        assert shapes.shapes([path]) == [(7, 9, 3)]
+    assert probes == [path, path]
+
+
+def test_evicts_least_recently_used(yolo_dataset, tmp_path, monkeypatch):
+    # 每次命中都更新最近使用时间
+    monkeypatch.setattr(cache, "_TOUCH_INTERVAL", 0.0)
+    images, _ = yolo_dataset
+    paths = [os.path.join(images, f"{i}.jpg") for i in range(3)]
+    with ImageCache(str(tmp_path / "shapes.db"), max_entries=2) as shapes:
+        for path in paths[:2]:
+            shapes.put(path, (1, 1, 1))
+            time.sleep(0.01)
+        assert shapes.get(paths[0]) == (1, 1, 1)
+        time.sleep(0.01)
+        shapes.put(paths[2], (1, 1, 1))
+        assert shapes.evict() == 1
+        assert shapes.get(paths[1]) is None
+        assert shapes.get(paths[0]) is not None and shapes.get(paths[2]) is not None
+
+
+def test_hits_touch_in_batches(yolo_dataset, tmp_path, monkeypatch):
+    images, _ = yolo_dataset
+    paths = [os.path.join(images, f"{i}.jpg") for i in range(len(SIZES))]
+    with ImageCache(str(tmp_path / "shapes.db")) as shapes:
+        shapes.shapes(paths)
+        used = lambda: [x[0] for x in shapes._connection.execute("SELECT used FROM images ORDER BY path")]
+        before = used()
+        # 刚刚更新过的条目命中时不再写入
+        time.sleep(0.01)
+        assert shapes.shapes(paths) == [(h, w, 3) for w, h in SIZES]
+        assert used() == before
+        monkeypatch.setattr(cache, "_TOUCH_INTERVAL", 0.0)
+        shapes.shapes(paths)
+        assert all(x > y for x, y in zip(used(), before))
+
+
+@pytest.mark.parametrize("on_error", ["raise", "skip"])
+def test_missing_image(tmp_path, on_error):
+    path = str(tmp_path / "missing.jpg")
+    with ImageCache(str(tmp_path / "shapes.db")) as shapes:
+        assert shapes.get(path) is None
+        if on_error == "raise":
+            with pytest.raises(BadFileException):
+                shapes.shapes([path])
+        else:
+            assert shapes.shapes([path], on_error="skip") == [None]
+
+
+def test_converters_output_is_unchanged(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    db = str(tmp_path / "shapes.db")
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "plain"))
+    for i in range(2):
+        yolo.to_voc(images, labels, CLASSES, str(tmp_path / f"cached{i}"), image_cache=db)
+        assert read_dir(str(tmp_path / f"cached{i}")) == read_dir(str(tmp_path / "plain"))
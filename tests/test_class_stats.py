@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import os
+import pytest
+from image_annotations import yolo, voc, coco
+from image_annotations.class_stats import ClassStats
+from conftest import CLASSES, SIZES
+
+
+def _by_name(result: ClassStats) -> dict:
+    return {result.names.get(k, k): (result.objects[k], result.images[k]) for k in result.classes if result.objects[k]}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_yolo(yolo_dataset, workers):
+    _, labels = yolo_dataset
+    result = yolo.class_stats(labels, workers=workers, chunksize=1, progress=False)
+    assert result.complete and result.files == len(SIZES)
+    assert result.classes == [0, 1, 2]
+    assert (result.objects, result.images) == ({0: 2, 1: 5, 2: 1}, {0: 2, 1: 4, 2: 1})
+    # 尺寸分别为sqrt(0.25*0.5)和sqrt(0.1*0.1)
+    assert result.histograms[0].tolist() == [0, 0, 0, 2]
+    assert result.histograms[1].tolist() == [0, 4, 0, 1]
+    assert result.as_dict()["classes"][1] == {"class": 1, "name": 1, "objects": 5, "images": 4, "histogram": [0, 4, 0, 1]}
+
+
+def test_formats_agree(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "coco.json"), progress=False)
+    expected = {CLASSES[k]: v for k, v in _by_name(yolo.class_stats(labels, progress=False)).items()}
+    assert _by_name(voc.class_stats(str(tmp_path / "voc"), progress=False)) == expected
+    result = coco.class_stats(str(tmp_path / "coco.json"))
+    assert _by_name(result) == expected
+    assert result.files == len(SIZES)
+    assert sum(voc.class_stats(str(tmp_path / "voc"), progress=False).histograms["dog"]) == 5
+
+
+def test_early_exit(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    result = yolo.class_stats(labels, sample=2, progress=False)
+    assert (result.files, result.complete) == (2, False)
+    assert yolo.class_stats(labels, sample=10, progress=False).complete
+    os.makedirs(str(tmp_path / "same"))
+    for i in range(5):
+        with open(str(tmp_path / "same" / f"{i}.txt"), "w") as f:
+            f.write("3 0.5 0.5 0.1 0.1")
+    # 第二个文件起没有新类别
+    result = yolo.class_stats(str(tmp_path / "same"), stable_after=2, progress=False)
+    assert (result.files, result.complete, result.objects) == (3, False, {3: 3})
+    assert yolo.class_stats(labels, stable_after=len(SIZES), progress=False).complete
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "coco.json"), progress=False)
+    result = coco.class_stats(str(tmp_path / "coco.json"), sample=3)
+    assert (sum(result.objects.values()), result.complete) == (3, False)
+
+
+def test_coco_categories_only(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "coco.json"), progress=False)
+    result = coco.class_stats(str(tmp_path / "coco.json"), counts=False)
+    assert sorted(result.names.values()) == sorted(CLASSES)
+    assert set(result.objects.values()) == {0}
+
+
+def test_merge():
+    a, b = ClassStats(), ClassStats()
+    a.update(["cat", "dog"], [10, 50])
+    b.update(["cat"], [200])
+    b.complete = False
+    a.merge(b)
+    assert (a.objects, a.images, a.complete) == ({"cat": 2, "dog": 1}, {"cat": 2, "dog": 1}, False)
+    assert a.histograms["cat"].tolist() == [1, 0, 1]
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import subprocess
+import pytest
+from image_annotations import yolo, voc
+from image_annotations.cli import main
+from image_annotations.manifest import MANIFEST_NAME
+from conftest import CLASSES, SIZES, write_image, read_dir, read_coco
+
+
+@pytest.fixture
+def classes_file(tmp_path) -> str:
+    path = str(tmp_path / "classes.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(CLASSES) + "\n")
+    return path
+
+
+def _report(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _outputs(path: str) -> dict:
+    return {k: v for k, v in read_dir(path).items() if not k.startswith(MANIFEST_NAME)}
+
+
+def test_yolo2voc_resumes(yolo_dataset, classes_file, tmp_path):
+    images, labels = yolo_dataset
+    out, report = str(tmp_path / "voc"), str(tmp_path / "report.json")
+    args = ["yolo2voc", images, labels, out, "--classes", classes_file, "--quiet", "--report", report]
+    assert main(args) == 0
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "expected"), progress=False)
+    assert _outputs(out) == read_dir(str(tmp_path / "expected"))
+    assert _report(report)["converted"] == len(SIZES)
+    # 再次运行时全部复用检查点
+    assert main(args) == 0
+    assert _report(report)["counts"]["reused"] == len(SIZES)
+
+
+def test_skip_and_retry(yolo_dataset, classes_file, tmp_path, capsys):
+    images, labels = yolo_dataset
+    broken = os.path.join(images, "2.jpg")
+    with open(broken, "wb") as f:
+        f.write(b"broken")
+    out, report = str(tmp_path / "coco.json"), str(tmp_path / "report.json")
+    args = ["yolo2coco", images, labels, out, "--classes", classes_file, "--quiet", "--report", report]
+    assert main(args) == 1
+    assert "--on-error skip" in capsys.readouterr().err
+    assert main(args + ["--on-error", "skip"]) == 0
+    assert [x["path"] for x in _report(report)["errors"]] == [broken]
+    assert len(read_coco(out)["images"]) == 3
+    # 修复后重新运行只转换之前跳过的图片
+    write_image(broken, *SIZES[2])
+    assert main(args + ["--on-error", "skip"]) == 0
+    assert (_report(report)["errors"], _report(report)["counts"]["reused"]) == ([], 3)
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "expected.json"), progress=False)
+    assert read_coco(out) == read_coco(str(tmp_path / "expected.json"))
+
+
+def test_voc2coco_collects_classes(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    out = str(tmp_path / "coco.json")
+    assert main(["voc2coco", str(tmp_path / "voc"), out, "--compact", "--no-checkpoint", "--quiet"]) == 0
+    voc.to_coco(str(tmp_path / "voc"), sorted(CLASSES), str(tmp_path / "expected.json"), indent=None, progress=False)
+    assert read_coco(out) == read_coco(str(tmp_path / "expected.json"))
+    with open(out, "r") as f:
+        assert "\n" not in f.read()
+
+
+def test_module_entry_point():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-m", "image_annotations", "--help"], cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0
+    assert "yolo2voc" in result.stdout
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import json
+import pytest
+from image_annotations import yolo, coco_ops
+from image_annotations.writers import CocoWriter, coco_categories
+from conftest import CLASSES, SIZES, read_coco
+
+
+def _boxes(path: str) -> list:
+    """
+    按图片文件名及类别名称列出全部检测框, 与ID的编号无关\n
+    """
+    data = read_coco(path)
+    names = {x["id"]: x["name"] for x in data["categories"]}
+    files = {x["id"]: x["file_name"] for x in data["images"]}
+    return sorted((files[x["image_id"]], names[x["category_id"]], x["bbox"]) for x in data["annotations"])
+
+
+@pytest.fixture
+def sources(yolo_dataset, tmp_path) -> tuple:
+    """
+    两个类别顺序不同的COCO文件\n
+    """
+    images, labels = yolo_dataset
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "a.json"), progress=False)
+    yolo.to_coco(images, labels, CLASSES[::-1], str(tmp_path / "b.json"), progress=False)
+    return str(tmp_path / "a.json"), str(tmp_path / "b.json")
+
+
+def test_merge(sources, tmp_path):
+    a, b = sources
+    assert coco_ops.merge([a, b], str(tmp_path / "merged.json")) == 2 * len(SIZES)
+    merged = read_coco(str(tmp_path / "merged.json"))
+    assert merged["categories"] == read_coco(a)["categories"]
+    assert [x["id"] for x in merged["images"]] == list(range(2 * len(SIZES)))
+    assert [x["id"] for x in merged["annotations"]] == list(range(4 * len(SIZES)))
+    assert _boxes(str(tmp_path / "merged.json")) == sorted(_boxes(a) + _boxes(b))
+
+
+def test_merge_adds_new_categories(sources, tmp_path):
+    a, _ = sources
+    with CocoWriter(str(tmp_path / "c.json"), coco_categories(["fish", "dog"])) as writer:
+        writer.write({"file_name": "x.jpg", "width": 10, "height": 10}, [{"category_id": 0, "bbox": [1, 1, 2, 2]}])
+    coco_ops.merge([a, str(tmp_path / "c.json")], str(tmp_path / "merged.json"))
+    merged = read_coco(str(tmp_path / "merged.json"))
+    assert [x["name"] for x in merged["categories"]] == CLASSES + ["fish"]
+    assert ("x.jpg", "fish", [1, 1, 2, 2]) in _boxes(str(tmp_path / "merged.json"))
+
+
+def test_split(sources, tmp_path):
+    a, _ = sources
+    outputs = {str(tmp_path / "train.json"): 0.5, str(tmp_path / "val.json"): 0.5}
+    counts = coco_ops.split(a, outputs, seed=3)
+    assert sum(counts.values()) == len(SIZES)
+    parts = [_boxes(x) for x in outputs]
+    assert sorted(parts[0] + parts[1]) == _boxes(a)
+    for path in outputs:
+        data = read_coco(path)
+        assert [x["id"] for x in data["images"]] == list(range(len(data["images"])))
+    # 相同的种子得到相同的拆分
+    assert coco_ops.split(a, {str(tmp_path / "again.json"): 1, str(tmp_path / "rest.json"): 1}, seed=3) == dict(zip([str(tmp_path / "again.json"), str(tmp_path / "rest.json")], counts.values()))
+    with pytest.raises(ValueError):
+        coco_ops.split(a, {str(tmp_path / "x.json"): 0})
+
+
+@pytest.mark.parametrize("indent", [4, None])
+def test_append_matches_merge(yolo_dataset, tmp_path, indent):
+    images, labels = yolo_dataset
+    a, b = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+    yolo.to_coco(images, labels, CLASSES, a, indent=indent, progress=False)
+    yolo.to_coco(images, labels, CLASSES[::-1], b, indent=indent, progress=False)
+    coco_ops.merge([a, b], str(tmp_path / "merged.json"), indent=indent)
+    assert coco_ops.append(a, [b], indent=indent) == len(SIZES)
+    assert read_coco(a) == read_coco(str(tmp_path / "merged.json"))
+    # 追加的内容与CocoWriter的输出格式一致
+    with open(a, "r") as f:
+        text = f.read()
+    assert text == json.dumps(json.loads(text), indent=indent, separators=(",", ": ") if indent is not None else (",", ":"), ensure_ascii=False)
+
+
+def test_append_to_empty(sources, tmp_path):
+    a, _ = sources
+    with CocoWriter(str(tmp_path / "empty.json"), coco_categories(CLASSES)):
+        pass
+    assert coco_ops.append(str(tmp_path / "empty.json"), [a]) == len(SIZES)
+    assert _boxes(str(tmp_path / "empty.json")) == _boxes(a)
+
+
+def test_append_unknown_category_keeps_file(sources, tmp_path):
+    a, _ = sources
+    with CocoWriter(str(tmp_path / "c.json"), coco_categories(["fish"])) as writer:
+        writer.write({"file_name": "x.jpg", "width": 10, "height": 10}, [])
+    with open(a, "rb") as f:
+        before = f.read()
+    with pytest.raises(ValueError):
+        coco_ops.append(a, [str(tmp_path / "c.json")])
+    with open(a, "rb") as f:
+        assert f.read() == before
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import pytest
+from image_annotations import yolo, voc, coco
+from image_annotations.metrics import ConversionStats
+from conftest import CLASSES, SIZES, read_dir, read_coco
+
+
+@pytest.fixture
+def expected(yolo_dataset, tmp_path) -> dict:
+    """
+    用单目标转换函数生成的各格式输出\n
+    """
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "yolo.json"), progress=False)
+    voc.to_yolo(str(tmp_path / "voc"), CLASSES, str(tmp_path / "voc_yolo"), progress=False)
+    voc.to_coco(str(tmp_path / "voc"), CLASSES, str(tmp_path / "voc.json"), progress=False)
+    coco.to_yolo(str(tmp_path / "yolo.json"), str(tmp_path / "coco_yolo"))
+    coco.to_voc(str(tmp_path / "yolo.json"), images, str(tmp_path / "coco_voc"))
+    return {
+        "voc": read_dir(str(tmp_path / "voc")),
+        "yolo.json": read_coco(str(tmp_path / "yolo.json")),
+        "voc_yolo": read_dir(str(tmp_path / "voc_yolo")),
+        "voc.json": read_coco(str(tmp_path / "voc.json")),
+        "coco_yolo": read_dir(str(tmp_path / "coco_yolo")),
+        "coco_voc": read_dir(str(tmp_path / "coco_voc")),
+    }
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_matches_single_target(yolo_dataset, expected, tmp_path, workers):
+    images, labels = yolo_dataset
+    out = tmp_path / "multi"
+    stats = ConversionStats()
+    assert yolo.convert(images, labels, CLASSES, {"voc": str(out / "voc"), "coco": str(out / "yolo.json")}, workers=workers, progress=False, stats=stats) == len(SIZES)
+    assert stats.counts["images"] == len(SIZES)
+    assert read_dir(str(out / "voc")) == expected["voc"]
+    assert read_coco(str(out / "yolo.json")) == expected["yolo.json"]
+    assert voc.convert(str(out / "voc"), CLASSES, {"yolo": str(out / "voc_yolo"), "coco": str(out / "voc.json")}, workers=workers, progress=False) == len(SIZES)
+    assert read_dir(str(out / "voc_yolo")) == expected["voc_yolo"]
+    assert read_coco(str(out / "voc.json")) == expected["voc.json"]
+    assert coco.convert(str(out / "yolo.json"), {"yolo": str(out / "coco_yolo"), "voc": str(out / "coco_voc")}, images_dir=images, workers=workers) == len(SIZES)
+    assert read_dir(str(out / "coco_yolo")) == expected["coco_yolo"]
+    assert read_dir(str(out / "coco_voc")) == expected["coco_voc"]
+
+
+def test_single_target(yolo_dataset, expected, tmp_path):
+    images, labels = yolo_dataset
+    yolo.convert(images, labels, CLASSES, {"voc": str(tmp_path / "only_voc")}, progress=False)
+    assert read_dir(str(tmp_path / "only_voc")) == expected["voc"]
+
+
+def test_bad_targets(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    with pytest.raises(ValueError):
+        yolo.convert(images, labels, CLASSES, {"yolo": str(tmp_path / "x")}, progress=False)
+    with pytest.raises(ValueError):
+        voc.convert(str(tmp_path), CLASSES, {}, progress=False)
+    with pytest.raises(ValueError):
+        coco.convert(str(tmp_path / "a.json"), {"voc": str(tmp_path / "x")})
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from image_annotations import yolo
+from image_annotations.dataset import Dataset
+from image_annotations.exceptions import BadFileException
+from image_annotations.writers import CocoWriter, coco_categories
+from conftest import CLASSES, SIZES, read_dir, read_coco, write_image
+
+
+@pytest.fixture
+def dataset(yolo_dataset) -> Dataset:
+    images, labels = yolo_dataset
+    return Dataset.from_yolo(images, labels, CLASSES)
+
+
+def _columns(dataset: Dataset) -> tuple:
+    return (dataset.classes, list(dataset.file_names), dataset.widths.tolist(), dataset.heights.tolist(), dataset.box_images.tolist(),
+            dataset.class_ids.tolist(), np.round(dataset.corners(), 6).tolist())
+
+
+def test_from_yolo(dataset):
+    assert len(dataset) == len(SIZES)
+    assert dataset.num_boxes == 2 * len(SIZES)
+    record = dataset[1]
+    assert (record.file_name, record.width, record.height, record.depth) == ("1.jpg", 80, 60, 3)
+    assert [(x.class_id, x.name) for x in record.boxes] == [(1, "dog"), (1, "dog")]
+    box = record.boxes[0]
+    assert (box.x, box.y, box.w, box.h) == pytest.approx((30, 15, 20, 30))
+
+
+def test_writers_match_converters(yolo_dataset, dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "expected"))
+    dataset.to_voc(str(tmp_path / "voc"), images)
+    assert read_dir(str(tmp_path / "voc")) == read_dir(str(tmp_path / "expected"))
+    dataset.to_yolo(str(tmp_path / "yolo"))
+    assert Dataset.from_yolo(images, str(tmp_path / "yolo"), CLASSES).class_ids.tolist() == dataset.class_ids.tolist()
+
+
+def test_round_trips(yolo_dataset, dataset, tmp_path):
+    images, _ = yolo_dataset
+    dataset.to_coco(str(tmp_path / "coco.json"))
+    assert _columns(Dataset.from_coco(str(tmp_path / "coco.json"))) == _columns(dataset)
+    # VOC只保存整数角点
+    dataset.to_voc(str(tmp_path / "voc"), images)
+    voc = Dataset.from_voc(str(tmp_path / "voc"), CLASSES, workers=2, chunksize=3)
+    assert sorted(voc.file_names) == sorted(dataset.file_names)
+    for name in dataset.file_names:
+        expected = dataset[dataset.file_names.index(name)]
+        record = voc[voc.file_names.index(name)]
+        assert (record.width, record.height) == (expected.width, expected.height)
+        assert [x.class_id for x in record.boxes] == [x.class_id for x in expected.boxes]
+        assert [(x.x, x.y, x.x + x.w, x.y + x.h) for x in record.boxes] == \
+            [tuple(np.trunc([x.x, x.y, x.x + x.w, x.y + x.h]).tolist()) for x in expected.boxes]
+
+def test_coco_round_trip_is_byte_stable(dataset, tmp_path):
+    dataset.to_coco(str(tmp_path / "a.json"))
+    Dataset.from_coco(str(tmp_path / "a.json")).to_coco(str(tmp_path / "b.json"))
+    assert read_coco(str(tmp_path / "a.json")) == read_coco(str(tmp_path / "b.json"))
+
+
+def test_selection(dataset):
+    images = dataset.select_images(np.array([True, False, True, False]))
+    assert list(images.file_names) == ["0.jpg", "2.jpg"]
+    assert images.box_images.tolist() == [0, 0, 1, 1]
+    boxes = dataset.select_boxes(dataset.class_ids == 1)
+    assert len(boxes) == len(dataset)
+    assert boxes.class_ids.tolist() == [1] * 5
+    remapped = dataset.remap_classes(["dog", "cat"])
+    assert remapped.classes == ["dog", "cat"]
+    assert remapped.class_ids.tolist() == [1, 0, 0, 0, 0, 1, 0]
+
+
+def test_from_coco_unknown_category(tmp_path):
+    path = str(tmp_path / "coco.json")
+    with CocoWriter(path, coco_categories(["a", "b"])) as writer:
+        writer.write({"file_name": "x.jpg", "width": 10, "height": 10}, [{"category_id": 5, "bbox": [1, 1, 2, 2]}])
+    with pytest.raises(BadFileException, match="5"):
+        Dataset.from_coco(path)
+
+
+def test_from_yolo_unknown_class(tmp_path):
+    write_image(str(tmp_path / "0.jpg"), 40, 30)
+    (tmp_path / "0.txt").write_text("0 0.5 0.5 0.2 0.2\n5 0.5 0.5 0.2 0.2\n")
+    with pytest.raises(BadFileException, match="5") as info:
+        Dataset.from_yolo(str(tmp_path), str(tmp_path), ["a", "b"])
+    assert info.value.filepath == str(tmp_path / "0.txt")
+    assert Dataset.from_yolo(str(tmp_path), str(tmp_path), list("abcdef")).num_boxes == 2
+
+
+def test_from_voc_unknown_class(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    with pytest.raises(BadFileException, match="bird"):
+        Dataset.from_voc(str(tmp_path / "voc"), ["cat", "dog"])
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import os
+import inspect
+import sys
+import subprocess
+import pytest
+import image_annotations
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _loaded_after(statement: str) -> set:
+    """
+    在新的解释器中执行语句, 返回其后已加载的重量级模块\n
+    :param statement: 要执行的语句
+    :return: 模块名集合
+    """
+    code = f"import sys\n{statement}\nprint(' '.join(x for x in ('numpy', 'cv2', 'tqdm') if x in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+def test_bare_import_is_light():
+    assert _loaded_after("import image_annotations") == set()
+
+
+def test_exports_resolve():
+    for name in image_annotations.__all__:
+        assert callable(getattr(image_annotations, name))
+        assert name in dir(image_annotations)
+    from image_annotations import yolo
+    assert image_annotations.yolo2voc is yolo.to_voc
+
+
+def test_unknown_name():
+    with pytest.raises(AttributeError):
+        image_annotations.missing
+
+
+@pytest.mark.parametrize("name,positional", [
+    ("yolo2voc", ["images_dir", "annotations_dir", "classes", "output_dir"]),
+    ("yolo2coco", ["images_dir", "annotations_dir", "classes", "output_path"]),
+    ("voc2yolo", ["annotations_dir", "classes", "output_dir"]),
+    ("voc2coco", ["annotations_dir", "classes", "output_path"]),
+    ("coco2yolo", ["annotation_path", "output_dir"]),
+    ("coco2voc", ["annotation_path", "images_dir", "output_dir"]),
+])
+def test_converter_signatures(name, positional):
+    # 原有的参数之后新增的参数只能按关键字传入, 各转换函数默认都显示进度
+    parameters = inspect.signature(getattr(image_annotations, name)).parameters
+    assert [k for k, v in parameters.items() if v.kind != inspect.Parameter.KEYWORD_ONLY] == positional
+    assert parameters["progress"].default is True
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from image_annotations import yolo, coco
+from image_annotations.manifest import Manifest
+from image_annotations.metrics import ConversionStats
+from image_annotations.validation import Validator
+from image_annotations.writers import CocoWriter, coco_categories
+from conftest import CLASSES, write_image, read_coco
+
+
+def _mtimes(output: str) -> dict:
+    return {x: os.stat(os.path.join(output, x)).st_mtime_ns for x in os.listdir(output) if x.endswith(".xml")}
+
+
+def _touch(path: str, text: str = ""):
+    time.sleep(0.01)
+    with open(path, "a") as f:
+        f.write(text)
+    os.utime(path)
+
+
+def test_only_changed_inputs_are_rewritten(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    output = str(tmp_path / "voc")
+    assert yolo.to_voc(images, labels, CLASSES, output, incremental=True) == 4
+    before = _mtimes(output)
+    assert yolo.to_voc(images, labels, CLASSES, output, incremental=True) == 4
+    assert _mtimes(output) == before
+    _touch(os.path.join(labels, "1.txt"), "2 0.5 0.5 0.1 0.1\n")
+    yolo.to_voc(images, labels, CLASSES, output, incremental=True)
+    after = _mtimes(output)
+    assert [x for x in after if after[x] != before[x]] == ["1.xml"]
+
+
+def test_checksum_ignores_touched_files(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    output = str(tmp_path / "voc")
+    yolo.to_voc(images, labels, CLASSES, output, incremental=True, checksum=True)
+    before = _mtimes(output)
+    _touch(os.path.join(labels, "2.txt"))
+    yolo.to_voc(images, labels, CLASSES, output, incremental=True, checksum=True)
+    assert _mtimes(output) == before
+
+
+def test_removed_inputs_are_pruned(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    output = str(tmp_path / "voc")
+    yolo.to_voc(images, labels, CLASSES, output, incremental=True)
+    os.remove(os.path.join(labels, "2.txt"))
+    assert yolo.to_voc(images, labels, CLASSES, output, incremental=True) == 3
+    assert sorted(_mtimes(output)) == ["0.xml", "1.xml", "3.xml"]
+
+
+def test_incremental_coco_matches_full_run(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    output = str(tmp_path / "coco.json")
+    yolo.to_coco(images, labels, CLASSES, output, incremental=True)
+    _touch(os.path.join(labels, "0.txt"), "2 0.5 0.5 0.1 0.1\n")
+    os.remove(os.path.join(labels, "3.txt"))
+    yolo.to_coco(images, labels, CLASSES, output, incremental=True)
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "full.json"))
+    assert read_coco(output) == read_coco(str(tmp_path / "full.json"))
+
+
+def test_changed_options_invalidate_manifest(tmp_path):
+    path = str(tmp_path / "manifest")
+    calls = []
+
+    def upper(x: str) -> str:
+        calls.append(x)
+        return x.upper()
+
+    def run(options: dict) -> list:
+        calls.clear()
+        with Manifest(path, options) as manifest:
+            results = list(manifest.map(upper, ["a", "b"], key=str, signature=lambda x: "1"))
+            manifest.prune()
+        return results
+
+    assert run({"x": 1}) == ["A", "B"] and calls == ["a", "b"]
+    assert run({"x": 1}) == ["A", "B"] and calls == []
+    assert run({"x": 2}) == ["A", "B"] and calls == ["a", "b"]
+
+
+def test_stale_output_is_removed_when_input_is_skipped(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    output = str(tmp_path / "voc")
+    yolo.to_voc(images, labels, CLASSES, output, incremental=True, progress=False)
+    assert os.path.exists(os.path.join(output, "2.xml"))
+    time.sleep(0.01)
+    with open(os.path.join(images, "2.jpg"), "wb") as f:
+        f.write(b"broken")
+    stats = ConversionStats()
+    assert yolo.to_voc(images, labels, CLASSES, output, incremental=True, on_error="skip", progress=False, stats=stats) == 3
+    assert len(stats.errors) == 1
+    assert sorted(_mtimes(output)) == ["0.xml", "1.xml", "3.xml"]
+
+
+def test_class_list_change_invalidates_validated_results(tmp_path):
+    os.makedirs(str(tmp_path / "images"))
+    os.makedirs(str(tmp_path / "labels"))
+    write_image(str(tmp_path / "images" / "0.jpg"), 40, 30)
+    with open(str(tmp_path / "labels" / "0.txt"), "w") as f:
+        f.write("0 0.5 0.5 0.2 0.2\n2 0.3 0.3 0.2 0.2")
+    images, labels = str(tmp_path / "images"), str(tmp_path / "labels")
+    output = str(tmp_path / "coco.json")
+    yolo.to_coco(images, labels, ["a", "b"], output, incremental=True, validate=True, progress=False)
+    assert len(read_coco(output)["annotations"]) == 1
+    yolo.to_coco(images, labels, ["a", "b", "c"], output, incremental=True, validate=True, progress=False)
+    yolo.to_coco(images, labels, ["a", "b", "c"], str(tmp_path / "fresh.json"), validate=True, progress=False)
+    assert len(read_coco(output)["annotations"]) == 2
+    assert read_coco(output) == read_coco(str(tmp_path / "fresh.json"))
+
+
+def test_category_change_invalidates_validated_results(tmp_path):
+    path = str(tmp_path / "coco.json")
+    for categories in (["a", "b"], ["a", "b", "c"]):
+        with CocoWriter(path, coco_categories(categories)) as writer:
+            writer.write({"file_name": "x.jpg", "width": 10, "height": 10}, [{"category_id": 0, "bbox": [1, 1, 2, 2]}, {"category_id": 2, "bbox": [3, 3, 2, 2]}])
+        coco.to_yolo(path, str(tmp_path / "yolo"), incremental=True, validate=True)
+    with open(str(tmp_path / "yolo" / "x.txt"), "r") as f:
+        assert len(f.read().splitlines()) == 2
+
+
+def test_validator_options_include_num_classes():
+    assert Validator(num_classes=2).options() != Validator(num_classes=3).options()
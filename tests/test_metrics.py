@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import pytest
+from image_annotations import yolo, voc, coco, metrics
+from image_annotations.metrics import ConversionStats, LogProgress, Measured, stage, count
+from image_annotations.utils import parallel_map
+from conftest import CLASSES, SIZES
+
+
+def _work(x: int) -> int:
+    with stage("parse"):
+        count("boxes", x)
+    return x * 2
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_map_merges_worker_stats(workers):
+    stats = ConversionStats()
+    assert list(parallel_map(_work, range(10), workers, 3, stats)) == [x * 2 for x in range(10)]
+    assert stats.counts == {"boxes": 45}
+    assert set(stats.stages) == {"parse"}
+    assert metrics._current() is None
+
+
+def test_instrumentation_is_noop_without_stats():
+    with stage("parse"):
+        count("boxes")
+    assert metrics._current() is None
+
+
+def test_stats_are_per_thread():
+    barrier = threading.Barrier(2)
+
+    def work(n: int) -> int:
+        # 两个线程同时处在Measured中
+        barrier.wait()
+        with stage("parse"):
+            count("boxes", n)
+        barrier.wait()
+        return n
+
+    measured = Measured(work)
+    results = {}
+    threads = [threading.Thread(target=lambda n=n: results.__setitem__(n, measured(n))) for n in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [results[n][1].counts for n in (1, 2)] == [{"boxes": 1}, {"boxes": 2}]
+
+    def outer(_) -> int:
+        # 预读线程不在Measured中, 不会记录到转换线程的统计
+        thread = threading.Thread(target=count, args=("boxes", 5))
+        thread.start()
+        thread.join()
+        count("boxes")
+        return 0
+
+    assert Measured(outer)(None)[1].counts == {"boxes": 1}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_converter_stats(yolo_dataset, tmp_path, workers):
+    images, labels = yolo_dataset
+    stats = ConversionStats()
+    calls = []
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), workers=workers, progress=lambda done, total: calls.append((done, total)), stats=stats)
+    # 输入是边遍历边处理的, 总数未知
+    assert calls == [(i + 1, None) for i in range(len(SIZES))]
+    assert stats.converter == "yolo.to_voc"
+    assert stats.counts["images"] == len(SIZES)
+    assert stats.counts["boxes"] == 2 * len(SIZES)
+    assert {"scan", "probe", "write", "total"} <= set(stats.stages)
+    stats = ConversionStats()
+    voc.to_coco(str(tmp_path / "voc"), CLASSES, str(tmp_path / "coco.json"), progress=False, stats=stats)
+    assert (stats.counts["images"], stats.counts["boxes"]) == (len(SIZES), 2 * len(SIZES))
+    stats = ConversionStats()
+    coco.to_yolo(str(tmp_path / "coco.json"), str(tmp_path / "yolo"), workers=workers, stats=stats)
+    assert (stats.converter, stats.counts["images"], stats.counts["boxes"]) == ("coco.to_yolo", len(SIZES), 2 * len(SIZES))
+
+
+def test_log_progress(caplog):
+    caplog.set_level(logging.INFO, logger="image_annotations")
+    progress = LogProgress(interval=3600)
+    for done in range(1, 6):
+        progress(done, 5)
+    # 第一次及完成时总会写日志, 中间的调用被限流
+    assert [x.getMessage() for x in caplog.records] == ["1/5", "5/5"]
+    caplog.clear()
+    progress = LogProgress(interval=0, stats=ConversionStats("yolo.to_voc"))
+    progress(3, None)
+    assert caplog.records[0].getMessage().startswith("3 ConversionStats(yolo.to_voc")
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import tarfile
+import pytest
+from image_annotations import yolo, voc
+from image_annotations.metrics import ConversionStats
+from image_annotations.exceptions import BadFileException
+from conftest import CLASSES
+
+
+@pytest.fixture
+def broken_dataset(yolo_dataset):
+    """
+    把测试数据集中的第2张图片替换为无法解码的文件\n
+    :return: (图片文件夹, 标注文件夹, 损坏的图片路径)
+    """
+    images, labels = yolo_dataset
+    broken = os.path.join(images, "2.jpg")
+    with open(broken, "wb") as f:
+        f.write(b"broken" * 10)
+    return images, labels, broken
+
+
+@pytest.fixture
+def broken_archive(broken_dataset, tmp_path):
+    """
+    把损坏的数据集打包为图片与标注相邻存放的tar分片\n
+    :return: (tar路径, 损坏的图片在tar中的路径)
+    """
+    images, labels, _ = broken_dataset
+    path = str(tmp_path / "shard.tar")
+    with tarfile.open(path, "w") as archive:
+        for i in range(4):
+            archive.add(os.path.join(images, f"{i}.jpg"), f"{i}.jpg")
+            archive.add(os.path.join(labels, f"{i}.txt"), f"{i}.txt")
+    return path, os.path.join(path, "2.jpg")
+
+
+def _file_names(path: str) -> list:
+    with open(path, "r") as f:
+        return [x["file_name"] for x in json.load(f)["images"]]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("image_cache", [False, True])
+def test_skip_broken_image(broken_dataset, tmp_path, workers, image_cache):
+    images, labels, broken = broken_dataset
+    output = str(tmp_path / "coco.json")
+    cache = str(tmp_path / "shapes.db") if image_cache else None
+    stats = ConversionStats()
+    assert yolo.to_coco(images, labels, CLASSES, output, workers=workers, image_cache=cache, progress=False, stats=stats, on_error="skip") == 3
+    assert _file_names(output) == ["0.jpg", "1.jpg", "3.jpg"]
+    assert [x["path"] for x in stats.errors] == [broken]
+
+
+@pytest.mark.parametrize("image_cache", [False, True])
+def test_raise_on_broken_image(broken_dataset, tmp_path, image_cache):
+    images, labels, broken = broken_dataset
+    cache = str(tmp_path / "shapes.db") if image_cache else None
+    with pytest.raises(BadFileException) as info:
+        yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), image_cache=cache, progress=False)
+    assert info.value.filepath == broken
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_skip_broken_image_in_archive(broken_archive, tmp_path, workers):
+    archive, broken = broken_archive
+    output = str(tmp_path / "voc.tar")
+    stats = ConversionStats()
+    assert yolo.to_voc(archive, archive, CLASSES, output, workers=workers, progress=False, stats=stats, on_error="skip") == 3
+    with tarfile.open(output) as result:
+        assert sorted(result.getnames()) == ["0.xml", "1.xml", "3.xml"]
+    assert [x["path"] for x in stats.errors] == [broken]
+
+
+def test_raise_on_broken_image_in_archive(broken_archive, tmp_path):
+    archive, broken = broken_archive
+    with pytest.raises(BadFileException) as info:
+        yolo.to_coco(archive, archive, CLASSES, str(tmp_path / "coco.json"), progress=False)
+    assert info.value.filepath == broken
+
+
+def test_skip_without_stats_warns(broken_dataset, tmp_path):
+    images, labels, broken = broken_dataset
+    with pytest.warns(UserWarning, match="2.jpg"):
+        assert yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False, on_error="skip") == 3
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_skip_malformed_voc(yolo_dataset, tmp_path, workers):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    broken = str(tmp_path / "voc" / "1.xml")
+    with open(broken, "w") as f:
+        f.write("<annotation><object>")
+    with pytest.raises(BadFileException):
+        voc.to_yolo(str(tmp_path / "voc"), CLASSES, str(tmp_path / "raise"), progress=False)
+    stats = ConversionStats()
+    assert voc.to_yolo(str(tmp_path / "voc"), CLASSES, str(tmp_path / "yolo"), workers=workers, progress=False, stats=stats, on_error="skip") == 3
+    assert sorted(os.listdir(str(tmp_path / "yolo"))) == ["0.txt", "2.txt", "3.txt"]
+    assert [x["path"] for x in stats.errors] == [broken]
+
+
+def test_bad_on_error(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    with pytest.raises(ValueError):
+        yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False, on_error="ignore")
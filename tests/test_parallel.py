@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import pytest
+from image_annotations import yolo, voc, coco
+from image_annotations.utils import parallel_map
+from conftest import CLASSES, read_coco, read_dir
+
+
+def _square(x: int) -> int:
+    return x * x
+
+
+def _inverse(x: int) -> float:
+    return 1 / x
+
+
+@pytest.mark.parametrize("workers", [1, 2, None])
+def test_parallel_map_keeps_order(workers):
+    assert list(parallel_map(_square, range(100), workers, chunksize=7)) == [x * x for x in range(100)]
+
+
+def test_parallel_map_propagates_errors():
+    with pytest.raises(ZeroDivisionError):
+        list(parallel_map(_inverse, [1, 0, 2], 2, chunksize=1))
+
+
+def _convert_all(images: str, labels: str, output: str, workers: int) -> dict:
+    results = {
+        "yolo.to_voc": yolo.to_voc(images, labels, CLASSES, output + "/voc", workers=workers),
+        "yolo.to_coco": yolo.to_coco(images, labels, CLASSES, output + "/coco.json", workers=workers),
+        "voc.to_yolo": voc.to_yolo(output + "/voc", CLASSES, output + "/yolo", workers=workers),
+        "voc.to_coco": voc.to_coco(output + "/voc", CLASSES, output + "/voc.json", workers=workers),
+        "coco.to_yolo": coco.to_yolo(output + "/coco.json", output + "/yolo2", workers=workers),
+        "coco.to_voc": coco.to_voc(output + "/coco.json", images, output + "/voc2", workers=workers),
+    }
+    return results
+
+
+def test_process_pool_matches_serial(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    serial, pooled = str(tmp_path / "serial"), str(tmp_path / "pooled")
+    assert _convert_all(images, labels, serial, 1) == _convert_all(images, labels, pooled, 2)
+    for folder in ("voc", "yolo", "yolo2", "voc2"):
+        assert read_dir(f"{serial}/{folder}") == read_dir(f"{pooled}/{folder}")
+    for name in ("coco.json", "voc.json"):
+        assert read_coco(f"{serial}/{name}") == read_coco(f"{pooled}/{name}")
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import time
+import threading
+import pytest
+from image_annotations import yolo, voc, coco
+from image_annotations.pipeline import read_ahead, WriteBehind
+from conftest import CLASSES, read_dir, read_coco
+
+
+class _Recorder(object):
+    """
+    记录写入内容的写入器, 可以在指定的成员上出错\n
+    """
+
+    def __init__(self, fail: str = None, delay: float = 0.0):
+        self.written = []
+        self.closed = False
+        self.aborted = False
+        self.fail = fail
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def write(self, name, data):
+        time.sleep(self.delay)
+        if name == self.fail:
+            raise OSError(f"无法写入{name}")
+        with self._lock:
+            self.written.append((name, data))
+
+    def close(self):
+        self.closed = True
+
+    def abort(self):
+        self.aborted = True
+
+
+def test_read_ahead_keeps_order_and_bounds_depth():
+    loading = []
+    peak = []
+
+    def load(x):
+        loading.append(x)
+        time.sleep(0.001 * (10 - x % 10))
+        return x * x
+
+    consumed = 0
+    for result in read_ahead(load, range(50), threads=4, depth=6):
+        assert result == consumed * consumed
+        consumed = consumed + 1
+        peak.append(len(loading) - consumed)
+    assert consumed == 50
+    assert max(peak) <= 6
+
+
+def test_read_ahead_stops_early():
+    started = []
+    results = read_ahead(lambda x: started.append(x) or x, range(1000), threads=2, depth=4)
+    assert next(results) == 0
+    results.close()
+    assert len(started) < 1000
+
+
+def test_write_behind():
+    recorder = _Recorder(delay=0.001)
+    with WriteBehind(recorder, threads=3, depth=2) as writer:
+        for i in range(20):
+            writer.write(f"{i}.txt", str(i))
+    assert recorder.closed
+    assert sorted(recorder.written) == sorted((f"{i}.txt", str(i)) for i in range(20))
+
+
+def test_write_behind_error():
+    recorder = _Recorder(fail="3.txt")
+    writer = WriteBehind(recorder)
+    with pytest.raises(OSError):
+        for i in range(100):
+            writer.write(f"{i}.txt", str(i))
+            time.sleep(0.001)
+    # 异常只抛出一次, close时放弃被包装的写入器中已经写入的内容
+    writer.close()
+    assert recorder.aborted and not recorder.closed
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_converters_unchanged(yolo_dataset, tmp_path, workers):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc_io"), workers=workers, io_threads=4, progress=False)
+    assert read_dir(str(tmp_path / "voc_io")) == read_dir(str(tmp_path / "voc"))
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "a.json"), progress=False)
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "b.json"), workers=workers, io_threads=4, progress=False)
+    assert read_coco(str(tmp_path / "b.json")) == read_coco(str(tmp_path / "a.json"))
+    voc.to_yolo(str(tmp_path / "voc"), CLASSES, str(tmp_path / "yolo"), progress=False)
+    voc.to_yolo(str(tmp_path / "voc"), CLASSES, str(tmp_path / "yolo_io"), workers=workers, io_threads=4, progress=False)
+    assert read_dir(str(tmp_path / "yolo_io")) == read_dir(str(tmp_path / "yolo"))
+    coco.to_voc(str(tmp_path / "a.json"), images, str(tmp_path / "coco_voc"))
+    coco.to_voc(str(tmp_path / "a.json"), images, str(tmp_path / "coco_voc_io"), workers=workers, io_threads=4)
+    assert read_dir(str(tmp_path / "coco_voc_io")) == read_dir(str(tmp_path / "coco_voc"))
+
+
+def test_incremental_with_io_threads(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    for _ in range(2):
+        yolo.to_voc(images, labels, CLASSES, str(tmp_path / "inc"), incremental=True, io_threads=4, progress=False)
+    expected = read_dir(str(tmp_path / "voc"))
+    assert {k: v for k, v in read_dir(str(tmp_path / "inc")).items() if k in expected} == expected
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import os
+import cv2
+import numpy as np
+import pytest
+from xml.dom import minidom
+from image_annotations import yolo
+from image_annotations.exceptions import BadFileException
+from image_annotations.utils import image_shape, probe_shape, bytes_shape
+from conftest import CLASSES, SIZES
+
+
+def _decoded_shape(path: str) -> tuple:
+    shape = cv2.imread(path, cv2.IMREAD_UNCHANGED).shape
+    return (shape[0], shape[1], 1) if len(shape) == 2 else shape
+
+
+@pytest.mark.parametrize("name,channels,dtype,params", [
+    ("baseline.jpg", 3, np.uint8, []),
+    ("gray.jpg", 1, np.uint8, []),
+    ("progressive.jpg", 3, np.uint8, [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]),
+    ("rgb.png", 3, np.uint8, []),
+    ("gray.png", 1, np.uint8, []),
+    ("rgba.png", 4, np.uint8, []),
+    ("deep.png", 3, np.uint16, []),
+    ("rgb.bmp", 3, np.uint8, []),
+    ("gray.bmp", 1, np.uint8, []),
+    ("rgba.bmp", 4, np.uint8, []),
+])
+def test_header_probe_matches_cv2(tmp_path, name, channels, dtype, params):
+    path = str(tmp_path / name)
+    shape = (37, 53) if channels == 1 else (37, 53, channels)
+    image = np.random.default_rng(0).integers(0, 200, size=shape).astype(dtype)
+    assert cv2.imwrite(path, image, params)
+    with open(path, "rb") as f:
+        probed = probe_shape(f)
+    # 文件头探测成功, 不需要解码
+    assert probed is not None
+    assert tuple(probed) == _decoded_shape(path)
+    assert tuple(image_shape(path)) == _decoded_shape(path)
+
+
+def test_unknown_header_falls_back_to_decoding(tmp_path):
+    path = str(tmp_path / "image.tiff")
+    assert cv2.imwrite(path, np.zeros((12, 34, 3), dtype=np.uint8))
+    with open(path, "rb") as f:
+        assert probe_shape(f) is None
+    assert tuple(image_shape(path)) == (12, 34, 3)
+    with open(path, "rb") as f:
+        assert tuple(bytes_shape(f.read(), path)) == (12, 34, 3)
+
+
+def test_undecodable_image(tmp_path):
+    path = str(tmp_path / "broken.jpg")
+    with open(path, "wb") as f:
+        f.write(b"\xff\xd8broken")
+    with pytest.raises(BadFileException) as info:
+        image_shape(path)
+    assert info.value.filepath == path
+    with pytest.raises(BadFileException):
+        bytes_shape(b"broken", "a.tar/broken.jpg")
+
+
+def test_voc_sizes_come_from_headers(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    output = str(tmp_path / "voc")
+    yolo.to_voc(images, labels, CLASSES, output)
+    for i, (width, height) in enumerate(SIZES):
+        size = minidom.parse(os.path.join(output, f"{i}.xml")).getElementsByTagName("size")[0]
+        values = [int(size.getElementsByTagName(x)[0].firstChild.data) for x in ("width", "height", "depth")]
+        assert values == [width, height, 3]
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import json
+import pytest
+from image_annotations import coco
+from image_annotations.readers import CocoReader
+from image_annotations.writers import CocoWriter, coco_categories
+from conftest import read_dir
+
+DATA = {
+    "info": {"description": "a \"quoted\" [value] {x}", "nested": [[1, 2], {"a": [3]}]},
+    "images": [
+        {"id": 7, "file_name": "dir/a.jpg", "width": 10, "height": 20},
+        {"id": 3, "file_name": "鸟.jpg", "width": 30, "height": 40},
+        {"id": 9, "file_name": "c.jpg", "width": 50, "height": 60},
+        {"id": 7, "file_name": "dir/a2.jpg", "width": 11, "height": 21},
+    ],
+    "annotations": [
+        {"id": 0, "image_id": 9, "category_id": 2, "bbox": [5, 6, 7, 8]},
+        {"id": 1, "image_id": 7, "category_id": 1, "bbox": [1, 2, 3.5, 4]},
+        {"id": 2, "image_id": 9, "category_id": 1, "bbox": [0.25, 1, 2, 2]},
+        {"id": 3, "image_id": 7, "category_id": 2, "bbox": [0, 0, 1, 1]},
+    ],
+    "licenses": [],
+    "categories": [{"id": 1, "name": "x\\y"}, {"id": 2, "name": "z"}],
+}
+
+
+@pytest.fixture(params=[4, None])
+def coco_path(tmp_path, request):
+    path = str(tmp_path / "coco.json")
+    with open(path, "w") as f:
+        json.dump(DATA, f, indent=request.param, ensure_ascii=False)
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_reader_matches_json(coco_path, chunk_size):
+    reader = CocoReader(coco_path, chunk_size)
+    assert reader.categories() == DATA["categories"]
+    assert list(reader.iter_images()) == DATA["images"]
+    assert list(reader.iter_annotations()) == DATA["annotations"]
+    reader.load()
+    # 重复ID的图片只保留最后一项, 位置按首次出现
+    assert [x["file_name"] for x in reader.images] == ["dir/a2.jpg", "鸟.jpg", "c.jpg"]
+    grouped = [(image["id"], class_ids.tolist(), bboxes.tolist(), is_int.tolist()) for image, class_ids, bboxes, is_int in reader]
+    assert grouped == [
+        (7, [1, 2], [[1, 2, 3.5, 4], [0, 0, 1, 1]], [[True, True, False, True], [True, True, True, True]]),
+        (3, [], [], []),
+        (9, [2, 1], [[5, 6, 7, 8], [0.25, 1, 2, 2]], [[True, True, True, True], [False, True, True, True]]),
+    ]
+
+
+def test_reader_matches_pycocotools(coco_path):
+    pycocotools = pytest.importorskip("pycocotools.coco")
+    expected = pycocotools.COCO(coco_path)
+    reader = CocoReader(coco_path).load()
+    assert [x["id"] for x in reader.images] == list(expected.imgs)
+    for image, class_ids, bboxes, _ in reader:
+        annotations = expected.loadAnns(expected.getAnnIds(imgIds=image["id"]))
+        assert class_ids.tolist() == [x["category_id"] for x in annotations]
+        assert bboxes.tolist() == [x["bbox"] for x in annotations]
+
+
+@pytest.mark.parametrize("indent", [4, None])
+def test_writer_reader_round_trip(tmp_path, indent):
+    path = str(tmp_path / "coco.json")
+    images = [({"file_name": "a.jpg", "width": 10, "height": 20}, [(1, [1, 2, 3, 4]), (0, [0.5, 1, 2, 2.5])]),
+              ({"file_name": "b.jpg", "width": 30, "height": 40}, []),
+              ({"file_name": "c.jpg", "width": 50, "height": 60}, [(2, [5, 6, 7, 8])])]
+    with CocoWriter(path, coco_categories(["x", "y", "z"]), indent=indent) as writer:
+        for image, boxes in images:
+            writer.write(image, [{"category_id": c, "bbox": b, "area": b[2] * b[3], "iscrowd": 0} for c, b in boxes])
+    reader = CocoReader(path).load()
+    assert [x["name"] for x in reader.categories()] == ["x", "y", "z"]
+    assert len(reader) == 3
+    for (image, class_ids, bboxes, is_int), (expected, boxes) in zip(reader, images):
+        assert image["file_name"] == expected["file_name"]
+        assert class_ids.tolist() == [c for c, _ in boxes]
+        assert bboxes.tolist() == [[float(v) for v in b] for _, b in boxes]
+        assert is_int.tolist() == [[isinstance(v, int) for v in b] for _, b in boxes]
+
+
+def test_converters_read_without_pycocotools(coco_path, tmp_path):
+    assert coco.get_all_classes(coco_path) == ["x\\y", "z"]
+    assert coco.to_yolo(coco_path, str(tmp_path / "yolo")) == 3
+    labels = read_dir(str(tmp_path / "yolo"))
+    assert labels["c.txt"] == b"2 0.1700 0.1667 0.1400 0.1333\n1 0.0250 0.0333 0.0400 0.0333"
+    assert labels["鸟.txt"] == b""
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+def test_unread_keys_are_not_decoded(tmp_path, chunk_size):
+    # images和annotations中的内容不是合法的json, 只要括号和字符串完整, 跳过时不会解析它们
+    path = str(tmp_path / "coco.json")
+    with open(path, "w") as f:
+        f.write('{"version": -2.5e3, "images": [{"id": 1, bad}, ["]", "\\"{"]], "annotations": [{"x": [[1, {"y": oops}]]}],\n'
+                ' "name": "[", "categories": [{"id": 1, "name": "a"}, {"id": 4, "name": "b"}]}')
+    reader = CocoReader(path, chunk_size)
+    assert reader.categories() == [{"id": 1, "name": "a"}, {"id": 4, "name": "b"}]
+    assert reader.field("version") == -2500.0
+    assert reader.field("name") == "["
+    assert coco.class_stats(path, counts=False).names == {1: "a", 4: "b"}
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import os
+from image_annotations import yolo
+from image_annotations.metrics import ConversionStats
+from image_annotations.scan import scan_dir, stem, output_path, Pairing
+from conftest import CLASSES, write_image, read_dir
+
+
+def _touch(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("")
+
+
+def test_scan_dir(tmp_path):
+    for name in ("a.txt", "sub/b.txt", "sub/deep/c.txt"):
+        _touch(str(tmp_path / name))
+    stats = ConversionStats()
+    assert sorted(scan_dir(str(tmp_path), stats=stats)) == ["a.txt"]
+    assert stats.counts["files"] == 1
+    assert sorted(scan_dir(str(tmp_path), recursive=True)) == ["a.txt", "sub/b.txt", "sub/deep/c.txt"]
+
+
+def test_stem_and_output_path(tmp_path):
+    assert stem("a.b.jpg") == "a.b"
+    assert stem("sub/x.png") == "sub/x"
+    path = output_path(str(tmp_path), "sub/x.png", ".xml")
+    assert path == os.path.join(str(tmp_path), "sub/x.xml")
+    assert os.path.isdir(str(tmp_path / "sub"))
+
+
+def test_pairing(tmp_path):
+    for name in ("images/a.jpg", "images/b.jpg", "images/notes.md", "images/sub/c.jpg", "labels/a.txt", "labels/z.txt", "labels/sub/c.txt"):
+        _touch(str(tmp_path / name))
+    pairing = Pairing(str(tmp_path / "images"), str(tmp_path / "labels"))
+    assert list(pairing) == [("a.jpg", "a.txt")]
+    assert (pairing.unpaired_images, pairing.unpaired_labels) == (["b.jpg"], ["z.txt"])
+    stats = ConversionStats()
+    pairing.record(stats)
+    assert (stats.counts["unpaired_images"], stats.counts["unpaired_labels"]) == (1, 1)
+    assert "b.jpg" in stats.notes["pairing"]
+    pairing = Pairing(str(tmp_path / "images"), str(tmp_path / "labels"), recursive=True)
+    assert sorted(pairing) == [("a.jpg", "a.txt"), ("sub/c.jpg", "sub/c.txt")]
+
+
+def test_recursive_yolo_to_voc(tmp_path):
+    os.makedirs(str(tmp_path / "images" / "sub"))
+    write_image(str(tmp_path / "images" / "sub" / "x.jpg"), 40, 20)
+    os.makedirs(str(tmp_path / "labels" / "sub"))
+    with open(str(tmp_path / "labels" / "sub" / "x.txt"), "w") as f:
+        f.write("1 0.5 0.5 0.5 0.5")
+    assert yolo.to_voc(str(tmp_path / "images"), str(tmp_path / "labels"), CLASSES, str(tmp_path / "flat"), progress=False) == 0
+    assert yolo.to_voc(str(tmp_path / "images"), str(tmp_path / "labels"), CLASSES, str(tmp_path / "voc"), recursive=True, progress=False) == 1
+    xml = read_dir(str(tmp_path / "voc"))["sub/x.xml"].decode("utf-8")
+    assert "<folder>sub</folder>" in xml and "<filename>x.jpg</filename>" in xml
+    assert "<xmin>10</xmin>" in xml and "<name>dog</name>" in xml
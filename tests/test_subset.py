@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import os
+import tarfile
+import pytest
+from image_annotations import yolo, voc, coco, archives
+from image_annotations.metrics import ConversionStats
+from image_annotations.subset import Subset, image_key
+from conftest import CLASSES, SIZES, read_dir, read_coco
+
+
+def test_image_key():
+    assert image_key("train\\a.b.jpg") == "train/a.b"
+    assert image_key("a") == "a"
+    assert image_key("a.txt") == image_key("a.jpg") == image_key("a.xml")
+
+
+def test_keep_image():
+    subset = Subset(images=["train/1", "val/*"])
+    assert subset.keep_image("train/1.jpg") and subset.keep_image("val/x.xml")
+    assert not subset.keep_image("train/2.jpg") and not subset.keep_image("1.jpg")
+    sampled = Subset(fraction=0.5, seed=1)
+    picked = [x for x in range(200) if sampled.keep_image(f"{x}.jpg")]
+    assert 60 < len(picked) < 140
+    assert picked == [x for x in range(200) if Subset(fraction=0.5, seed=1).keep_image(f"{x}.txt")]
+    assert picked != [x for x in range(200) if Subset(fraction=0.5, seed=2).keep_image(f"{x}.jpg")]
+
+
+def test_bind():
+    subset = Subset(classes=["bird", "cat"]).bind(CLASSES)
+    assert subset.names == ["bird", "cat"]
+    assert subset.class_ids([0, 1, 2]).tolist() == [1, -1, 0]
+    kept = Subset(classes=[2, 0], remap=False).bind(CLASSES)
+    assert kept.class_ids([0, 1, 2]).tolist() == [0, -1, 2]
+    assert kept.names == CLASSES
+    with pytest.raises(ValueError):
+        Subset(classes=["fish"]).bind(CLASSES)
+    for kwargs in ({"fraction": 1.5}, {"min_area": 10, "max_area": 5}):
+        with pytest.raises(ValueError):
+            Subset(**kwargs)
+
+
+def test_yolo_class_filter_skips_probe(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    # 第0张图片只有cat和dog, 按类别过滤后不会被打开
+    with open(os.path.join(images, "0.jpg"), "wb") as f:
+        f.write(b"broken")
+    stats = ConversionStats()
+    assert yolo.to_coco(images, labels, CLASSES, str(tmp_path / "coco.json"), subset=Subset(classes=["bird"]), progress=False, stats=stats) == 1
+    data = read_coco(str(tmp_path / "coco.json"))
+    assert [x["name"] for x in data["categories"]] == ["bird"]
+    assert [x["file_name"] for x in data["images"]] == ["2.jpg"]
+    assert [x["category_id"] for x in data["annotations"]] == [0]
+
+
+def test_keep_empty(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), subset=Subset(classes=["bird"], keep_empty=True), progress=False)
+    outputs = read_dir(str(tmp_path / "voc"))
+    assert sorted(outputs) == ["0.xml", "1.xml", "2.xml", "3.xml"]
+    assert b"<object>" not in outputs["0.xml"] and b"<name>bird</name>" in outputs["2.xml"]
+
+
+def test_formats_select_same_images(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "coco.json"), progress=False)
+    subset = Subset(images=["1", "3"])
+    stats = ConversionStats()
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "a"), subset=subset, progress=False, stats=stats)
+    assert stats.counts["filtered"] == 2
+    voc.to_yolo(str(tmp_path / "voc"), CLASSES, str(tmp_path / "b"), subset=subset, progress=False)
+    coco.to_yolo(str(tmp_path / "coco.json"), str(tmp_path / "c"), subset=subset)
+    assert sorted(read_dir(str(tmp_path / "a"))) == ["1.xml", "3.xml"]
+    assert sorted(read_dir(str(tmp_path / "b"))) == sorted(read_dir(str(tmp_path / "c"))) == ["1.txt", "3.txt"]
+    assert read_dir(str(tmp_path / "b")) == read_dir(str(tmp_path / "c"))
+
+
+def test_voc_name_filter_skips_reading(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    with open(str(tmp_path / "voc" / "0.xml"), "w") as f:
+        f.write("<annotation><object>")
+    assert voc.to_coco(str(tmp_path / "voc"), CLASSES, str(tmp_path / "coco.json"), subset=Subset(images=["2"]), progress=False) == 1
+
+
+def test_coco_area_filter(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "coco.json"), progress=False)
+    coco.to_yolo(str(tmp_path / "coco.json"), str(tmp_path / "yolo"), subset=Subset(min_area=100))
+    expected = [x for x in read_coco(str(tmp_path / "coco.json"))["annotations"] if x["area"] >= 100]
+    assert sum(len(x.splitlines()) for x in read_dir(str(tmp_path / "yolo")).values()) == len(expected) < 2 * len(SIZES)
+
+
+def test_archive_members_filtered_before_probe(yolo_dataset, tmp_path, monkeypatch):
+    images, labels = yolo_dataset
+    with tarfile.open(str(tmp_path / "shard.tar"), "w") as archive:
+        for i in range(len(SIZES)):
+            archive.add(os.path.join(images, f"{i}.jpg"), f"{i}.jpg")
+            archive.add(os.path.join(labels, f"{i}.txt"), f"{i}.txt")
+    probed = []
+    stream_shape = archives.stream_shape
+    monkeypatch.setattr(archives, "stream_shape", lambda f: probed.append(f) or stream_shape(f))
+    stats = ConversionStats()
+    shard = str(tmp_path / "shard.tar")
+    assert yolo.to_voc(shard, shard, CLASSES, str(tmp_path / "voc"), subset=Subset(images=["1", "3"]), progress=False, stats=stats) == 2
+    assert len(probed) == 2
+    assert stats.counts["filtered"] == 2
+    assert stats.counts.get("unpaired_labels", 0) == 0
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+from benchmarks.synthetic import generate
+from image_annotations.dataset import Dataset
+
+
+def test_formats_agree(tmp_path):
+    meta = generate(str(tmp_path), images=6, boxes=3, classes=4, sizes=[(64, 48), (40, 40)], image_format="png", seed=1)
+    assert (meta["images"], meta["boxes"]) == (6, 18)
+    classes = meta["classes"]
+    from_yolo = Dataset.from_yolo(str(tmp_path / "images"), str(tmp_path / "labels"), classes)
+    from_voc = Dataset.from_voc(str(tmp_path / "voc"), classes)
+    from_coco = Dataset.from_coco(str(tmp_path / "coco.json"))
+    assert sorted(from_voc.file_names) == sorted(from_yolo.file_names) == sorted(from_coco.file_names)
+    assert len(os.listdir(str(tmp_path / "images"))) == 6
+    for other in (from_voc, from_coco):
+        assert other.num_boxes == 18
+        for name in from_yolo.file_names:
+            expected = from_yolo[from_yolo.file_names.index(name)]
+            record = other[other.file_names.index(name)]
+            assert (record.width, record.height) == (expected.width, expected.height)
+            assert [x.name for x in record.boxes] == [x.name for x in expected.boxes]
+            assert [(x.x, x.y, x.x + x.w, x.y + x.h) for x in record.boxes] == \
+                [tuple(np.trunc([x.x, x.y, x.x + x.w, x.y + x.h]).tolist()) for x in expected.boxes]
+
+
+def test_seed_is_deterministic(tmp_path):
+    generate(str(tmp_path / "a"), images=3, boxes=2, classes=2, seed=7)
+    generate(str(tmp_path / "b"), images=3, boxes=2, classes=2, seed=7)
+    for name in os.listdir(str(tmp_path / "a" / "labels")):
+        assert (tmp_path / "a" / "labels" / name).read_bytes() == (tmp_path / "b" / "labels" / name).read_bytes()
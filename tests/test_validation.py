@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+import pytest
+from image_annotations import yolo
+from image_annotations.dataset import Dataset
+from image_annotations.metrics import ConversionStats
+from image_annotations.validation import Validator, validator
+from conftest import CLASSES, read_dir, read_coco
+
+
+def test_check():
+    checker = Validator(min_area=4, num_classes=3)
+    class_ids = [0, 5, 1, 1, 2, 0, 0]
+    corners = np.array([
+        [1, 1, 5, 5],        # 正常
+        [1, 1, 5, 5],        # 类别超出范围
+        [-2, 3, 12, 8],      # 越界, 裁剪
+        [4, 4, 4, 8],        # 宽度为0
+        [1, 1, 2, 2],        # 面积过小
+        [1, 1, 5, 5],        # 与第一个重复
+        [20, 20, 30, 30],    # 完全在图片外, 裁剪后退化
+    ], dtype=np.float64)
+    keep, clipped, counts = checker.check(class_ids, corners, 10, 10)
+    assert keep.tolist() == [True, False, True, False, False, False, False]
+    assert clipped[2].tolist() == [0, 3, 10, 8]
+    assert counts == {"class": 1, "bounds": 2, "degenerate": 2, "area": 1, "duplicate": 1}
+
+
+def test_report_keeps_everything():
+    keep, clipped, counts = Validator("report").check([0, 0], np.array([[-1, 0, 5, 5], [-1, 0, 5, 5]]), 10, 10)
+    assert keep.all()
+    assert clipped.tolist() == [[-1, 0, 5, 5], [-1, 0, 5, 5]]
+    assert counts == {"bounds": 2, "duplicate": 1}
+
+
+def test_policies():
+    assert Validator({"bounds": "drop"}).actions["bounds"] == "drop"
+    for policy in ("clip", {"class": "clip"}, {"typo": "drop"}):
+        with pytest.raises(ValueError):
+            Validator(policy)
+    assert validator(None) is None and validator(False) is None
+    assert validator(Validator("drop"), 3).num_classes == 3
+    assert not Validator().check_size(None, 10)
+    assert Validator("report").check_size(0, 10) is True
+
+
+@pytest.fixture
+def bad_labels(yolo_dataset) -> tuple:
+    """
+    第0张图片的标注中加入越界、类别超出范围及重复的检测框\n
+    """
+    images, labels = yolo_dataset
+    with open(os.path.join(labels, "0.txt"), "a") as f:
+        f.write("\n1 0.9 0.5 0.4 0.2\n7 0.5 0.5 0.1 0.1\n0 0.5 0.5 0.25 0.5")
+    return images, labels
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_converter(bad_labels, tmp_path, workers):
+    images, labels = bad_labels
+    stats = ConversionStats()
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "coco.json"), workers=workers, validate=True, progress=False, stats=stats)
+    assert (stats.counts["invalid_bounds"], stats.counts["invalid_class"], stats.counts["invalid_duplicate"]) == (1, 1, 1)
+    annotations = [x for x in read_coco(str(tmp_path / "coco.json"))["annotations"] if x["image_id"] == 0]
+    assert len(annotations) == 3
+    # 64x48的图片, 越界的检测框被裁剪到右边界
+    assert annotations[2]["bbox"] == [44, 19, 20, 9]
+
+
+def test_report_output_unchanged(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "plain"), progress=False)
+    stats = ConversionStats()
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "report"), validate="report", progress=False, stats=stats)
+    assert read_dir(str(tmp_path / "report")) == read_dir(str(tmp_path / "plain"))
+    assert not any(x.startswith("invalid_") for x in stats.counts)
+
+
+def test_dataset_validate(bad_labels):
+    images, labels = bad_labels
+    # 类别7超出CLASSES的范围, 从YOLO读取时会抛出异常, 先按更长的类别列表读取, 再按CLASSES的类别数校验
+    dataset = Dataset.from_yolo(images, labels, CLASSES + [f"extra{i}" for i in range(5)])
+    checked, counts = dataset.validate(Validator(num_classes=len(CLASSES)))
+    assert counts == {"bounds": 1, "class": 1, "duplicate": 1}
+    assert (dataset.num_boxes, checked.num_boxes) == (11, 9)
+    assert checked.corners().max(axis=0)[2] <= 64
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import os
+import tarfile
+import pytest
+from image_annotations import voc, yolo
+from image_annotations.dataset import Dataset
+from image_annotations.exceptions import BadFileException
+from image_annotations.readers import parse_voc, class_index, voc_arrays
+from conftest import CLASSES, read_dir
+
+
+XML = """<annotation>
+    <filename>a.jpg</filename>
+    <filename>ignored.jpg</filename>
+    <size><width>100</width><height>80</height><depth>3</depth></size>
+    <object>
+        <name>dog</name>
+        <part><name>head</name><bndbox><xmin>0</xmin><ymin>0</ymin><xmax>1</xmax><ymax>1</ymax></bndbox></part>
+        <bndbox><xmin>10.5</xmin><ymin>20</ymin><xmax>30.25</xmax><ymax>40</ymax></bndbox>
+    </object>
+    <object>
+        <name>cat</name>
+        <bndbox><ymax>8</ymax><xmax>6</xmax><ymin>4</ymin><xmin>2</xmin></bndbox>
+    </object>
+</annotation>"""
+
+
+def test_parse_voc():
+    record = parse_voc(XML.encode("utf-8"))
+    assert record == ("a.jpg", 100, 80, 3, ["dog", "cat"], [(10.5, 20, 30.25, 40), (2, 4, 6, 8)])
+    assert [type(x) for x in record[5][0]] == [float, int, float, int]
+
+
+def test_parse_voc_missing_size():
+    assert parse_voc(b"<annotation><size><width>5</width></size></annotation>") == (None, 5, None, None, [], [])
+
+
+@pytest.mark.parametrize("data", [
+    b"<annotation><object>",
+    "<?xml version='1.0' encoding='gbk'?><annotation><filename>图片.jpg</filename></annotation>".encode("gbk"),
+    b"<annotation><object><name>a</name></object></annotation>",
+    b"<annotation><object><name>a</name><bndbox><xmin>x</xmin><ymin>0</ymin><xmax>1</xmax><ymax>1</ymax></bndbox></object></annotation>",
+])
+def test_parse_voc_errors(data):
+    with pytest.raises(BadFileException) as info:
+        parse_voc(data, "bad.xml")
+    assert info.value.filepath == "bad.xml"
+
+
+def test_class_index():
+    assert class_index(["a", "b", "a"]) == {"a": 0, "b": 1}
+    sizes, offsets, ids, boxes = voc_arrays([parse_voc(XML.encode("utf-8")), (None, None, None, None, [], [])], class_index(["cat", "dog"]))
+    assert sizes.tolist() == [[100, 80, 3], [-1, -1, -1]]
+    assert (offsets.tolist(), ids.tolist()) == ([0, 2, 2], [1, 0])
+    assert boxes.tolist() == [[10.5, 20, 30.25, 40], [2, 4, 6, 8]]
+
+
+def test_fractional_coordinates(tmp_path):
+    os.makedirs(str(tmp_path / "voc"))
+    with open(str(tmp_path / "voc" / "a.xml"), "w") as f:
+        f.write(XML)
+    assert voc.to_yolo(str(tmp_path / "voc"), CLASSES, str(tmp_path / "yolo"), progress=False) == 1
+    assert read_dir(str(tmp_path / "yolo"))["a.txt"] == b"1 0.2037 0.3750 0.1975 0.2500\n0 0.0400 0.0750 0.0400 0.0500"
+
+
+def test_unknown_class(tmp_path):
+    os.makedirs(str(tmp_path / "voc"))
+    with open(str(tmp_path / "voc" / "a.xml"), "w") as f:
+        f.write(XML)
+    with pytest.raises(BadFileException, match="dog"):
+        voc.to_yolo(str(tmp_path / "voc"), ["cat"], str(tmp_path / "yolo"), progress=False)
+
+
+def test_dataset_from_voc_archive(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_voc(images, labels, CLASSES, str(tmp_path / "voc"), progress=False)
+    with tarfile.open(str(tmp_path / "voc.tar"), "w") as archive:
+        for name in sorted(os.listdir(str(tmp_path / "voc"))):
+            archive.add(str(tmp_path / "voc" / name), name)
+    expected = Dataset.from_voc(str(tmp_path / "voc"), CLASSES)
+    dataset = Dataset.from_voc(str(tmp_path / "voc.tar"), CLASSES, chunksize=3)
+    assert sorted(dataset.file_names) == sorted(expected.file_names)
+    assert sorted(dataset.corners().tolist()) == sorted(expected.corners().tolist())
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import pytest
+from image_annotations import yolo
+from image_annotations.exceptions import BadFileException
+from image_annotations.writers import CocoWriter, coco_categories, coco_info, coco_licenses
+from conftest import CLASSES, read_coco
+
+
+IMAGES = [
+    ({"file_name": "a.jpg", "width": 10, "height": 20}, [{"category_id": 1, "bbox": [1, 2, 3, 4], "area": 12}, {"category_id": 0, "bbox": [0.5, 1, 2, 2.5], "area": 5.0}]),
+    ({"file_name": "b.jpg", "width": 30, "height": 40}, []),
+    ({"file_name": "c.jpg", "width": 50, "height": 60}, [{"category_id": 2, "bbox": [5, 6, 7, 8], "area": 56, "name": "鸟"}]),
+]
+
+
+def _expected(info: dict, licenses: list) -> dict:
+    images, annotations = [], []
+    for image_id, (image, boxes) in enumerate(IMAGES):
+        images.append({"id": image_id, **image})
+        for box in boxes:
+            annotations.append({"id": len(annotations), "image_id": image_id, **box})
+    return {"info": info, "licenses": licenses, "categories": coco_categories(["x", "y", "z"]), "images": images, "annotations": annotations}
+
+
+def _write(path: str, indent, info: dict, licenses: list) -> None:
+    with CocoWriter(path, coco_categories(["x", "y", "z"]), indent=indent, info=info, licenses=licenses) as writer:
+        for image, boxes in IMAGES:
+            writer.write(image, boxes)
+
+
+@pytest.mark.parametrize("indent,separators", [(4, None), (None, (",", ":"))])
+def test_matches_json_dump(tmp_path, indent, separators):
+    path = str(tmp_path / "coco.json")
+    info, licenses = coco_info(), coco_licenses()
+    _write(path, indent, info, licenses)
+    with open(path, "r") as f:
+        text = f.read()
+    assert text == json.dumps(_expected(info, licenses), indent=indent, separators=separators, ensure_ascii=False)
+
+
+def test_empty_dataset(tmp_path):
+    path = str(tmp_path / "coco.json")
+    with CocoWriter(path, [], info={}, licenses=[]):
+        pass
+    with open(path, "r") as f:
+        assert f.read() == json.dumps({"info": {}, "licenses": [], "categories": [], "images": [], "annotations": []}, indent=4)
+
+
+def test_compact_output_has_same_content(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "pretty.json"))
+    yolo.to_coco(images, labels, CLASSES, str(tmp_path / "compact.json"), indent=None)
+    assert read_coco(str(tmp_path / "pretty.json")) == read_coco(str(tmp_path / "compact.json"))
+    assert "\n" not in (tmp_path / "compact.json").read_text()
+
+
+def _legacy_xml(folder, filename, path, width, height, depth, objects) -> str:
+    from xml.dom.minidom import parseString
+    from xml.etree.ElementTree import tostring
+    from image_annotations.utils import dict2element
+    annotation = {
+        "folder": folder, "filename": filename, "path": path, "source": {"database": "Unknown"},
+        "size": {"width": str(width), "height": str(height), "depth": str(depth)}, "segmented": "0",
+        "object": [{
+            "name": name, "pose": "Unspecified", "truncated": "0", "difficult": "0",
+            "bndbox": {"xmin": str(xmin), "ymin": str(ymin), "xmax": str(xmax), "ymax": str(ymax)}
+        } for name, xmin, ymin, xmax, ymax in objects]
+    }
+    return parseString(tostring(dict2element("annotation", annotation))).toprettyxml(indent="\t")
+
+
+@pytest.mark.parametrize("objects", [
+    [],
+    [("cat", 1, 2, 30, 40)],
+    [("cat", 0, 0, 1, 1), ("猫", 2.5, 3, 4.25, 5), ("dog", 10, 20, 30, 40)],
+])
+def test_voc_xml_matches_minidom(objects):
+    from image_annotations.writers import voc_xml
+    args = ("images", "0001.jpg", "/data/images/0001.jpg", 640, 480, 3, objects)
+    assert voc_xml(*args) == _legacy_xml(*args)
+
+
+def test_voc_xml_escapes_text():
+    from xml.dom.minidom import parseString
+    from image_annotations.writers import voc_xml
+    names = ["a & b", "<dog>", "\"quoted\""]
+    xml = voc_xml("a&b", "<1>.jpg", "", 1, 1, 1, [(x, 0, 0, 1, 1) for x in names])
+    document = parseString(xml)
+    assert [x.firstChild.data for x in document.getElementsByTagName("name")] == names
+    assert document.getElementsByTagName("folder")[0].firstChild.data == "a&b"
+    assert document.getElementsByTagName("filename")[0].firstChild.data == "<1>.jpg"
+
+
+def test_voc_xml_empty_text():
+    from image_annotations.writers import voc_xml
+    args = ("", "a.jpg", "", 1, 1, 1, [])
+    assert voc_xml(*args) == _legacy_xml(*args)
+
+
+def test_coco_writer_keeps_output_on_error(tmp_path):
+    path = tmp_path / "coco.json"
+    path.write_text("previous")
+    with pytest.raises(RuntimeError):
+        with CocoWriter(str(path), coco_categories(["a"])) as writer:
+            writer.write({"file_name": "a.jpg", "width": 1, "height": 1}, [])
+            raise RuntimeError("中途失败")
+    assert path.read_text() == "previous"
+    assert os.listdir(str(tmp_path)) == ["coco.json"]
+
+
+def test_failed_conversion_keeps_output(yolo_dataset, tmp_path):
+    images, labels = yolo_dataset
+    with open(os.path.join(images, "3.jpg"), "wb") as f:
+        f.write(b"broken")
+    path = tmp_path / "coco.json"
+    path.write_text("previous")
+    with pytest.raises(BadFileException):
+        yolo.to_coco(images, labels, CLASSES, str(path), progress=False)
+    assert path.read_text() == "previous"
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from image_annotations.readers import parse_yolo, read_yolo, yolo_corners
+from image_annotations.exceptions import BadFileException
+
+
+def test_parse_yolo():
+    labels = parse_yolo("0 0.5 0.5 0.2 0.4\n\n2 1e-1 0.3 1 1.0\n")
+    assert labels.shape == (2, 5)
+    np.testing.assert_allclose(labels[1], [2, 0.1, 0.3, 1, 1.0])
+    assert parse_yolo("  \n").shape == (0, 5)
+    assert parse_yolo("").shape == (0, 5)
+
+
+@pytest.mark.parametrize("text,line", [
+    ("0 0.5 0.5 0.2\n", 1),
+    ("0 0.5 0.5 0.2 0.2\n1 0.5 0.5 0.2 0.2 9\n", 2),
+    ("0 0.5 0.5 0.2 0.2\n\n0 a 0.5 0.2 0.2\n", 3),
+    ("-1 0.5 0.5 0.2 0.2\n", 1),
+    ("0.5 0.5 0.5 0.2 0.2\n", 1),
+    ("0 0.5 nan 0.2 0.2\n", 1),
+])
+def test_parse_yolo_reports_line_number(text, line):
+    with pytest.raises(BadFileException) as info:
+        parse_yolo(text, "labels/0.txt")
+    assert info.value.filepath == "labels/0.txt"
+    assert f"第{line}行" in info.value.message
+    assert text.splitlines()[line - 1].strip() in info.value.message
+
+
+@pytest.mark.parametrize("newline", ["\r\n", "\r"])
+def test_parse_yolo_line_endings(newline):
+    text = newline.join(["0 0.5 0.5 0.2 0.4", "", "2 0.1 0.3 1 1.0", ""])
+    assert parse_yolo(text).tolist() == [[0, 0.5, 0.5, 0.2, 0.4], [2, 0.1, 0.3, 1, 1.0]]
+    with pytest.raises(BadFileException, match="第3行"):
+        parse_yolo(text.replace("2 0.1", "2 x"))
+
+
+def test_parse_yolo_other_line_breaks():
+    # splitlines认可而np.loadtxt不认可的换行符, 逐行解析的结果即为正确结果
+    assert parse_yolo("0 0.5 0.5 0.2 0.2\x0b1 0.5 0.5 0.2 0.2\u2028").tolist() == [[0, 0.5, 0.5, 0.2, 0.2], [1, 0.5, 0.5, 0.2, 0.2]]
+
+
+def test_read_yolo(tmp_path):
+    (tmp_path / "0.txt").write_text("2 0.1 0.1 0.1 0.1")
+    assert read_yolo(str(tmp_path / "0.txt")).tolist() == [[2, 0.1, 0.1, 0.1, 0.1]]
+
+
+def test_out_of_range_coordinates_are_kept():
+    # 坐标是否超出图片由Validator判断
+    labels = parse_yolo("0 -0.1 0.5 0.2 0.2\n1 1.2 0.5 0.4 0.2")
+    assert labels[:, 1].tolist() == [-0.1, 1.2]
+
+
+def test_corners_truncate_like_int():
+    labels = np.array([[1, 0.5, 0.5, 0.33, 0.77], [0, 0.123, 0.987, 0.1, 0.05]])
+    class_ids, corners = yolo_corners(labels, 97, 61)
+    expected = []
+    for _, x, y, w, h in labels.tolist():
+        x, y, w, h = x * 97, y * 61, w * 97, h * 61
+        expected.append([int(x - 0.5 * w), int(y - 0.5 * h), int(x + 0.5 * w), int(y + 0.5 * h)])
+    assert class_ids.tolist() == [1, 0]
+    assert corners.tolist() == expected